@@ -0,0 +1,314 @@
+"""
+Adaptive RAG pipeline, importable without Streamlit.
+
+Used by demo_Adaptive_RAG.py and by the headless batch runner
+(batch_eval.py at the repo root).
+"""
+from langchain.vectorstores import FAISS
+from langchain.embeddings import OpenAIEmbeddings
+from langchain.chat_models import ChatOpenAI
+from langchain.prompts import PromptTemplate
+from langchain.chains import LLMChain
+from langchain.chains.question_answering import load_qa_chain
+import asyncio
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag_common.context_packing import ContextPacker
+from rag_common.dedup import ChunkDeduplicator
+from rag_common.embedding_cache import CachedEmbeddings
+from rag_common.index_cache import IndexCache, content_key
+from rag_common.ingest import build_faiss_streaming, iter_pdf_chunks
+from rag_common.intent import CentroidIntentClassifier, IntentClassifier, LLMIntentClassifier, RuleIntentClassifier
+from rag_common.pipeline import PipelineResult
+from rag_common.rate_limit import limited_openai_client
+from rag_common.tracing import Tracer
+from rag_common.vector_index import compress_vectorstore, set_nprobe, settings_key
+
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+EMBEDDING_MODEL = "text-embedding-ada-002"
+INDEX_CACHE_DIR = os.getenv("RAG_INDEX_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".index_cache"))
+INDEX_CACHE_MAX_MB = int(os.getenv("RAG_INDEX_CACHE_MAX_MB", "512"))
+INGEST_WORKERS = int(os.getenv("RAG_INGEST_WORKERS", "0")) or None  # default: one per CPU
+EMBED_BATCH_SIZE = int(os.getenv("RAG_EMBED_BATCH_SIZE", "256"))
+DEDUP_THRESHOLD = float(os.getenv("RAG_DEDUP_THRESHOLD", "0.85"))  # 0 disables duplicate removal
+INTENT_MODE = os.getenv("RAG_INTENT_MODE", "local")  # "local" (LLM only when unsure) or "llm"
+INTENT_THRESHOLD = float(os.getenv("RAG_INTENT_THRESHOLD", "0.6"))
+PIPELINE_MODE = os.getenv("RAG_PIPELINE_MODE", "concurrent")  # or "sequential"
+CONTEXT_PACKING = os.getenv("RAG_CONTEXT_PACKING", "1") not in ("", "0", "false")
+CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "3000"))  # 0: merge/dedup only, no budget
+
+INTENT_K = {"FACTUAL": 2, "PROCEDURAL": 5, "REASONING": 8}
+DEFAULT_K = 4  # what vectorstore.as_retriever() returns
+# Deepest search either path can need: largest k, +3 to expand, +3 to regenerate
+MAX_FETCH_K = max(INTENT_K.values()) + 3 + 3
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class AdaptiveModels:
+    llm: object
+    embedding: object
+    intent_classifier: object
+    rewrite_chain: object
+    qa_chain: object
+
+
+def build_models(openai_key, streaming=True):
+    # All OpenAI traffic of the process queues through one shared rate limiter
+    client = limited_openai_client(openai_key)
+    llm = ChatOpenAI(model="gpt-4", temperature=0, openai_api_key=openai_key, client=client.chat.completions)
+    embedding = CachedEmbeddings(
+        OpenAIEmbeddings(model=EMBEDDING_MODEL, openai_api_key=openai_key, client=client.embeddings),
+        model_name=EMBEDDING_MODEL,
+        batch_size=EMBED_BATCH_SIZE,
+    )
+    # Final answers stream token by token into the UI; headless callers (batch_eval.py)
+    # pass streaming=False so every call reports its token usage
+    answer_llm = ChatOpenAI(model="gpt-4", temperature=0, openai_api_key=openai_key, streaming=streaming,
+                            client=client.chat.completions)
+    return build_chains(llm, answer_llm, embedding)
+
+
+def build_chains(llm, answer_llm, embedding):
+    """Prompts, chains and intent classifier around any chat models / embeddings."""
+    intent_prompt = PromptTemplate.from_template("""
+    Classify the user query into one of these categories:
+    - FACTUAL
+    - PROCEDURAL
+    - REASONING
+
+    Query: "{query}"
+    Respond with just one word: FACTUAL, PROCEDURAL, or REASONING.
+    """)
+    intent_chain = LLMChain(llm=llm, prompt=intent_prompt)
+
+    rewrite_prompt = PromptTemplate.from_template("""
+    The user asked a vague or unclear question:
+    "{question}"
+
+    Rewrite it to make it more specific for document search.
+    """)
+    rewrite_chain = LLMChain(llm=llm, prompt=rewrite_prompt)
+
+    qa_chain = load_qa_chain(answer_llm, chain_type="stuff")
+
+    llm_classifier = LLMIntentClassifier(intent_chain)
+    if INTENT_MODE == "llm":
+        intent_classifier = IntentClassifier(fallback=llm_classifier)
+    else:
+        intent_classifier = IntentClassifier(
+            local=[RuleIntentClassifier(), CentroidIntentClassifier(embedding)],
+            fallback=llm_classifier,
+            threshold=INTENT_THRESHOLD,
+        )
+    return AdaptiveModels(llm, embedding, intent_classifier, rewrite_chain, qa_chain)
+
+
+def new_index_cache():
+    return IndexCache(INDEX_CACHE_DIR, max_bytes=INDEX_CACHE_MAX_MB * 1024 * 1024)
+
+
+def _pdf_bytes(pdf):
+    """Bytes of an upload (anything with getvalue()) or of a file path."""
+    if hasattr(pdf, "getvalue"):
+        return pdf.getvalue()
+    with open(pdf, "rb") as f:
+        return f.read()
+
+
+def load_pdf_index(pdfs, embedding, index_cache, on_progress=None, on_built=None):
+    """
+    Return (index_key, FAISS index) for a set of PDFs (uploads or paths),
+    building it through the streaming ingestion pipeline on a cache miss.
+    `on_built(reused, embedded, dedup_report)` reports embedding cache hits
+    and the duplicate chunks dropped before embedding (report is None when
+    RAG_DEDUP_THRESHOLD=0).
+    """
+    # Key on the PDF bytes (order-independent) plus everything that shapes the index
+    file_hashes = sorted(content_key(_pdf_bytes(pdf)) for pdf in pdfs)
+    key = content_key(*file_hashes, f"chunk={CHUNK_SIZE}/{CHUNK_OVERLAP}", f"embedding={EMBEDDING_MODEL}",
+                      f"dedup={DEDUP_THRESHOLD}", settings_key())
+
+    def build():
+        hits, misses = embedding.hits, embedding.misses
+        chunks = iter_pdf_chunks(
+            pdfs,
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
+            max_workers=INGEST_WORKERS,
+            on_progress=on_progress,
+        )
+        # Repeated headers/footers and duplicated pages are dropped before they cost an embedding
+        dedup = ChunkDeduplicator(threshold=DEDUP_THRESHOLD) if DEDUP_THRESHOLD > 0 else None
+        if dedup:
+            chunks = dedup.filter(chunks)
+        # Large corpora get an IVF / quantized index instead of flat float32 (RAG_INDEX_TYPE)
+        index = compress_vectorstore(build_faiss_streaming(chunks, embedding, batch_size=EMBED_BATCH_SIZE))
+        if on_built:
+            on_built(embedding.hits - hits, embedding.misses - misses, dedup.report if dedup else None)
+        return index
+
+    vectorstore = index_cache.get_or_build(
+        key,
+        build=build,
+        save=lambda index, path: index.save_local(path),
+        load=lambda path: set_nprobe(FAISS.load_local(path, embedding, allow_dangerous_deserialization=True)),
+    )
+    return key, vectorstore
+
+
+def _ignore(level, message):
+    pass
+
+
+class AdaptiveRAG:
+    """
+    Rewrite -> classify intent -> retrieve (k by intent) -> answer, with the
+    "expand" and "regenerate" fallbacks. `notify(level, message)` receives
+    the user-facing status messages ("info", "warning", "caption").
+    """
+
+    def __init__(self, models, notify=None):
+        self.models = models
+        self.notify = notify or _ignore
+        self.packer = ContextPacker(CONTEXT_TOKEN_BUDGET, model="gpt-4") if CONTEXT_PACKING else None
+
+    def run(self, query, vectorstore, callbacks=None, mode=None):
+        mode = mode or PIPELINE_MODE
+        tracer = Tracer("adaptive_rag", question=query, mode=mode)
+        with tracer.track():
+            if mode == "concurrent":
+                answer, docs, details = asyncio.run(self._run_concurrent(query, vectorstore, tracer, callbacks))
+            else:
+                answer, docs, details = self._run_sequential(query, vectorstore, tracer, callbacks)
+            tracer.root.attributes.update(intent=details["intent"], fallbacks=details["fallbacks"])
+        return PipelineResult.from_trace(query, tracer, answer, docs, details)
+
+    def _rewrite(self, query, tracer, details):
+        if len(query.split()) < 4:
+            self.notify("warning", "Query too short. Rewriting...")
+            with tracer.span("rewrite", fallback=True):
+                query = self.models.rewrite_chain.run(question=query)
+            details["rewritten_query"] = query
+            details["fallbacks"].append("rewrite")
+        return query
+
+    def _pack(self, docs, tracer, details):
+        """Stitch overlapping chunks and fit them to the token budget; sources stay the retrieved chunks."""
+        if self.packer is None:
+            return docs
+        with tracer.span("pack", documents=len(docs)) as span:
+            packed, report = self.packer.pack(docs)
+            span.attributes.update(report.to_dict())
+        details["packing"] = report.to_dict()
+        details["context_tokens_saved"] = details.get("context_tokens_saved", 0) + report.tokens_saved
+        self.notify(
+            "caption",
+            f"📦 Context: {report.chunks_in} chunks packed into {report.passages_out} passages, "
+            f"{report.tokens_in} → {report.tokens_out} tokens ({report.tokens_saved} saved)",
+        )
+        return packed
+
+    def _answer(self, query, docs, k, fetch, tracer, details, callbacks):
+        context = self._pack(docs, tracer, details)
+        with tracer.span("generate", documents=len(context)):
+            answer = self.models.qa_chain.run(input_documents=context, question=query, callbacks=callbacks)
+
+        if len(answer.strip()) < 20:
+            self.notify("warning", "Weak answer. Regenerating...")
+            details["fallbacks"].append("regenerate")
+            with tracer.span("regenerate_retrieve", fallback=True, k=k + 3):
+                docs = fetch(k + 3)
+            context = self._pack(docs, tracer, details)
+            with tracer.span("regenerate", fallback=True, documents=len(context)):
+                answer = self.models.qa_chain.run(input_documents=context, question=query, callbacks=callbacks)
+        return answer, docs
+
+    def _run_sequential(self, query, vectorstore, tracer, callbacks):
+        details = {"fallbacks": []}
+        query = self._rewrite(query, tracer, details)
+
+        # Rules first, then nearest-centroid on the (cached) query embedding, LLM only when unsure
+        with tracer.span("intent") as span:
+            intent, source = self.models.intent_classifier.classify(query)
+            span.attributes.update(intent=intent, source=source)
+        self.notify("info", f"🧠 Detected Query Type: **{intent}** (via {source})")
+        details.update(intent=intent, intent_source=source)
+
+        k = INTENT_K.get(intent, 4)
+        with tracer.span("retrieve", k=DEFAULT_K):
+            docs = vectorstore.similarity_search(query, k=DEFAULT_K)
+
+        if len(docs) < k:
+            self.notify("warning", "Low context found. Expanding search...")
+            details["fallbacks"].append("expand")
+            k = k + 3
+            with tracer.span("expand", fallback=True, k=k):
+                docs = vectorstore.similarity_search(query, k=k)
+
+        answer, docs = self._answer(
+            query, docs, k, lambda n: vectorstore.similarity_search(query, k=n), tracer, details, callbacks
+        )
+        return answer, docs, details
+
+    async def _run_concurrent(self, query, vectorstore, tracer, callbacks):
+        """
+        Same steps and output as the sequential path, but intent classification
+        runs concurrently with one speculative over-fetch at MAX_FETCH_K. Flat
+        FAISS search is exact, so the default, "expand" and "regenerate"
+        retrievals are just prefixes of that ranking and never hit the index again.
+        """
+        details = {"fallbacks": []}
+        query = self._rewrite(query, tracer, details)
+
+        async def timed(fn, *args, **kwargs):
+            start = time.time_ns()
+            result = await asyncio.to_thread(fn, *args, **kwargs)
+            return result, start, time.time_ns()
+
+        start = time.perf_counter()
+        usage_before = tracer.snapshot()
+        ((intent, source), intent_start, intent_end), (ranked, search_start, search_end) = await asyncio.gather(
+            timed(self.models.intent_classifier.classify, query),
+            timed(vectorstore.similarity_search, query, k=MAX_FETCH_K),
+        )
+        wall_seconds = time.perf_counter() - start
+        # Retrieval makes no LLM calls, so any tokens used meanwhile belong to intent
+        intent_span = tracer.record("intent", intent_start, intent_end, intent=intent, source=source,
+                                    concurrent=True, **tracer.usage_since(usage_before))
+        search_span = tracer.record("retrieve", search_start, search_end, k=MAX_FETCH_K, concurrent=True)
+        intent_seconds, search_seconds = intent_span.duration, search_span.duration
+        self.notify("info", f"🧠 Detected Query Type: **{intent}** (via {source})")
+        details.update(intent=intent, intent_source=source)
+
+        k = INTENT_K.get(intent, 4)
+        docs = ranked[:DEFAULT_K]
+
+        if len(docs) < k:
+            self.notify("warning", "Low context found. Expanding search...")
+            details["fallbacks"].append("expand")
+            k = k + 3
+            # Served from the over-fetch: recorded for visibility, costs nothing
+            with tracer.span("expand", fallback=True, k=k, from_prefetch=True):
+                docs = ranked[:k]
+
+        answer, docs = self._answer(query, docs, k, lambda n: ranked[:n], tracer, details, callbacks)
+
+        saved = intent_seconds + search_seconds - wall_seconds
+        details["concurrency_seconds_saved"] = saved
+        logger.info(
+            "adaptive_rag concurrent: intent %.3fs + retrieval %.3fs ran in %.3fs wall (%.3fs saved)",
+            intent_seconds, search_seconds, wall_seconds, saved,
+        )
+        self.notify(
+            "caption",
+            f"⚡ Intent + retrieval ran concurrently: {wall_seconds:.2f}s instead of {intent_seconds + search_seconds:.2f}s",
+        )
+        return answer, docs, details
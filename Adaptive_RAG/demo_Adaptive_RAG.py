@@ -1,14 +1,20 @@
 import streamlit as st
-from langchain.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.vectorstores import FAISS
-from langchain.embeddings import OpenAIEmbeddings
-from langchain.chat_models import ChatOpenAI
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
-from langchain.chains.question_answering import load_qa_chain
-import tempfile
 import os
+import sys
+import uuid
+
+from adaptive_pipeline import AdaptiveRAG, build_models, load_pdf_index, new_index_cache
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag_common.rate_limit import render_limiter_metrics, session_scope
+from rag_common.semantic_cache import SemanticCache
+from rag_common.streaming import StreamlitTokenHandler
+from rag_common.tracing import render_latency_panel
+
+ANSWER_CACHE_THRESHOLD = float(os.getenv("RAG_ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = int(os.getenv("RAG_ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("RAG_ANSWER_CACHE_MAX_ENTRIES", "1000"))
+LATENCY_PANEL = os.getenv("RAG_LATENCY_PANEL", "") not in ("", "0", "false")
 
 st.set_page_config(page_title="Adaptive RAG App", layout="centered")
 st.title("📚 Adaptive RAG – AI Q&A over PDFs")
@@ -16,87 +22,115 @@ st.title("📚 Adaptive RAG – AI Q&A over PDFs")
 # === Step 0: Ask for OpenAI API Key ===
 openai_key = st.text_input("🔑 Enter your OpenAI API Key", type="password")
 
-if openai_key:
-    # === Load LLM and Chains (with key) ===
-    llm = ChatOpenAI(model="gpt-4", temperature=0, openai_api_key=openai_key)
-    embedding = OpenAIEmbeddings(openai_api_key=openai_key)
-
-    intent_prompt = PromptTemplate.from_template("""
-    Classify the user query into one of these categories:
-    - FACTUAL
-    - PROCEDURAL
-    - REASONING
-
-    Query: "{query}"
-    Respond with just one word: FACTUAL, PROCEDURAL, or REASONING.
-    """)
-    intent_chain = LLMChain(llm=llm, prompt=intent_prompt)
 
-    rewrite_prompt = PromptTemplate.from_template("""
-    The user asked a vague or unclear question:
-    "{question}"
+# === Shared resources (built once per process, reused across reruns and sessions) ===
+@st.cache_resource
+def get_index_cache():
+    return new_index_cache()
 
-    Rewrite it to make it more specific for document search.
-    """)
-    rewrite_chain = LLMChain(llm=llm, prompt=rewrite_prompt)
 
-    # === Helper Functions ===
-    def load_and_split_pdfs(uploaded_files):
-        documents = []
-        for uploaded_file in uploaded_files:
-            with tempfile.NamedTemporaryFile(delete=False) as tmp_file:
-                tmp_file.write(uploaded_file.read())
-                tmp_file_path = tmp_file.name
-            loader = PyPDFLoader(tmp_file_path)
-            documents.extend(loader.load())
-            os.remove(tmp_file_path)
-
-        splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-        return splitter.split_documents(documents)
-
-    def adaptive_rag(query, retriever):
-        if len(query.split()) < 4:
-            st.warning("Query too short. Rewriting...")
-            query = rewrite_chain.run(question=query)
-
-        intent = intent_chain.run(query=query).strip().upper()
-        st.info(f"🧠 Detected Query Type: **{intent}**")
+@st.cache_resource
+def get_answer_cache():
+    return SemanticCache(threshold=ANSWER_CACHE_THRESHOLD, ttl=ANSWER_CACHE_TTL, max_entries=ANSWER_CACHE_MAX_ENTRIES)
 
-        k = {"FACTUAL": 2, "PROCEDURAL": 5, "REASONING": 8}.get(intent, 4)
-        docs = retriever.get_relevant_documents(query)
 
-        if len(docs) < k:
-            st.warning("Low context found. Expanding search...")
-            k = k + 3
-            docs = retriever.vectorstore.similarity_search(query, k=k)
+@st.cache_resource
+def load_models(openai_key):
+    return build_models(openai_key)
 
-        qa_chain = load_qa_chain(llm, chain_type="stuff")
-        answer = qa_chain.run(input_documents=docs, question=query)
 
-        if len(answer.strip()) < 20:
-            st.warning("Weak answer. Regenerating...")
-            more_docs = retriever.vectorstore.similarity_search(query, k=k + 3)
-            answer = qa_chain.run(input_documents=more_docs, question=query)
+if openai_key:
+    # === Load LLM and Chains (with key) ===
+    models = load_models(openai_key)
+    embedding = models.embedding
+    pipeline = AdaptiveRAG(models, notify=lambda level, message: getattr(st, level)(message))
 
-        return answer
+    # === Helper Functions ===
+    def load_vectorstore(uploaded_files):
+        # Parse pages in a process pool; one progress bar per file
+        bars = [st.progress(0.0, text=f"📄 {f.name}") for f in uploaded_files]
+
+        def on_progress(index, name, pages_done, pages_total):
+            bars[index].progress(pages_done / max(pages_total, 1), text=f"📄 {name}: {pages_done}/{pages_total} pages")
+
+        def on_built(reused, embedded, dedup_report):
+            st.caption(f"🧮 Embedding cache: {reused} chunks reused, {embedded} sent to the model")
+            if dedup_report and dedup_report.removed:
+                savings = dedup_report.savings()
+                st.caption(
+                    f"✂️ Removed {dedup_report.removed} duplicate chunks of {dedup_report.chunks_in} "
+                    f"({dedup_report.exact_dropped} exact, {dedup_report.near_dropped} near) · "
+                    f"~{savings['embedding_tokens_saved']} embedding tokens "
+                    f"(${savings['embedding_cost_saved_usd']:.4f}) and "
+                    f"{savings['index_bytes_saved'] / 1024:.0f} KB of index saved"
+                )
+                with st.expander("Dropped duplicates"):
+                    st.dataframe([
+                        {
+                            "kind": d["kind"],
+                            "similarity": d["similarity"],
+                            "source": d["metadata"].get("source"),
+                            "page": d["metadata"].get("page"),
+                            "duplicate of": f"{d['duplicate_of'].get('source')} p.{d['duplicate_of'].get('page')}",
+                            "text": d["snippet"],
+                        }
+                        for d in dedup_report.dropped
+                    ], hide_index=True)
+
+        return load_pdf_index(uploaded_files, embedding, get_index_cache(), on_progress=on_progress, on_built=on_built)
+
+    def cached_adaptive_rag(query, vectorstore, scope, bypass=False, callbacks=None):
+        # Reuse the answer to a semantically equivalent question on the same PDF set
+        answer_cache = get_answer_cache()
+        query_vector = embedding.embed_query(query)
+        hit = answer_cache.lookup(scope, query_vector, bypass=bypass)
+        if hit:
+            st.info(f"♻️ Reusing the answer to a similar question: \"{hit['query']}\" (similarity {hit['similarity']:.2f})")
+            return hit["answer"], hit["sources"], []
+
+        result = pipeline.run(query, vectorstore, callbacks=callbacks)
+        answer_cache.store(scope, query, query_vector, result.answer, result.sources)
+        return result.answer, result.sources, result.spans
 
     # === File Upload ===
     uploaded_files = st.file_uploader("Upload one or more PDFs", type="pdf", accept_multiple_files=True)
 
     if uploaded_files:
         with st.spinner("Loading and processing..."):
-            chunks = load_and_split_pdfs(uploaded_files)
-            vectorstore = FAISS.from_documents(chunks, embedding)
-            retriever = vectorstore.as_retriever()
+            index_key, vectorstore = load_vectorstore(uploaded_files)
 
         st.success("✅ PDFs processed. Ask your question below:")
 
         query = st.text_input("🔍 Ask your question")
+        bypass_cache = st.checkbox("Bypass answer cache", value=False)
+        show_latency = st.checkbox("Show latency panel", value=LATENCY_PANEL)
         if query:
-            with st.spinner("Thinking..."):
-                result = adaptive_rag(query, retriever)
+            status = st.container()
             st.markdown("### ✅ Answer")
-            st.success(result)
+            answer_box = st.empty()
+            stream_handler = StreamlitTokenHandler(answer_box)
+            # OpenAI calls of this browser session queue fairly against the others
+            rate_limit_session = st.session_state.setdefault("rate_limit_session", uuid.uuid4().hex)
+            with status, st.spinner("Thinking..."), session_scope(rate_limit_session):
+                result, sources, spans = cached_adaptive_rag(
+                    query, vectorstore, index_key, bypass=bypass_cache, callbacks=[stream_handler]
+                )
+            answer_box.success(result)
+            st.caption(stream_handler.latency_caption())
+            if show_latency and spans:
+                with st.expander("⏱️ Latency by stage", expanded=True):
+                    render_latency_panel(st, spans)
+            with st.expander(f"📄 Sources ({len(sources)})"):
+                for doc in sources:
+                    st.markdown(f"**{doc.metadata.get('source', 'N/A')}**, page {doc.metadata.get('page', '?')}")
+                    st.markdown(f"*{doc.page_content[:300]}...*")
+
+        cache_stats = get_answer_cache().stats()
+        st.caption(
+            f"♻️ Answer cache: {cache_stats['hits']} hits / {cache_stats['hits'] + cache_stats['misses']} lookups "
+            f"({cache_stats['hit_rate']:.0%}), {cache_stats['entries']} entries"
+        )
+        render_limiter_metrics(st)
 
     else:
         st.info("Upload one or more PDF files to begin.")
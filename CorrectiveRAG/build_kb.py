@@ -0,0 +1,45 @@
+"""
+Build the file-backed Corrective RAG knowledge base.
+
+    python CorrectiveRAG/build_kb.py qa.jsonl more_qa.parquet --out CorrectiveRAG/kb_data
+
+Each record needs `q`/`a` (or `question`/`answer`) and an optional `topic`.
+Point the app at the result with CORRECTIVE_KB_DIR=CorrectiveRAG/kb_data.
+"""
+import argparse
+import time
+
+from langchain.embeddings import HuggingFaceEmbeddings
+
+from corrective_pipeline import EMBEDDING_MODEL_NAME as MODEL_NAME  # the model KBStore checks queries against
+from kb_store import build_kb
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help=".jsonl, .csv or .parquet files")
+    parser.add_argument("--out", required=True, help="output directory for the store")
+    parser.add_argument("--batch-size", type=int, default=512, help="records embedded per batch")
+    parser.add_argument("--default-topic", default="General", help="topic for records without one")
+    args = parser.parse_args()
+
+    embedding = HuggingFaceEmbeddings(
+        model_name=MODEL_NAME,
+        model_kwargs={"device": "cpu"},
+        encode_kwargs={"batch_size": 64, "normalize_embeddings": True},
+    )
+    start = time.perf_counter()
+    total = build_kb(
+        args.inputs,
+        args.out,
+        embedding,
+        MODEL_NAME,
+        batch_size=args.batch_size,
+        default_topic=args.default_topic,
+        on_progress=lambda n: print(f"\r{n} records embedded", end="", flush=True),
+    )
+    print(f"\nBuilt {total} records into {args.out} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
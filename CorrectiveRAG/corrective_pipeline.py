@@ -0,0 +1,188 @@
+"""
+Corrective RAG pipeline, importable without Streamlit.
+
+Used by demo_CorrectionRAG_prompt.py and by the headless batch runner
+(batch_eval.py at the repo root).
+"""
+from langchain.embeddings import HuggingFaceEmbeddings
+from langchain.vectorstores import FAISS
+from langchain.chat_models import ChatOpenAI
+from langchain.prompts import PromptTemplate
+from langchain_core.documents import Document
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag_common.pipeline import PipelineResult
+from rag_common.rate_limit import limited_openai_client
+from rag_common.tracing import Tracer
+from rag_common.vector_index import compress_vectorstore
+from relevance_gate import RelevanceGate, parse_refined_query, same_query
+
+KB_DIR = os.getenv("CORRECTIVE_KB_DIR", "")  # built with build_kb.py; falls back to SAMPLE_KB
+GATE_THRESHOLD = float(os.getenv("CORRECTIVE_GATE_THRESHOLD", "0.5"))
+GATE_CROSS_ENCODER = os.getenv("CORRECTIVE_GATE_CROSS_ENCODER", "")  # e.g. cross-encoder/ms-marco-MiniLM-L-6-v2
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+SAMPLE_KB = {
+    "General Science": [
+        {"q": "What is photosynthesis?", "a": "Photosynthesis is the process by which plants make food using sunlight."},
+        {"q": "Define gravity.", "a": "Gravity is the force that attracts objects towards each other."},
+    ],
+    "Climate": [
+        {"q": "What causes sea level rise?", "a": "Melting glaciers and thermal expansion of seawater due to climate change."},
+        {"q": "Effects of climate change on oceans?", "a": "Leads to warmer oceans, sea level rise, and ocean acidification."}
+    ],
+    "Physics": [
+        {"q": "Newton's second law?", "a": "Force equals mass times acceleration (F = ma)."},
+        {"q": "What is energy?", "a": "Energy is the capacity to do work."},
+    ],
+    "Computer Science": [
+        {"q": "Define overfitting in ML.", "a": "Overfitting occurs when a model memorizes training data and performs poorly on unseen data."},
+        {"q": "What is an algorithm?", "a": "A step-by-step procedure to solve a problem or perform a task."},
+    ]
+}
+
+# Auto Evaluation Prompt
+EVAL_PROMPT = PromptTemplate(
+    input_variables=["practice_query", "practice_context"],
+    template="""
+Evaluate the retrieved context against the query:
+
+Query: {practice_query}
+Context: {practice_context}
+
+EVALUATE_CONTEXT:
+- Relevance Score (0-1):
+- Completeness Score (0-1):
+- Accuracy Score (0-1):
+- Specificity Score (0-1):
+- Overall Quality: GOOD or POOR
+- Action Needed: Yes/No
+- Refined Query (if needed):
+- Reasoning:
+"""
+)
+
+ANSWER_PROMPT = PromptTemplate(
+    input_variables=["context", "question"],
+    template="""
+You are a helpful tutor. Use the context below to answer the question clearly.
+
+Context:
+{context}
+
+Question:
+{question}
+
+Answer:
+"""
+)
+
+
+def build_embedding_model():
+    return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME, model_kwargs={"device": "cpu"})
+
+
+def build_topic_index(topic, records, embedding):
+    documents = [Document(page_content=f"Q: {x['q']} A: {x['a']}", metadata={"topic": topic}) for x in records]
+    # Flat below RAG_INDEX_MIN_VECTORS, IVF / quantized above it
+    return compress_vectorstore(FAISS.from_documents(documents, embedding))
+
+
+def build_llms(openai_api_key, streaming=True):
+    """(evaluator llm, answer llm); the answer llm streams into the UI."""
+    # Both share the process-wide OpenAI rate limiter
+    client = limited_openai_client(openai_api_key).chat.completions
+    llm = ChatOpenAI(temperature=0, openai_api_key=openai_api_key, model="gpt-3.5-turbo", client=client)
+    answer_llm = ChatOpenAI(
+        temperature=0, openai_api_key=openai_api_key, model="gpt-3.5-turbo", streaming=streaming, client=client,
+    )
+    return llm, answer_llm
+
+
+def build_gate(embedding, cross_encoder_model=GATE_CROSS_ENCODER):
+    return RelevanceGate(embedding, cross_encoder_model=cross_encoder_model or None)
+
+
+def join_context(docs):
+    return "\n".join([doc.page_content for doc in docs])
+
+
+class CorrectiveRAG:
+    """
+    Retrieve -> evaluate (local relevance gate, or the LLM evaluator) ->
+    re-retrieve with the refined query if needed -> answer.
+    """
+
+    def __init__(self, llm, answer_llm, gate=None):
+        self.llm = llm
+        self.answer_llm = answer_llm
+        self.gate = gate
+
+    def run(self, query, retriever, use_gate=True, gate_threshold=GATE_THRESHOLD, context_docs=None,
+            query_vector=None, callbacks=None, on_evaluation=None, tracer=None):
+        """
+        `context_docs` skips the initial retrieval when the caller already has
+        it (pass the `tracer` that timed it to keep that span in the trace);
+        `on_evaluation(eval_result)` is called before the answer is generated.
+        """
+        tracer = tracer or Tracer("corrective_rag", question=query)
+        with tracer.track():
+            if context_docs is None:
+                with tracer.span("retrieve", k=getattr(retriever, "k", None)):
+                    context_docs = retriever.get_relevant_documents(query)
+            context = join_context(context_docs) or "No relevant context found."
+
+            gate_score = None
+            if self.gate is not None:
+                with tracer.span("gate") as span:
+                    gate_score = self.gate.score(query, context_docs, query_vector=query_vector)
+                    span.attributes.update(score=gate_score, threshold=gate_threshold, enabled=use_gate)
+
+            if use_gate and gate_score is not None and gate_score >= gate_threshold:
+                # Retrieval is already good: no evaluator call, no second retrieval
+                evaluator = "local"
+                eval_result = (
+                    f"Local relevance gate: score {gate_score:.2f} >= {gate_threshold:.2f}\n"
+                    f"- Overall Quality: GOOD\n- Action Needed: No\n- Refined Query (if needed): None"
+                )
+            else:
+                evaluator = "llm"
+                with tracer.span("evaluate") as span:
+                    eval_result = self.llm.predict(EVAL_PROMPT.format(practice_query=query, practice_context=context))
+                if self.gate is not None:
+                    self.gate.record_evaluator_latency(span.duration)
+
+            if on_evaluation:
+                on_evaluation(eval_result)
+
+            # Extract refined query or use original
+            refined_query = parse_refined_query(eval_result, query)
+
+            # Generate Final Answer (the same query would retrieve the same documents)
+            retrieval_reused = same_query(refined_query, query)
+            if retrieval_reused:
+                new_docs = context_docs
+            else:
+                with tracer.span("re_retrieve", fallback=True):
+                    new_docs = retriever.get_relevant_documents(refined_query)
+            new_context = join_context(new_docs)
+
+            with tracer.span("generate", documents=len(new_docs)):
+                answer = self.answer_llm.predict(
+                    ANSWER_PROMPT.format(context=new_context, question=refined_query), callbacks=callbacks
+                )
+            tracer.root.attributes.update(
+                evaluator=evaluator, gate_score=gate_score, fallbacks=[] if retrieval_reused else ["re_retrieve"]
+            )
+
+        return PipelineResult.from_trace(query, tracer, answer, new_docs, {
+            "initial_context": context,
+            "eval_result": eval_result,
+            "refined_query": refined_query,
+            "final_context": new_context,
+            "evaluator": evaluator,
+            "gate_score": gate_score,
+            "retrieval_reused": retrieval_reused,
+        })
@@ -1,15 +1,92 @@
 import streamlit as st
 import pandas as pd
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.vectorstores import FAISS
-from langchain.schema import Document
-from langchain.chat_models import ChatOpenAI
-from langchain.prompts import PromptTemplate
+import json
 import os
+import sys
+import uuid
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag_common.index_cache import content_key
+from rag_common.rate_limit import render_limiter_metrics, session_scope
+from rag_common.semantic_cache import SemanticCache
+from rag_common.streaming import StreamlitTokenHandler
+from rag_common.tracing import Tracer, render_latency_panel
+from kb_store import KBRetriever, KBStore
+from session_log import SessionLog
+from corrective_pipeline import (
+    EMBEDDING_MODEL_NAME, GATE_CROSS_ENCODER, GATE_THRESHOLD, KB_DIR, SAMPLE_KB, CorrectiveRAG, build_embedding_model,
+    build_gate, build_llms, build_topic_index, join_context,
+)
+
+ANSWER_CACHE_THRESHOLD = float(os.getenv("RAG_ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = int(os.getenv("RAG_ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("RAG_ANSWER_CACHE_MAX_ENTRIES", "1000"))
+LATENCY_PANEL = os.getenv("RAG_LATENCY_PANEL", "") not in ("", "0", "false")
+LOG_PAGE_SIZE = int(os.getenv("CORRECTIVE_LOG_PAGE_SIZE", "20"))
+# The log file holds every user's questions; only an operator deployment should browse other sessions
+LOG_ADMIN = os.getenv("CORRECTIVE_LOG_ADMIN", "") not in ("", "0", "false")
+
+
+@st.cache_resource
+def get_answer_cache():
+    # Shared by every session of this process
+    return SemanticCache(threshold=ANSWER_CACHE_THRESHOLD, ttl=ANSWER_CACHE_TTL, max_entries=ANSWER_CACHE_MAX_ENTRIES)
+
+
+# --- Load Documents by Topic ---
+kb = SAMPLE_KB
+
+# --- Shared Models & Indexes (built once per process, shared by all sessions) ---
+@st.cache_resource(show_spinner="Loading embedding model...")
+def load_embedding_model():
+    return build_embedding_model()
+
+
+@st.cache_resource(show_spinner="Building topic index...")
+def load_topic_index(topic, content_hash, _records):
+    """FAISS index for one topic; edited records get a new content_hash, so only that topic is rebuilt."""
+    return build_topic_index(topic, _records, load_embedding_model())
+
+
+def topic_content_hash(records):
+    return content_key(json.dumps(records, sort_keys=True))
+
+
+@st.cache_resource(show_spinner="Loading relevance gate...")
+def load_relevance_gate(cross_encoder_model):
+    return build_gate(load_embedding_model(), cross_encoder_model)
+
+
+@st.cache_resource
+def get_session_log():
+    # One SQLite file for every session of this process; rows are keyed by session id
+    return SessionLog()
+
+
+@st.cache_resource(show_spinner="Opening knowledge base...")
+def open_kb_store(path, manifest_mtime):
+    # Only reads the manifest and maps the vector files; a rebuild changes the mtime and reopens
+    return KBStore(path, model_name=EMBEDDING_MODEL_NAME)
+
+
+embedding = load_embedding_model()
+if KBStore.exists(KB_DIR):
+    kb_store = open_kb_store(KB_DIR, os.path.getmtime(os.path.join(KB_DIR, "manifest.json")))
+    topic_names = list(kb_store.topics)
+else:
+    # Warm every topic's index up front; reruns and topic switches are then dict lookups
+    kb_store = None
+    topic_names = list(kb)
+    topic_hashes = {name: topic_content_hash(records) for name, records in kb.items()}
+    topic_indexes = {name: load_topic_index(name, topic_hashes[name], records) for name, records in kb.items()}
 
 # --- Session Log ---
-if "log" not in st.session_state:
-    st.session_state.log = []
+# Rows go straight to disk (session_log.py); only the id lives in session state
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+session_log = get_session_log()
+if "gate_stats" not in st.session_state:
+    st.session_state.gate_stats = {"questions": 0, "llm_calls_saved": 0, "retrievals_saved": 0, "seconds_saved": 0.0}
 
 if st.button("🔄 Clear / Start Over"):
     st.session_state.clear()
@@ -20,33 +97,27 @@ st.sidebar.title("🔐 OpenAI Settings")
 openai_api_key = st.sidebar.text_input("Enter OpenAI API key", type="password")
 
 st.sidebar.title("📂 Knowledge Base")
-topic = st.sidebar.selectbox("Choose Topic", ["General Science", "Climate", "Physics", "Computer Science"])
+topic = st.sidebar.selectbox("Choose Topic", topic_names)
 
-# --- Load Documents by Topic ---
-kb = {
-    "General Science": [
-        {"q": "What is photosynthesis?", "a": "Photosynthesis is the process by which plants make food using sunlight."},
-        {"q": "Define gravity.", "a": "Gravity is the force that attracts objects towards each other."},
-    ],
-    "Climate": [
-        {"q": "What causes sea level rise?", "a": "Melting glaciers and thermal expansion of seawater due to climate change."},
-        {"q": "Effects of climate change on oceans?", "a": "Leads to warmer oceans, sea level rise, and ocean acidification."}
-    ],
-    "Physics": [
-        {"q": "Newton's second law?", "a": "Force equals mass times acceleration (F = ma)."},
-        {"q": "What is energy?", "a": "Energy is the capacity to do work."},
-    ],
-    "Computer Science": [
-        {"q": "Define overfitting in ML.", "a": "Overfitting occurs when a model memorizes training data and performs poorly on unseen data."},
-        {"q": "What is an algorithm?", "a": "A step-by-step procedure to solve a problem or perform a task."},
-    ]
-}
-
-# Vector DB Setup (FAISS)
-documents = [Document(page_content=f"Q: {x['q']} A: {x['a']}", metadata={"topic": topic}) for x in kb[topic]]
-embedding = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2",model_kwargs={"device": "cpu"})
-vectordb = FAISS.from_documents(documents, embedding)
-retriever = vectordb.as_retriever(search_kwargs={"k": 2})
+st.sidebar.title("⚡ Relevance Gate")
+use_gate = st.sidebar.checkbox("Skip LLM evaluation when retrieval is already good", value=True)
+gate_threshold = st.sidebar.slider("Local relevance threshold", 0.0, 1.0, GATE_THRESHOLD, 0.05)
+
+st.sidebar.title("♻️ Answer Cache")
+bypass_cache = st.sidebar.checkbox("Bypass answer cache", value=False)
+
+st.sidebar.title("⏱️ Tracing")
+show_latency = st.sidebar.checkbox("Show latency panel", value=LATENCY_PANEL)
+
+# Vector DB Setup (memory-mapped store, or FAISS over the sample kb)
+# Cached answers are only valid for the exact topic content they were produced from
+if kb_store:
+    retriever = KBRetriever(kb_store, topic, embedding, k=2)
+    cache_scope = f"{topic}:{kb_store.version}"
+else:
+    vectordb = topic_indexes[topic]
+    retriever = vectordb.as_retriever(search_kwargs={"k": 2})
+    cache_scope = f"{topic}:{topic_hashes[topic]}"
 
 # --- Main App ---
 st.title("📘 Corrective RAG - Educational QA Assistant")
@@ -54,93 +125,151 @@ st.title("📘 Corrective RAG - Educational QA Assistant")
 if not openai_api_key:
     st.warning("Please enter OpenAI API key to proceed.")
 else:
-    llm = ChatOpenAI(temperature=0, openai_api_key=openai_api_key, model="gpt-3.5-turbo")
+    llm, answer_llm = build_llms(openai_api_key)
 
     query = st.text_input("Ask a question:", placeholder="e.g. How does climate change affect sea levels?")
 
     if query:
-        context_docs = retriever.get_relevant_documents(query)
-        context = "\n".join([doc.page_content for doc in context_docs]) or "No relevant context found."
+        # The initial retrieval is the first span of this question's trace
+        tracer = Tracer("corrective_rag", question=query, topic=topic)
+        with tracer.span("retrieve") as retrieval_span:
+            context_docs = retriever.get_relevant_documents(query)
+        retrieval_seconds = retrieval_span.duration
+        context = join_context(context_docs) or "No relevant context found."
 
         st.subheader("📄 Initial Retrieved Context")
         st.markdown(f"**Query:** {query}")
         st.markdown(f"**Context:**\n\n{context}")
 
-        # Auto Evaluation Prompt
-        eval_prompt = PromptTemplate(
-            input_variables=["practice_query", "practice_context"],
-            template="""
-Evaluate the retrieved context against the query:
-
-Query: {practice_query}
-Context: {practice_context}
-
-EVALUATE_CONTEXT:
-- Relevance Score (0-1):
-- Completeness Score (0-1):
-- Accuracy Score (0-1):
-- Specificity Score (0-1):
-- Overall Quality: GOOD or POOR
-- Action Needed: Yes/No
-- Refined Query (if needed):
-- Reasoning:
-"""
-        )
-
-        filled_prompt = eval_prompt.format(practice_query=query, practice_context=context)
-
         if st.button("🤖 Auto Evaluate & Respond"):
-            eval_result = llm.predict(filled_prompt)
-            st.subheader("📊 Auto Evaluation Result")
-            st.text_area("Evaluation:", value=eval_result, height=300)
-
-            # Extract refined query or use original
-            if "Refined Query" in eval_result and ":" in eval_result:
-                lines = eval_result.splitlines()
-                refined_line = [line for line in lines if "Refined Query" in line]
-                refined_query = refined_line[0].split(":", 1)[1].strip() if refined_line else query
-            else:
-                refined_query = query
+            status = st.container()
+            st.subheader("✅ Final Response")
+            answer_box = st.empty()
+            stream_handler = StreamlitTokenHandler(answer_box)
 
-            # Generate Final Answer
-            new_docs = retriever.get_relevant_documents(refined_query)
-            new_context = "\n".join([doc.page_content for doc in new_docs])
+            def show_evaluation(eval_result):
+                # Rendered above the answer as soon as it is known, before the answer streams in
+                with status:
+                    st.subheader("📊 Auto Evaluation Result")
+                    st.text_area("Evaluation:", value=eval_result, height=300)
 
-            answer_prompt = PromptTemplate(
-                input_variables=["context", "question"],
-                template="""
-You are a helpful tutor. Use the context below to answer the question clearly.
+            answer_cache = get_answer_cache()
+            query_vector = embedding.embed_query(query)
+            cached = answer_cache.lookup(cache_scope, query_vector, bypass=bypass_cache)
 
-Context:
-{context}
+            if cached:
+                status.info(f"♻️ Reusing the answer to a similar question: \"{cached['query']}\" (similarity {cached['similarity']:.2f})")
+                eval_result = cached["eval_result"]
+                evaluator = "cache"
+                gate_score = None
+                refined_query = cached["refined_query"]
+                new_context = cached["final_context"]
+                final_answer = cached["answer"]
+                result = None
+                show_evaluation(eval_result)
+            else:
+                gate = load_relevance_gate(GATE_CROSS_ENCODER)
+                gate_stats = st.session_state.gate_stats
+                gate_stats["questions"] += 1
+                # OpenAI calls of this browser session queue fairly against the others
+                with session_scope(st.session_state.session_id):
+                    result = CorrectiveRAG(llm, answer_llm, gate=gate).run(
+                        query, retriever,
+                        use_gate=use_gate,
+                        gate_threshold=gate_threshold,
+                        context_docs=context_docs,
+                        query_vector=query_vector,
+                        callbacks=[stream_handler],
+                        on_evaluation=show_evaluation,
+                        tracer=tracer,
+                    )
+                details = result.details
+                eval_result, evaluator, gate_score = details["eval_result"], details["evaluator"], details["gate_score"]
+                refined_query, new_context, final_answer = details["refined_query"], details["final_context"], result.answer
 
-Question:
-{question}
+                if evaluator == "local":
+                    gate_stats["llm_calls_saved"] += 1
+                    gate_stats["seconds_saved"] += gate.average_evaluator_latency() or 0.0
+                if details["retrieval_reused"]:
+                    gate_stats["retrievals_saved"] += 1
+                    gate_stats["seconds_saved"] += retrieval_seconds
 
-Answer:
-"""
-            ).format(context=new_context, question=refined_query)
+                answer_cache.store(
+                    cache_scope, query, query_vector, final_answer, result.sources,
+                    eval_result=eval_result, refined_query=refined_query, final_context=new_context,
+                )
 
-            final_answer = llm.predict(answer_prompt)
-
-            st.subheader("✅ Final Response")
-            st.markdown(final_answer)
+            answer_box.markdown(final_answer)
+            st.caption(stream_handler.latency_caption())
+            if show_latency and result:
+                with st.expander("⏱️ Latency by stage", expanded=True):
+                    render_latency_panel(st, result.spans)
 
             # Log the session
-            st.session_state.log.append({
+            session_log.append(st.session_state.session_id, {
                 "Topic": topic,
                 "Query": query,
                 "Initial Context": context,
                 "Auto Evaluation": eval_result,
                 "Refined Query": refined_query,
                 "Final Context": new_context,
-                "Final Answer": final_answer
+                "Final Answer": final_answer,
+                "Answer Cache": "hit" if cached else "miss",
+                "Evaluator": evaluator,
+                "Gate Score": gate_score,
+                "Latency (s)": round(stream_handler.total_latency, 2),
+                "Stage Timings (s)": ", ".join(f"{stage}={seconds:.2f}" for stage, seconds in result.timings.items()) if result else None,
+                "Fallbacks": ", ".join(result.spans[0].attributes.get("fallbacks", [])) if result else None,
+                "Tokens": result.usage["total_tokens"] if result else None,
+                "Cost (USD)": round(result.usage["cost_usd"], 6) if result else None,
             })
 
-    # --- Download Logs ---
-    if st.session_state.log:
+        gate_stats = st.session_state.gate_stats
+        st.sidebar.caption(
+            f"This session: {gate_stats['llm_calls_saved']} of {gate_stats['questions']} evaluator calls and "
+            f"{gate_stats['retrievals_saved']} re-retrievals skipped, ~{gate_stats['seconds_saved']:.1f}s saved"
+        )
+
+        cache_stats = get_answer_cache().stats()
+        st.sidebar.caption(
+            f"{cache_stats['hits']} hits / {cache_stats['hits'] + cache_stats['misses']} lookups "
+            f"({cache_stats['hit_rate']:.0%}), {cache_stats['entries']} cached answers"
+        )
+        render_limiter_metrics(st.sidebar)
+
+    # --- Session Logs (one page rendered at a time, exports built on request) ---
+    log_sessions = {st.session_state.session_id: session_log.count(st.session_state.session_id)}
+    if LOG_ADMIN:
+        for session, rows, _ in session_log.sessions():
+            log_sessions.setdefault(session, rows)
+    log_sessions = {session: rows for session, rows in log_sessions.items() if rows}
+    if log_sessions:
         st.subheader("📋 Session Logs")
-        df = pd.DataFrame(st.session_state.log)
-        st.dataframe(df)
-        csv = df.to_csv(index=False).encode("utf-8")
-        st.download_button("📥 Download Log", data=csv, file_name="rag_session_log.csv", mime="text/csv")
+        if LOG_ADMIN:
+            shown = st.selectbox(
+                "Session", list(log_sessions),
+                format_func=lambda s: f"{'This session' if s == st.session_state.session_id else s[:8]} ({log_sessions[s]} rows)",
+            )
+        else:
+            shown = st.session_state.session_id
+        total = log_sessions[shown]
+        pages = (total + LOG_PAGE_SIZE - 1) // LOG_PAGE_SIZE
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=pages) if pages > 1 else 1
+        st.dataframe(pd.DataFrame(session_log.page(shown, (page - 1) * LOG_PAGE_SIZE, LOG_PAGE_SIZE)))
+
+        export_format = st.radio("Export format", ["CSV", "Parquet"], horizontal=True)
+        export = st.session_state.get("log_export")
+        if st.button("Prepare log export"):
+            with st.spinner("Exporting..."):
+                try:
+                    data = session_log.export_csv(shown) if export_format == "CSV" else session_log.export_parquet(shown)
+                except ImportError as e:
+                    st.error(str(e))
+                else:
+                    export = st.session_state.log_export = (shown, total, export_format, data)
+        # Only offer the bytes that match what is on screen; a new question makes them stale
+        if export and export[:3] == (shown, total, export_format):
+            extension, mime = ("csv", "text/csv") if export_format == "CSV" else ("parquet", "application/octet-stream")
+            st.download_button(
+                "📥 Download Log", data=export[3], file_name=f"rag_session_log.{extension}", mime=mime,
+            )
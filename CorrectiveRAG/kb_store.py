@@ -0,0 +1,254 @@
+"""
+File-backed, topic-partitioned knowledge base for Corrective RAG.
+
+Layout under the store root:
+
+    manifest.json                  {"model": ..., "dim": ..., "topics": {topic: {"dir": ..., "count": ...}}}
+    <build>/<topic-dir>/vectors.f32  float32 [count, dim] matrix of L2-normalized embeddings (memory-mapped)
+    <build>/<topic-dir>/records.jsonl
+    <build>/<topic-dir>/offsets.u64  byte offset of each record line, so hits are read lazily
+
+Each build writes a new <build> directory and then swaps manifest.json in
+one rename, so rebuilding in place never truncates files that a running
+app has mapped; older builds are deleted afterwards (open handles keep
+working on POSIX). Opening a store only reads the manifest and maps the
+vector files; no Document objects are created until a search returns its
+top-k hits.
+"""
+import csv
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+
+MANIFEST = "manifest.json"
+BUILD_PREFIX = "build-"
+PARTITION_FILES = ("vectors.f32", "records.jsonl", "offsets.u64")
+
+
+def read_records(path, batch_size=10000):
+    """Stream Q/A records (dicts) from a .jsonl, .csv or .parquet file."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".jsonl", ".json"):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif ext == ".csv":
+        with open(path, encoding="utf-8", newline="") as f:
+            yield from csv.DictReader(f)
+    elif ext == ".parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Reading .parquet knowledge bases requires `pip install pyarrow`.")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+            yield from batch.to_pylist()
+    else:
+        raise ValueError(f"Unsupported knowledge base file type: {path}")
+
+
+def record_text(record):
+    question = record.get("q") or record.get("question") or ""
+    answer = record.get("a") or record.get("answer") or ""
+    return f"Q: {question} A: {answer}"
+
+
+def _topic_dir(topic):
+    # Readable slug plus a hash of the exact name: "Computer Science" and "computer science" stay apart
+    slug = re.sub(r"[^\w-]+", "_", topic).strip("_").lower()[:40] or "default"
+    return f"{slug}-{hashlib.sha256(topic.encode('utf-8')).hexdigest()[:8]}"
+
+
+def _read_manifest(root):
+    with open(os.path.join(root, MANIFEST), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class KBWriter:
+    """
+    Appends records and their vectors to a store, one partition per topic.
+    A partition's files are only open while a batch is written, so the
+    number of topics is not bounded by the file descriptor limit.
+    """
+
+    def __init__(self, root, model_name):
+        self.root = root
+        self.model_name = model_name
+        self.dim = None
+        self.topics = {}
+        self._record_bytes = {}
+        self.build = f"{BUILD_PREFIX}{time.time_ns()}"
+        os.makedirs(os.path.join(root, self.build))
+
+    def _open_topic(self, topic):
+        relative = os.path.join(self.build, _topic_dir(topic))
+        directory = os.path.join(self.root, relative)
+        if topic not in self.topics:
+            # First batch of this topic in this build: start its files empty
+            if any(info["dir"] == relative for info in self.topics.values()):
+                raise ValueError(f"Topic {topic!r} maps to the same directory as another topic")
+            os.makedirs(directory)
+            for name in PARTITION_FILES:
+                open(os.path.join(directory, name), "wb").close()
+            self.topics[topic] = {"dir": relative, "count": 0}
+            self._record_bytes[topic] = 0
+        return [open(os.path.join(directory, name), "ab") for name in PARTITION_FILES]
+
+    def add(self, topic, records, vectors):
+        vectors = _normalize_rows(vectors)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension changed from {self.dim} to {vectors.shape[1]}")
+        vector_file, record_file, offset_file = self._open_topic(topic)
+        with vector_file, record_file, offset_file:
+            vector_file.write(vectors.tobytes())
+            offsets = []
+            position = self._record_bytes[topic]
+            for record in records:
+                line = json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+                offsets.append(position)
+                record_file.write(line)
+                position += len(line)
+            offset_file.write(np.asarray(offsets, dtype=np.uint64).tobytes())
+        self._record_bytes[topic] = position
+        self.topics[topic]["count"] += len(records)
+
+    def close(self):
+        try:
+            previous = {info["dir"] for info in _read_manifest(self.root)["topics"].values()}
+        except (OSError, ValueError, KeyError):
+            previous = set()
+        path = os.path.join(self.root, MANIFEST)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"model": self.model_name, "dim": self.dim, "topics": self.topics}, f, indent=2)
+        os.replace(path + ".tmp", path)
+        # Readers opening the store from now on see only this build; remove the older ones
+        stale = {d.replace(os.sep, "/").split("/")[0] for d in previous}
+        stale.update(name for name in os.listdir(self.root) if name.startswith(BUILD_PREFIX))
+        stale.discard(self.build)
+        for name in stale:
+            shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+
+def build_kb(paths, root, embedding, model_name, batch_size=512, default_topic="General", on_progress=None):
+    """
+    Stream records from `paths`, embed them in batches (per topic) and write
+    a memory-mappable store to `root`. Returns the number of records written.
+    """
+    writer = KBWriter(root, model_name)
+    buffers = {}
+    total = 0
+
+    def flush(topic):
+        records = buffers.pop(topic)
+        writer.add(topic, records, embedding.embed_documents([record_text(r) for r in records]))
+
+    for path in paths:
+        for record in read_records(path):
+            topic = record.get("topic") or default_topic
+            buffers.setdefault(topic, []).append(record)
+            total += 1
+            if len(buffers[topic]) >= batch_size:
+                flush(topic)
+                if on_progress:
+                    on_progress(total)
+    for topic in list(buffers):
+        flush(topic)
+    writer.close()
+    return total
+
+
+class KBStore:
+    """
+    Read-only view over a built store. Every partition is mapped (and its
+    records file opened) up front, so a rebuild that swaps in a new build and
+    deletes this one cannot pull files out from under a running app; pages
+    are still only read when a search touches them. Pass the `model_name` queries will be embedded with: a store built with
+    another model raises ValueError instead of returning meaningless hits.
+    """
+
+    def __init__(self, root, model_name=None):
+        self.root = root
+        manifest = _read_manifest(root)
+        if model_name is not None and manifest["model"] != model_name:
+            raise ValueError(
+                f"Knowledge base at {root} was built with {manifest['model']!r}, but queries use {model_name!r}; "
+                "rebuild it with build_kb.py"
+            )
+        self.model_name = manifest["model"]
+        self.dim = manifest["dim"]
+        self.topics = manifest["topics"]
+        self.version = str(os.path.getmtime(os.path.join(root, MANIFEST)))
+        self._lock = threading.Lock()
+        self._maps = {topic: self._map(info) for topic, info in self.topics.items()}
+
+    @staticmethod
+    def exists(root):
+        return bool(root) and os.path.isfile(os.path.join(root, MANIFEST))
+
+    def _map(self, info):
+        directory = os.path.join(self.root, info["dir"])
+        count = info["count"]
+        vectors = np.memmap(os.path.join(directory, "vectors.f32"), dtype=np.float32, mode="r", shape=(count, self.dim))
+        offsets = np.memmap(os.path.join(directory, "offsets.u64"), dtype=np.uint64, mode="r", shape=(count,))
+        return vectors, offsets, open(os.path.join(directory, "records.jsonl"), "rb")
+
+    def _partition(self, topic):
+        return self._maps[topic]
+
+    def search(self, topic, query_vector, k=2, block_rows=65536):
+        """Return [(score, Document)] for the k most similar records in `topic`."""
+        vectors, offsets, records = self._partition(topic)
+        query = _normalize_rows([query_vector])[0]
+        best_scores = np.empty(0, dtype=np.float32)
+        best_ids = np.empty(0, dtype=np.int64)
+        # Scan in blocks so only a window of the mapped matrix is touched at a time
+        for start in range(0, len(vectors), block_rows):
+            scores = vectors[start:start + block_rows] @ query
+            best_scores = np.concatenate([best_scores, scores])
+            best_ids = np.concatenate([best_ids, np.arange(start, start + len(scores))])
+            if len(best_scores) > k:
+                keep = np.argpartition(-best_scores, k)[:k]
+                best_scores, best_ids = best_scores[keep], best_ids[keep]
+        order = np.argsort(-best_scores)
+
+        hits = []
+        with self._lock:
+            lines = []
+            for i in order:
+                records.seek(int(offsets[best_ids[i]]))
+                lines.append(records.readline())
+        for i, line in zip(order, lines):
+            record = json.loads(line)
+            doc = Document(page_content=record_text(record), metadata={"topic": topic, "row": int(best_ids[i])})
+            hits.append((float(best_scores[i]), doc))
+        return hits
+
+
+class KBRetriever:
+    """Minimal retriever over one topic of a KBStore (same call shape as the FAISS retriever)."""
+
+    def __init__(self, store, topic, embedding, k=2):
+        self.store = store
+        self.topic = topic
+        self.embedding = embedding
+        self.k = k
+
+    def get_relevant_documents(self, query):
+        return [doc for _, doc in self.store.search(self.topic, self.embedding.embed_query(query), k=self.k)]
+
+    invoke = get_relevant_documents
@@ -0,0 +1,74 @@
+"""
+Local relevance gate for the Corrective RAG evaluate step.
+
+Scores how well the retrieved context matches the query on CPU, either by
+cosine similarity with the MiniLM embeddings the app already loads or with
+an optional sentence-transformers cross-encoder. Only context scoring below
+the threshold is sent to the LLM evaluator.
+"""
+import math
+import threading
+
+import numpy as np
+
+NO_REFINEMENT = {"", "none", "n/a", "na", "no", "not needed", "not applicable", "-", "same", "same as above"}
+
+
+def parse_refined_query(eval_result, query):
+    """Pull the "Refined Query" line out of the evaluator's free text, or return `query`."""
+    for line in eval_result.splitlines():
+        if "Refined Query" in line and ":" in line:
+            refined = line.split(":", 1)[1].strip().strip("\"'` ")
+            if refined.lower().rstrip(".") not in NO_REFINEMENT:
+                return refined
+            break
+    return query
+
+
+def same_query(a, b):
+    return " ".join(a.lower().split()).rstrip("?.! ") == " ".join(b.lower().split()).rstrip("?.! ")
+
+
+class RelevanceGate:
+    """
+    `score(query, docs)` returns a 0-1 relevance estimate; callers skip the
+    LLM evaluator when it reaches their threshold. The gate also keeps a
+    running average of real evaluator latency so skipped calls can be
+    reported as time saved.
+    """
+
+    def __init__(self, embedding, cross_encoder_model=None):
+        self.embedding = embedding
+        self.cross_encoder = None
+        if cross_encoder_model:
+            try:
+                from sentence_transformers import CrossEncoder
+            except ImportError:
+                raise ImportError("The cross-encoder gate requires `pip install sentence-transformers`.")
+            self.cross_encoder = CrossEncoder(cross_encoder_model, device="cpu")
+        self._lock = threading.Lock()
+        self._eval_seconds = 0.0
+        self._eval_calls = 0
+
+    def score(self, query, docs, query_vector=None):
+        if not docs:
+            return 0.0
+        texts = [doc.page_content for doc in docs]
+        if self.cross_encoder is not None:
+            logits = self.cross_encoder.predict([(query, text) for text in texts])
+            return max(1 / (1 + math.exp(-float(logit))) for logit in logits)
+        if query_vector is None:
+            query_vector = self.embedding.embed_query(query)
+        q = np.asarray(query_vector, dtype=np.float32)
+        d = np.asarray(self.embedding.embed_documents(texts), dtype=np.float32)
+        sims = d @ q / (np.linalg.norm(d, axis=1) * np.linalg.norm(q) + 1e-12)
+        return float(sims.max())
+
+    def record_evaluator_latency(self, seconds):
+        with self._lock:
+            self._eval_seconds += seconds
+            self._eval_calls += 1
+
+    def average_evaluator_latency(self):
+        with self._lock:
+            return self._eval_seconds / self._eval_calls if self._eval_calls else None
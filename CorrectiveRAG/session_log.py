@@ -0,0 +1,166 @@
+"""
+Append-only on-disk log of CorrectiveRAG interactions.
+
+Each question's row (query, contexts, evaluation, answer, timings...) is
+written to a local SQLite file as it happens instead of accumulating in
+st.session_state, so memory does not grow with the session and the log
+survives restarts. The app reads back one page at a time, and CSV /
+Parquet exports are streamed from the file in batches only when asked for.
+"""
+import csv
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+DEFAULT_PATH = os.getenv(
+    "CORRECTIVE_SESSION_LOG",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "corrective_session_log.sqlite"),
+)
+EXPORT_BATCH = 1000
+
+
+class SessionLog:
+    """
+    Rows are JSON objects keyed by session id, in insertion order. Safe to
+    share between Streamlit sessions (one connection, WAL, a lock).
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS log (id INTEGER PRIMARY KEY AUTOINCREMENT, session TEXT, created REAL, row TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS log_session ON log (session, id)")
+        self._conn.commit()
+
+    def append(self, session, row):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO log (session, created, row) VALUES (?, ?, ?)",
+                (session, time.time(), json.dumps(row, default=str, ensure_ascii=False)),
+            )
+            self._conn.commit()
+
+    def count(self, session):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM log WHERE session = ?", (session,)).fetchone()[0]
+
+    def sessions(self, limit=20):
+        """(session, rows, last write time) of the most recently written sessions."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT session, COUNT(*), MAX(created) FROM log GROUP BY session ORDER BY MAX(created) DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+
+    def page(self, session, offset, limit):
+        """Rows offset..offset+limit of a session, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT created, row FROM log WHERE session = ? ORDER BY id LIMIT ? OFFSET ?", (session, limit, offset),
+            ).fetchall()
+        return [_decode(created, row) for created, row in rows]
+
+    def iter_rows(self, session, batch_size=EXPORT_BATCH):
+        """Every row of a session, read in batches so exports never load the whole log."""
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT id, created, row FROM log WHERE session = ? AND id > ? ORDER BY id LIMIT ?",
+                    (session, last_id, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [_decode(created, row) for _, created, row in rows]
+
+    def columns(self, session):
+        """Column names across all of a session's rows, in first-seen order."""
+        names = {}
+        for batch in self.iter_rows(session):
+            for row in batch:
+                names.update(dict.fromkeys(row))
+        return list(names)
+
+    def export_csv(self, session):
+        columns = self.columns(session)
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns)
+        writer.writeheader()
+        for batch in self.iter_rows(session):
+            writer.writerows(batch)
+        return buffer.getvalue().encode("utf-8")
+
+    def export_parquet(self, session):
+        """Parquet bytes written one row group per batch (pip install pyarrow)."""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet export needs pyarrow: pip install pyarrow")
+        schema = pa.schema([(name, _arrow_type(pa, kind)) for name, kind in self._column_kinds(session).items()])
+        buffer = io.BytesIO()
+        with pq.ParquetWriter(buffer, schema) as writer:
+            for batch in self.iter_rows(session):
+                columns = {name: [_arrow_value(row.get(name), field.type, pa) for row in batch]
+                           for name, field in zip(schema.names, schema)}
+                writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+        return buffer.getvalue()
+
+    def _column_kinds(self, session):
+        """Column -> "int" / "float" / "bool" / "str", from every value seen (None is ignored)."""
+        kinds = {}
+        for batch in self.iter_rows(session):
+            for row in batch:
+                for name, value in row.items():
+                    kinds[name] = _widen(kinds.get(name), value)
+        return kinds
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _decode(created, row):
+    return {"Logged At": datetime.fromtimestamp(created, timezone.utc).isoformat(timespec="seconds"), **json.loads(row)}
+
+
+def _widen(kind, value):
+    if value is None:
+        return kind
+    if isinstance(value, bool):
+        new = "bool"
+    elif isinstance(value, int):
+        new = "int"
+    elif isinstance(value, float):
+        new = "float"
+    else:
+        new = "str"
+    if kind is None or kind == new:
+        return new
+    if {kind, new} == {"int", "float"}:
+        return "float"
+    return "str"
+
+
+def _arrow_type(pa, kind):
+    return {"int": pa.int64(), "float": pa.float64(), "bool": pa.bool_()}.get(kind, pa.string())
+
+
+def _arrow_value(value, arrow_type, pa):
+    if value is None:
+        return None
+    if arrow_type == pa.string():
+        return value if isinstance(value, str) else json.dumps(value, default=str, ensure_ascii=False)
+    if arrow_type == pa.float64():
+        return float(value)
+    return value
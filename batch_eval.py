@@ -0,0 +1,279 @@
+"""
+Headless batch evaluation of the RAG pipelines.
+
+Runs a JSONL file of questions through the Adaptive, Corrective or website
+pipeline without Streamlit and writes one row per question with the answer,
+sources, per-stage timings and token usage / cost. Rows are written as
+questions complete (in completion order), so memory stays flat and an
+interrupted run keeps what it finished:
+
+    python batch_eval.py --pipeline adaptive --pdf a.pdf b.pdf --input questions.jsonl --output results.jsonl
+    python batch_eval.py --pipeline corrective --input questions.jsonl --output results.parquet
+    python batch_eval.py --pipeline web --url https://example.com --input questions.jsonl --output results.jsonl
+
+Input lines look like {"id": "q1", "question": "...", "topic": "Climate"};
+only "question" is required ("topic" is used by the corrective pipeline).
+The OpenAI key is read from --openai-key or OPENAI_API_KEY.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from rag_common.pipeline import PipelineResult
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+logger = logging.getLogger("batch_eval")
+COLUMNS = ["id", "question", "answer", "sources", "timings", "usage", "details", "spans", "error", "latency_seconds"]
+PARQUET_ROW_GROUP = 100
+
+
+def read_questions(path):
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if "question" not in item:
+                raise ValueError(f"{path}:{line_number}: missing \"question\"")
+            item.setdefault("id", str(line_number))
+            questions.append(item)
+    return questions
+
+
+def _flatten(row):
+    # Nested columns are kept as JSON strings so any reader can load the table
+    return {key: json.dumps(value, default=str, ensure_ascii=False) if isinstance(value, (dict, list)) else value
+            for key, value in row.items()}
+
+
+class ResultWriter:
+    """
+    Appends result rows to a .jsonl, .csv or .parquet file as they arrive.
+    JSONL and CSV lines are flushed per row; Parquet is written one row group
+    per PARQUET_ROW_GROUP rows (pip install pyarrow).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._pending = []
+        self._parquet = None
+        if path.endswith(".parquet"):
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError("Writing .parquet output needs pyarrow: pip install pyarrow")
+            self._pa = pa
+            self._schema = pa.schema([(name, pa.float64() if name == "latency_seconds" else pa.string())
+                                      for name in COLUMNS])
+            self._parquet = pq.ParquetWriter(path, self._schema)
+            self._file = None
+        else:
+            self._file = open(path, "w", encoding="utf-8", newline="")
+            self._csv = csv.DictWriter(self._file, fieldnames=COLUMNS) if not path.endswith(".jsonl") else None
+            if self._csv:
+                self._csv.writeheader()
+
+    def write(self, row):
+        if self._parquet is not None:
+            flat = _flatten(row)
+            flat["id"] = str(flat["id"])
+            self._pending.append(flat)
+            if len(self._pending) >= PARQUET_ROW_GROUP:
+                self._flush_parquet()
+            return
+        if self._csv:
+            self._csv.writerow(_flatten(row))
+        else:
+            self._file.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+        self._file.flush()
+
+    def _flush_parquet(self):
+        if self._pending:
+            self._parquet.write_table(self._pa.Table.from_pylist(self._pending, schema=self._schema))
+            self._pending = []
+
+    def close(self):
+        if self._parquet is not None:
+            self._flush_parquet()
+            self._parquet.close()
+        else:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --- Pipeline builders: each returns run(item) -> PipelineResult ---
+def adaptive_runner(args):
+    sys.path.append(os.path.join(ROOT, "Adaptive_RAG"))
+    from adaptive_pipeline import AdaptiveRAG, build_models, load_pdf_index, new_index_cache
+
+    if not args.pdf:
+        raise SystemExit("--pipeline adaptive needs --pdf")
+    # Non-streaming models so token usage is reported for every call
+    models = build_models(args.openai_key, streaming=False)
+    _, vectorstore = load_pdf_index(args.pdf, models.embedding, new_index_cache())
+    pipeline = AdaptiveRAG(models, notify=lambda level, message: logger.info(message))
+    return lambda item: pipeline.run(item["question"], vectorstore, mode=args.mode)
+
+
+def corrective_runner(args):
+    sys.path.append(os.path.join(ROOT, "CorrectiveRAG"))
+    from corrective_pipeline import (
+        EMBEDDING_MODEL_NAME, KB_DIR, SAMPLE_KB, CorrectiveRAG, build_embedding_model, build_gate, build_llms,
+        build_topic_index,
+    )
+    from kb_store import KBRetriever, KBStore
+
+    embedding = build_embedding_model()
+    kb_dir = args.kb_dir or KB_DIR
+    if KBStore.exists(kb_dir):
+        store = KBStore(kb_dir, model_name=EMBEDDING_MODEL_NAME)
+        topics = list(store.topics)
+
+        def retriever_for(topic):
+            return KBRetriever(store, topic, embedding, k=2)
+    else:
+        topics = list(SAMPLE_KB)
+
+        def retriever_for(topic):
+            return build_topic_index(topic, SAMPLE_KB[topic], embedding).as_retriever(search_kwargs={"k": 2})
+
+    llm, answer_llm = build_llms(args.openai_key, streaming=False)
+    gate = build_gate(embedding)
+    pipeline = CorrectiveRAG(llm, answer_llm, gate=gate)
+    # Built up front; the worker threads then only read
+    retrievers = {topic: retriever_for(topic) for topic in topics}
+
+    def run(item):
+        topic = item.get("topic") or args.topic or topics[0]
+        if topic not in retrievers:
+            raise ValueError(f"unknown topic {topic!r}; available: {', '.join(topics)}")
+        kwargs = {"use_gate": not args.no_gate}
+        if args.gate_threshold is not None:
+            kwargs["gate_threshold"] = args.gate_threshold
+        result = pipeline.run(item["question"], retrievers[topic], **kwargs)
+        result.details["topic"] = topic
+        return result
+
+    return run
+
+
+def web_runner(args):
+    from langchain_community.vectorstores import Chroma
+    from web_pipeline import WebQA, build_embeddings, load_url_chunks
+
+    if not args.url:
+        raise SystemExit("--pipeline web needs --url")
+    _, chunks, _ = load_url_chunks(args.url)
+    vectorstore = Chroma.from_documents(chunks, build_embeddings(args.openai_key))
+    web_qa = WebQA(vectorstore, api_key=args.openai_key, streaming=False)
+    return lambda item: web_qa.run(item["question"])
+
+
+RUNNERS = {"adaptive": adaptive_runner, "corrective": corrective_runner, "web": web_runner}
+
+
+def evaluate(run, questions, workers=1, snippet_chars=300):
+    """
+    Run every question (optionally in parallel) and yield its row as soon as
+    it completes; failures become rows with an error.
+    """
+
+    def one(item):
+        start = time.perf_counter()
+        try:
+            result = run(item)
+        except Exception as e:
+            logger.exception("question %s failed", item["id"])
+            result = PipelineResult(question=item["question"], error=f"{type(e).__name__}: {e}")
+        row = {"id": item["id"], **result.to_record(snippet_chars=snippet_chars)}
+        row["latency_seconds"] = time.perf_counter() - start
+        logger.info("%s done in %.2fs", item["id"], row["latency_seconds"])
+        return row
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        futures = [pool.submit(one, item) for item in questions]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+class RunSummary:
+    """Totals over the rows seen so far; only latencies are kept per row."""
+
+    def __init__(self):
+        self.questions = 0
+        self.failed = 0
+        self.total_tokens = 0
+        self.cost_usd = 0.0
+        self.context_tokens_saved = 0
+        self.latencies = []
+
+    def add(self, row):
+        self.questions += 1
+        if row["error"]:
+            self.failed += 1
+            return
+        self.total_tokens += row["usage"].get("total_tokens", 0)
+        self.cost_usd += row["usage"].get("cost_usd", 0.0)
+        self.context_tokens_saved += row["details"].get("context_tokens_saved", 0)
+        self.latencies.append(row["latency_seconds"])
+
+    def as_dict(self):
+        summary = {
+            "questions": self.questions,
+            "failed": self.failed,
+            "total_tokens": self.total_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+            "context_tokens_saved": self.context_tokens_saved,
+        }
+        if self.latencies:
+            latencies = sorted(self.latencies)
+            summary["latency_p50"] = latencies[len(latencies) // 2]
+            summary["latency_max"] = latencies[-1]
+        return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a question set through a RAG pipeline without the UI.")
+    parser.add_argument("--pipeline", choices=sorted(RUNNERS), required=True)
+    parser.add_argument("--input", required=True, help="JSONL with one {\"question\": ...} per line")
+    parser.add_argument("--output", required=True, help=".jsonl, .parquet or .csv")
+    parser.add_argument("--workers", type=int, default=4, help="questions run in parallel")
+    parser.add_argument("--openai-key", default=os.getenv("OPENAI_API_KEY"))
+    parser.add_argument("--pdf", nargs="+", help="adaptive: PDF files to index")
+    parser.add_argument("--mode", choices=["concurrent", "sequential"], help="adaptive: pipeline mode")
+    parser.add_argument("--kb-dir", help="corrective: knowledge base built with build_kb.py (default: sample kb)")
+    parser.add_argument("--topic", help="corrective: topic for questions without one")
+    parser.add_argument("--no-gate", action="store_true", help="corrective: always call the LLM evaluator")
+    parser.add_argument("--gate-threshold", type=float, help="corrective: local relevance threshold")
+    parser.add_argument("--url", help="web: page to load")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if not args.openai_key:
+        raise SystemExit("Set OPENAI_API_KEY or pass --openai-key")
+
+    questions = read_questions(args.input)
+    run = RUNNERS[args.pipeline](args)
+    summary = RunSummary()
+    with ResultWriter(args.output) as writer:
+        for row in evaluate(run, questions, workers=args.workers):
+            writer.write(row)
+            summary.add(row)
+    print(json.dumps(summary.as_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Bulk email benchmark against a local aiosmtpd server (pip install aiosmtpd).
+
+    python benchmarks/bench_email.py --messages 2000 --connections 1 4 8 --output email.json
+    python benchmarks/bench_email.py --latency 0.02 --transient 0.05 --bounce 0.01
+
+The stand-in server sleeps --latency seconds per command (a remote server
+is never 0 ms away), answers 451 to the first attempt of a --transient
+fraction of recipients and 550 to a --bounce fraction. Each run checks
+that every non-bounced message arrived exactly once with the right envelope
+sender, that the sent / failed counts match, that bounces are reported as
+failed without retries and that transient failures were retried; a failed
+check exits non-zero once the report is written.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import sys
+import time
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.append(ROOT)
+
+from bulk_email import SMTPConnection, send_bulk
+
+from bench_pipelines import check, git_commit
+
+
+class StandInHandler:
+    def __init__(self, latency, transient, bounce):
+        self.latency = latency
+        self.transient = set(transient)
+        self.bounce = set(bounce)
+        self.delivered = []
+        self.senders = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        await asyncio.sleep(self.latency)
+        if address in self.bounce:
+            return "550 5.1.1 No such user"
+        if address in self.transient:
+            self.transient.discard(address)
+            return "451 4.3.0 Try again later"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(self.latency)
+        self.delivered.extend(envelope.rcpt_tos)
+        self.senders.append(envelope.mail_from)
+        return "250 Message accepted"
+
+
+def start_server(handler):
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError:
+        raise ImportError("bench_email.py needs aiosmtpd: pip install aiosmtpd")
+    # Controller can't pick its own port (it connects to it to check startup)
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    return controller, port
+
+
+def run(args, connections):
+    rows = [{"email": f"user{i:06d}@example.com", "name": f"User {i}"} for i in range(args.messages)]
+    step = lambda fraction: max(1, round(1 / fraction)) if fraction else 0
+    bounce = {row["email"] for i, row in enumerate(rows) if step(args.bounce) and i % step(args.bounce) == 1}
+    transient = {row["email"] for i, row in enumerate(rows) if step(args.transient) and i % step(args.transient) == 2}
+    handler = StandInHandler(args.latency, transient - bounce, bounce)
+    controller, port = start_server(handler)
+    try:
+        start = time.perf_counter()
+        results = send_bulk(
+            rows, "Hello {name}", "Hi {name},\n\nYour notification.\n.\nRegards", sender="bench@example.com",
+            connections=connections, rate=args.rate, backoff=0.01,
+            connect=lambda: SMTPConnection("127.0.0.1", port, user="", starttls=False),
+        )
+        seconds = time.perf_counter() - start
+    finally:
+        controller.stop()
+
+    failed = {r.recipient for r in results if r.status != "sent"}
+    retried = sum(1 for r in results if r.attempts > 1)
+    sent = sum(1 for r in results if r.status == "sent")
+    checks = {
+        "delivered_once": sorted(handler.delivered) == sorted(set(r["email"] for r in rows) - bounce),
+        "messages_received": len(handler.senders) == len(rows) - len(bounce),
+        "envelope_sender": set(handler.senders) <= {"bench@example.com"},
+        "sent_failed_counts": (sent, len(failed)) == (len(rows) - len(bounce), len(bounce)),
+        "bounces_reported": failed == bounce,
+        "bounces_not_retried": all(r.attempts == 1 for r in results if r.recipient in bounce),
+        "transient_retried": retried >= len(transient - bounce),
+    }
+    return {
+        "messages": len(rows),
+        "connections": connections,
+        "seconds": seconds,
+        "messages_per_s": len(rows) / seconds,
+        "sent": sent,
+        "failed": len(failed),
+        "retried": retried,
+        "checks": checks,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--connections", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds per RCPT / DATA on the server")
+    parser.add_argument("--transient", type=float, default=0.02, help="fraction answered 451 once")
+    parser.add_argument("--bounce", type=float, default=0.01, help="fraction answered 550")
+    parser.add_argument("--rate", type=float, default=0, help="client throttle, messages per second")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    runs = []
+    for connections in args.connections:
+        result = run(args, connections)
+        runs.append(result)
+        status = "ok" if all(result["checks"].values()) else f"FAILED {result['checks']}"
+        print(f"connections={connections:<3} {result['messages_per_s']:8.1f} messages/s "
+              f"failed={result['failed']} retried={result['retried']} {status}")
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": vars(args),
+        "runs": runs,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    for result in runs:
+        failed_checks = [name for name, ok in result["checks"].items() if not ok]
+        check(not failed_checks, f"connections={result['connections']}: {', '.join(failed_checks)}")
+
+
+if __name__ == "__main__":
+    main()
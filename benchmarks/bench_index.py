@@ -0,0 +1,122 @@
+"""
+Flat vs IVF / quantized FAISS index benchmark.
+
+    python benchmarks/bench_index.py --output index.json
+    python benchmarks/bench_index.py --sizes 20000 100000 --dim 1536 --nprobe 4 16 64 --output index.json
+
+Builds every index type in rag_common/vector_index.py over the same
+synthetic vectors (clustered, normalized, ada-002 sized by default) and
+reports, per corpus size and nprobe: serialized index size, build time,
+single-query search latency (mean / p95, like the apps' one-question-at-a-
+time searches) and recall@k against the exact flat index.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.append(ROOT)
+
+from rag_common.vector_index import INDEX_TYPES, build_index, index_bytes
+
+from bench_pipelines import git_commit
+
+
+def make_vectors(count, dim, clusters, seed=0):
+    """Normalized points around `clusters` random centres, roughly how text embeddings bunch by topic."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, count)] + 0.6 * rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def make_queries(vectors, count, seed=1):
+    """Perturbed corpus points, so every query has real near neighbours."""
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.integers(0, len(vectors), count)] + 0.3 * rng.standard_normal((count, vectors.shape[1])).astype(np.float32) / np.sqrt(vectors.shape[1])
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def search_each(index, queries, k):
+    ids, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        _, found = index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - start)
+        ids.append(found[0])
+    return np.array(ids), sorted(ms * 1000 for ms in latencies)
+
+
+def recall_at_k(found, truth):
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def bench_size(count, args):
+    vectors = make_vectors(count, args.dim, args.clusters)
+    queries = make_queries(vectors, args.queries)
+    rows, truth = [], None
+    for index_type in args.types:
+        start = time.perf_counter()
+        index = build_index(vectors, index_type)
+        build_s = time.perf_counter() - start
+        for nprobe in ([None] if index_type == "flat" else args.nprobe):
+            if nprobe is not None:
+                index.nprobe = min(nprobe, index.nlist)
+            found, latencies = search_each(index, queries, args.k)
+            if index_type == "flat":
+                truth = found
+            row = {
+                "vectors": count,
+                "type": index_type,
+                "nprobe": nprobe,
+                "memory_mb": index_bytes(index) / 2**20,
+                "build_s": build_s,
+                "query_ms_mean": sum(latencies) / len(latencies),
+                "query_ms_p95": latencies[int(0.95 * (len(latencies) - 1))],
+                f"recall@{args.k}": recall_at_k(found, truth) if truth is not None else None,
+            }
+            rows.append(row)
+            print(f"{count:>8} {index_type:<6} nprobe={str(nprobe):<4} {row['memory_mb']:8.1f} MB "
+                  f"build={build_s:6.2f}s query={row['query_ms_mean']:.3f}ms "
+                  f"recall@{args.k}={row[f'recall@{args.k}']}")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20000, 100000])
+    parser.add_argument("--dim", type=int, default=1536, help="1536 = text-embedding-ada-002, 384 = MiniLM")
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--types", nargs="+", choices=INDEX_TYPES, default=list(INDEX_TYPES))
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+    if "flat" in args.types:
+        # Flat first: it is the ground truth for recall
+        args.types = ["flat"] + [t for t in args.types if t != "flat"]
+
+    runs = [row for count in args.sizes for row in bench_size(count, args)]
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": vars(args),
+        "runs": runs,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Offline accuracy-vs-latency comparison of the Adaptive RAG intent classifiers.
+
+    python benchmarks/bench_intent.py                 # keyword rules only
+    python benchmarks/bench_intent.py --openai        # + centroid, hybrid and GPT-4 (needs OPENAI_API_KEY)
+
+The keyword rules in rag_common/intent.py were written against
+intent_queries.jsonl, so accuracy there is a training score. Every
+classifier is also scored on intent_queries_heldout.jsonl, which was
+labeled separately and never used to tune rules, seeds or thresholds;
+that is the number to compare. Keep it that way: when a rule is added to
+fix a held-out miss, move the query to the tuning set.
+
+The "routed" row replays what IntentClassifier does with the rules at
+--threshold: queries below it go to the fallback (the LLM in the app). It
+reports how many fall back and how accurate, and how often confidently
+wrong, the rules are on the ones they keep. It needs no API key.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag_common.intent import CentroidIntentClassifier, IntentClassifier, LLMIntentClassifier, RuleIntentClassifier
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_queries(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(name, classify, queries):
+    latencies = []
+    correct = 0
+    sources = {}
+    for row in queries:
+        start = time.perf_counter()
+        intent, source = classify(row["query"])
+        latencies.append((time.perf_counter() - start) * 1000)
+        correct += intent == row["intent"]
+        sources[source] = sources.get(source, 0) + 1
+    latencies.sort()
+    return {
+        "classifier": name,
+        "accuracy": correct / len(queries),
+        "mean_ms": statistics.mean(latencies),
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))],
+        "answered_by": sources,
+    }
+
+
+def routing(rules, queries, threshold):
+    """Rules answer at or above `threshold`, the rest would go to the fallback."""
+    kept = wrong = 0
+    for row in queries:
+        intent, confidence = rules.classify(row["query"])
+        if confidence >= threshold:
+            kept += 1
+            wrong += intent != row["intent"]
+    return {
+        "threshold": threshold,
+        "fallback_rate": 1 - kept / len(queries),
+        "kept_accuracy": (kept - wrong) / kept if kept else None,
+        "confidently_wrong": wrong,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", default=os.path.join(HERE, "intent_queries.jsonl"), help="tuning set")
+    parser.add_argument("--heldout", default=os.path.join(HERE, "intent_queries_heldout.jsonl"),
+                        help="evaluation set not used to write the rules")
+    parser.add_argument("--openai", action="store_true", help="also run the embedding and GPT-4 classifiers")
+    parser.add_argument("--threshold", type=float, default=0.6)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    splits = {"tuning": load_queries(args.queries), "heldout": load_queries(args.heldout)}
+    rules = RuleIntentClassifier()
+    classifiers = [("rules", lambda q: (rules.classify(q)[0], "rules"))]
+
+    if args.openai:
+        from langchain.chains import LLMChain
+        from langchain.prompts import PromptTemplate
+        from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+        from rag_common.embedding_cache import CachedEmbeddings
+
+        embedding = CachedEmbeddings(OpenAIEmbeddings(model="text-embedding-ada-002"), model_name="text-embedding-ada-002")
+        llm = ChatOpenAI(model="gpt-4", temperature=0)
+        intent_chain = LLMChain(llm=llm, prompt=PromptTemplate.from_template("""
+    Classify the user query into one of these categories:
+    - FACTUAL
+    - PROCEDURAL
+    - REASONING
+
+    Query: "{query}"
+    Respond with just one word: FACTUAL, PROCEDURAL, or REASONING.
+    """))
+        centroid = CentroidIntentClassifier(embedding)
+        llm_classifier = LLMIntentClassifier(intent_chain)
+        hybrid = IntentClassifier(local=[rules, centroid], fallback=llm_classifier, threshold=args.threshold)
+
+        classifiers.append(("centroid", lambda q: (centroid.classify(q)[0], "centroid")))
+        classifiers.append(("hybrid", hybrid.classify))
+        classifiers.append(("llm", lambda q: (llm_classifier.classify(q)[0], "llm")))
+
+    results = []
+    for split, queries in splits.items():
+        for name, classify in classifiers:
+            results.append({"split": split, **evaluate(name, classify, queries)})
+    routed = [{"split": split, **routing(rules, queries, args.threshold)} for split, queries in splits.items()]
+
+    print(f"{len(splits['tuning'])} tuning queries from {args.queries}")
+    print(f"{len(splits['heldout'])} held-out queries from {args.heldout}\n")
+    print(f"{'split':<8} {'classifier':<10} {'accuracy':>9} {'mean ms':>9} {'p95 ms':>9}  answered by")
+    for r in results:
+        print(f"{r['split']:<8} {r['classifier']:<10} {r['accuracy']:>9.1%} {r['mean_ms']:>9.2f} {r['p95_ms']:>9.2f}  "
+              f"{r['answered_by']}")
+    print(f"\nrules routed at threshold {args.threshold}:")
+    for r in routed:
+        kept = f"{r['kept_accuracy']:.1%}" if r["kept_accuracy"] is not None else "-"
+        print(f"{r['split']:<8} fallback {r['fallback_rate']:>6.1%}  kept accuracy {kept:>6}  "
+              f"confidently wrong {r['confidently_wrong']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"classifiers": results, "routed": routed}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Reopen-time benchmark for the memory-mapped Corrective RAG knowledge base.
+
+    python benchmarks/bench_kb_reopen.py --records 200000 --topics 4
+
+Writes a synthetic store with random unit vectors (the embedding model is
+not what is being measured), then times reopening it and searching it,
+against materializing every record as a Document the way the in-memory
+kb dict + FAISS.from_documents path has to.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "CorrectiveRAG"))
+from kb_store import KBStore, KBWriter, read_records, record_text
+from langchain_core.documents import Document
+
+
+def write_synthetic_store(root, records, topics, dim, batch_size=10000):
+    rng = np.random.default_rng(0)
+    writer = KBWriter(root, "synthetic")
+    per_topic = records // topics
+    jsonl_path = os.path.join(root, "source.jsonl")
+    with open(jsonl_path, "w", encoding="utf-8") as source:
+        for t in range(topics):
+            topic = f"Topic {t}"
+            for start in range(0, per_topic, batch_size):
+                batch = [
+                    {"q": f"Question {t}-{i}?", "a": f"Answer number {i} for topic {t}.", "topic": topic}
+                    for i in range(start, min(start + batch_size, per_topic))
+                ]
+                for record in batch:
+                    source.write(json.dumps(record) + "\n")
+                writer.add(topic, batch, rng.standard_normal((len(batch), dim), dtype=np.float32))
+    writer.close()
+    return jsonl_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=200000)
+    parser.add_argument("--topics", type=int, default=4)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    with tempfile.TemporaryDirectory() as root:
+        start = time.perf_counter()
+        jsonl_path = write_synthetic_store(root, args.records, args.topics, args.dim)
+        build_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        store = KBStore(root, model_name="synthetic")
+        reopen_ms = (time.perf_counter() - start) * 1000
+
+        topic = next(iter(store.topics))
+        start = time.perf_counter()
+        store.search(topic, rng.standard_normal(args.dim), k=2)
+        first_query_ms = (time.perf_counter() - start) * 1000
+
+        warm = []
+        for _ in range(args.queries):
+            start = time.perf_counter()
+            store.search(topic, rng.standard_normal(args.dim), k=2)
+            warm.append((time.perf_counter() - start) * 1000)
+
+        # Baseline: what the in-memory path pays before it can even build an index
+        start = time.perf_counter()
+        documents = [Document(page_content=record_text(r), metadata={"topic": r["topic"]}) for r in read_records(jsonl_path)]
+        materialize_ms = (time.perf_counter() - start) * 1000
+        del documents
+
+    results = {
+        "records": args.records,
+        "topics": args.topics,
+        "dim": args.dim,
+        "write_s": build_s,
+        "reopen_ms": reopen_ms,
+        "first_query_ms": first_query_ms,
+        "warm_query_ms_mean": statistics.mean(warm),
+        "materialize_documents_ms": materialize_ms,
+    }
+    for key, value in results.items():
+        print(f"{key:<26} {value:.2f}" if isinstance(value, float) else f"{key:<26} {value}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Offline scaling benchmark for the Adaptive, Corrective and website RAG flows.
+
+    python benchmarks/bench_pipelines.py --output bench.json
+    python benchmarks/bench_pipelines.py --pipelines adaptive --pdfs 2 8 32 --llm-latency 0.4 --output adaptive.json
+
+No API key or network: ChatOpenAI / OpenAIEmbeddings are replaced by the
+deterministic stand-ins in fakes.py (latency configurable), and the PDFs,
+Q&A records and website come from corpus.py. Each flow is run once per
+corpus size; build stages (parse, split, embed, index) are timed once and
+query stages (retrieve, generate, ...) are averaged over --queries runs.
+Results go to --output as JSON, together with the settings and git commit,
+so runs from different versions can be diffed.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "Adaptive_RAG"))
+sys.path.append(os.path.join(ROOT, "CorrectiveRAG"))
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.vectorstores import FAISS, Chroma
+
+import corpus
+from fakes import FakeChatModel, FakeEmbeddings, PrecomputedEmbeddings
+from rag_common.ingest import PdfReader, batched, build_faiss_streaming, iter_pdf_chunks
+
+
+class Timer:
+    def __init__(self):
+        self.seconds = {}
+
+    def __call__(self, name, fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.seconds[name] = time.perf_counter() - start
+        return result
+
+
+def embed_all(embedding, texts, batch_size):
+    vectors = []
+    for batch in batched(texts, batch_size):
+        vectors.extend(embedding.embed_documents(batch))
+    return vectors
+
+
+def summarize_queries(results, latencies):
+    """Mean per-stage milliseconds across queries, plus end-to-end mean / p95."""
+    stages = {}
+    for result in results:
+        for stage, seconds in result.timings.items():
+            stages.setdefault(stage, []).append(seconds * 1000)
+    latencies = sorted(ms * 1000 for ms in latencies)
+    summary = {f"{stage}_ms": sum(values) / len(results) for stage, values in stages.items()}
+    summary["e2e_ms_mean"] = statistics.mean(latencies)
+    summary["e2e_ms_p95"] = latencies[int(0.95 * (len(latencies) - 1))]
+    summary["errors"] = sum(1 for result in results if result.error)
+    return summary
+
+
+def run_queries(run, questions):
+    results, latencies = [], []
+    for question in questions:
+        start = time.perf_counter()
+        results.append(run(question))
+        latencies.append(time.perf_counter() - start)
+    return summarize_queries(results, latencies)
+
+
+def bench_adaptive(size, args, llm, workdir):
+    from adaptive_pipeline import CHUNK_OVERLAP, CHUNK_SIZE, EMBED_BATCH_SIZE, AdaptiveRAG, build_chains
+
+    paths = corpus.make_pdfs(os.path.join(workdir, f"pdfs_{size}"), size, pages_per_document=args.pages_per_pdf)
+    embedding = FakeEmbeddings(call_latency=args.embed_latency, per_text_latency=args.embed_per_text)
+    timer = Timer()
+
+    pages = timer("parse", lambda: [page.extract_text() or "" for path in paths for page in PdfReader(path).pages])
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    texts = timer("split", lambda: [piece for text in pages for piece in splitter.split_text(text)])
+    vectors = timer("embed", embed_all, embedding, texts, EMBED_BATCH_SIZE)
+    timer("index", FAISS.from_embeddings, list(zip(texts, vectors)), PrecomputedEmbeddings(texts, vectors, embedding))
+    # What the app actually pays: parallel parse/split streamed into batched embedding + FAISS
+    vectorstore = timer(
+        "ingest_pipeline", build_faiss_streaming,
+        iter_pdf_chunks(paths, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, max_workers=args.workers),
+        embedding, batch_size=EMBED_BATCH_SIZE,
+    )
+
+    pipeline = AdaptiveRAG(build_chains(llm, llm, embedding))
+    query = run_queries(lambda q: pipeline.run(q, vectorstore, mode=args.mode), corpus.queries(args.queries))
+    return {"documents": size, "pages": len(pages), "chunks": len(texts), "build_s": timer.seconds, "query": query}
+
+
+def bench_corrective(size, args, llm, workdir):
+    from corrective_pipeline import CorrectiveRAG
+    from kb_store import KBRetriever, KBStore, build_kb, record_text
+    from relevance_gate import RelevanceGate
+
+    records = corpus.make_records(size)
+    embedding = FakeEmbeddings(call_latency=args.embed_latency, per_text_latency=args.embed_per_text)
+    timer = Timer()
+
+    # In-memory path (sample kb style): one FAISS index per topic
+    by_topic = {}
+    for record in records:
+        by_topic.setdefault(record["topic"], []).append(record_text(record))
+    vectors = timer("embed", lambda: {topic: embed_all(embedding, texts, 512) for topic, texts in by_topic.items()})
+    indexes = timer("index", lambda: {
+        topic: FAISS.from_embeddings(
+            list(zip(texts, vectors[topic])), PrecomputedEmbeddings(texts, vectors[topic], embedding),
+            metadatas=[{"topic": topic}] * len(texts),
+        )
+        for topic, texts in by_topic.items()
+    })
+
+    # Memory-mapped store (build_kb.py path): embed + write, then reopen
+    source = os.path.join(workdir, f"records_{size}.jsonl")
+    with open(source, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    kb_dir = os.path.join(workdir, f"kb_{size}")
+    timer("kb_store_build", build_kb, [source], kb_dir, embedding, "fake")
+    store = timer("kb_store_open", KBStore, kb_dir, "fake")
+
+    topic = corpus.TOPICS[0]
+    pipeline = CorrectiveRAG(llm, llm, gate=RelevanceGate(embedding))
+    questions = corpus.queries(args.queries)
+    faiss_retriever = indexes[topic].as_retriever(search_kwargs={"k": 2})
+    query = run_queries(lambda q: pipeline.run(q, faiss_retriever), questions)
+    kb_query = run_queries(lambda q: pipeline.run(q, KBRetriever(store, topic, embedding, k=2)), questions)
+    return {"records": size, "build_s": timer.seconds, "query": query, "query_kb_store": kb_query}
+
+
+def bench_web(size, args, llm, workdir):
+    import asyncio
+    from collections import Counter
+
+    from rag_common.crawler import CrawlState, crawl
+    from rag_common.web_index import PersistentWebIndex
+    from web_pipeline import CHUNK_OVERLAP, CHUNK_SIZE, EMBED_BATCH_SIZE, WebQA
+
+    site_dir = os.path.join(workdir, f"site_{size}")
+    names = corpus.make_site(site_dir, size)
+    base_url, server = corpus.serve_directory(site_dir)
+    embedding = FakeEmbeddings(call_latency=args.embed_latency, per_text_latency=args.embed_per_text)
+    timer = Timer()
+    try:
+        sitemap = corpus.write_sitemap(site_dir, base_url, names)
+        state = CrawlState(os.path.join(workdir, f"crawl_{size}.json"))
+        pages = timer("fetch_parse", asyncio.run, crawl(sitemap, state, max_pages=size, per_host=args.per_host))
+        check(Counter(page.status for page in pages) == {"new": size}, f"web {size}: first crawl is not all new")
+        index = PersistentWebIndex(os.path.join(workdir, f"web_index_{size}"), embedding, f"site-{size}")
+        timer("persistent_index", index.sync, pages, state)
+        # Second crawl: every page should come back 304 / unchanged
+        recrawl = timer("recrawl_unchanged", asyncio.run, crawl(sitemap, state, max_pages=size, per_host=args.per_host))
+        check(Counter(page.status for page in recrawl) == {"unchanged": size}, f"web {size}: recrawl is not all unchanged")
+
+        # Edit one page (mtime pushed forward: Last-Modified has 1 s resolution) and remove the last one
+        changed_url, gone_url = base_url + names[1], base_url + names[-1]
+        changed_path = os.path.join(site_dir, names[1])
+        with open(changed_path, "a", encoding="utf-8") as f:
+            f.write("<p>Appended paragraph about incremental recrawls.</p>")
+        later = time.time() + 10
+        os.utime(changed_path, (later, later))
+        os.remove(os.path.join(site_dir, names[-1]))
+        corpus.write_sitemap(site_dir, base_url, names[:-1])
+        recrawl = timer("recrawl_incremental", asyncio.run, crawl(sitemap, state, max_pages=size, per_host=args.per_host))
+        statuses = {page.url: page.status for page in recrawl}
+        check(statuses.pop(changed_url, None) == "changed", f"web {size}: edited page not reported changed")
+        check(statuses.pop(gone_url, None) == "gone", f"web {size}: removed page not reported gone")
+        check(set(statuses.values()) == {"unchanged"}, f"web {size}: untouched pages not all unchanged")
+        stats = timer("sync_incremental", index.sync, recrawl, state)
+        check(stats["changed"] == 1 and stats["gone"] == 1 and stats["chunks_added"] >= 1, f"web {size}: sync stats {stats}")
+        check(not index._existing_ids(gone_url), f"web {size}: chunks of the removed page are still indexed")
+        check(gone_url not in state.pages, f"web {size}: removed page is still in the crawl state")
+    finally:
+        server.shutdown()
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, length_function=len)
+    chunks = timer("split", lambda: [(piece, page.url) for page in pages for piece in splitter.split_text(page.text)])
+    texts = [text for text, _ in chunks]
+    vectors = timer("embed", embed_all, embedding, texts, EMBED_BATCH_SIZE)
+    vectorstore = timer(
+        "index", Chroma.from_texts, texts, PrecomputedEmbeddings(texts, vectors, embedding),
+        metadatas=[{"source": url} for _, url in chunks], collection_name=f"bench-{size}-{os.getpid()}",
+    )
+
+    web_qa = WebQA(vectorstore, llm=llm)
+    query = run_queries(web_qa.run, corpus.queries(args.queries))
+    return {"pages": len(pages), "chunks": len(texts), "build_s": timer.seconds, "query": query}
+
+
+BENCHES = {"adaptive": ("pdfs", bench_adaptive), "corrective": ("records", bench_corrective), "web": ("pages", bench_web)}
+
+
+def check(condition, message):
+    """Stop the run with a non-zero exit status when an expected outcome does not hold."""
+    if not condition:
+        raise SystemExit(f"check failed: {message}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pipelines", nargs="+", choices=sorted(BENCHES), default=sorted(BENCHES))
+    parser.add_argument("--pdfs", type=int, nargs="+", default=[2, 8, 32], help="adaptive: PDF counts")
+    parser.add_argument("--pages-per-pdf", type=int, default=10)
+    parser.add_argument("--records", type=int, nargs="+", default=[1000, 10000, 100000], help="corrective: kb sizes")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 200], help="web: site sizes")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds before a fake LLM reply")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds per fake output token")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="seconds per fake embedding request")
+    parser.add_argument("--embed-per-text", type=float, default=0.0, help="extra seconds per embedded text")
+    parser.add_argument("--workers", type=int, default=None, help="adaptive: ingest processes")
+    parser.add_argument("--per-host", type=int, default=8, help="web: concurrent requests")
+    parser.add_argument("--mode", choices=["concurrent", "sequential"], default=None, help="adaptive: pipeline mode")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    llm = FakeChatModel(latency=args.llm_latency, token_latency=args.token_latency)
+    sizes = {"adaptive": args.pdfs, "corrective": args.records, "web": args.pages}
+    runs = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in args.pipelines:
+            unit, bench = BENCHES[name]
+            for size in sizes[name]:
+                result = bench(size, args, llm, workdir)
+                runs.append({"pipeline": name, "size": size, "unit": unit, **result})
+                build = " ".join(f"{stage}={seconds:.2f}s" for stage, seconds in result["build_s"].items())
+                print(f"{name:<11} {size:>7} {unit:<8} {build}  query e2e={result['query']['e2e_ms_mean']:.1f}ms")
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": vars(args),
+        "runs": runs,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
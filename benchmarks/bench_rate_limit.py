@@ -0,0 +1,150 @@
+"""
+OpenAI rate limiter benchmark against a local mock API (mock_openai.py).
+
+    python benchmarks/bench_rate_limit.py --output rate_limit.json
+    python benchmarks/bench_rate_limit.py --rpm 60 --period 5 --heavy-threads 16 --light 4 --inject-429 0.05
+
+One "heavy" session fires --heavy-threads concurrent calls while --light
+sessions ask one question at a time, all against a mock server that
+allows --rpm requests / --tpm tokens per --period seconds (a shortened
+minute) and answers 429 beyond that. The same load runs twice: with plain
+clients (only the openai SDK's own retries) and with every client sharing
+one rate_limit.RateLimiter set to the same budgets. Reported per run:
+429s the server sent, calls that failed, total time and p50 / p95
+latency for heavy and light sessions; fairness is the light sessions'
+p95 relative to the heavy session's. The limited run must finish every
+call without failures and without a single 429 beyond the injected ones,
+otherwise the benchmark exits non-zero.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.append(ROOT)
+
+import httpx
+from openai import OpenAI, OpenAIError
+
+from mock_openai import MockOpenAI
+from rag_common.rate_limit import RateLimiter, RateLimitedTransport, session_scope
+
+from bench_pipelines import check, git_commit
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))] if values else None
+
+
+def run(args, limited):
+    server = MockOpenAI(rpm=args.rpm, tpm=args.tpm, latency=args.latency, inject_429=args.inject_429,
+                        window=args.period).start()
+    limiter = RateLimiter(rpm=args.rpm, tpm=args.tpm, max_concurrency=args.concurrency, period=args.period)
+    latencies = {"heavy": [], "light": []}
+    failures = []
+    lock = threading.Lock()
+
+    def worker(session, kind, requests):
+        transport = RateLimitedTransport(limiter) if limited else httpx.HTTPTransport()
+        client = OpenAI(
+            base_url=server.base_url, api_key="test", default_headers={"X-Session": session},
+            http_client=httpx.Client(transport=transport, timeout=120),
+        )
+        with session_scope(session):
+            for i in range(requests):
+                start = time.perf_counter()
+                try:
+                    client.chat.completions.create(
+                        model="gpt-3.5-turbo", max_tokens=20,
+                        messages=[{"role": "user", "content": f"Question {i} from {session}: " + "context " * 50}],
+                    )
+                except OpenAIError as e:
+                    with lock:
+                        failures.append(f"{session}: {type(e).__name__}")
+                    continue
+                with lock:
+                    latencies[kind].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker, args=("heavy", "heavy", args.requests)) for _ in range(args.heavy_threads)]
+    threads += [threading.Thread(target=worker, args=(f"light-{i}", "light", args.requests)) for i in range(args.light)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    server.shutdown()
+
+    calls = (args.heavy_threads + args.light) * args.requests
+    heavy_p95, light_p95 = percentile(latencies["heavy"], 0.95), percentile(latencies["light"], 0.95)
+    return {
+        "limited": limited,
+        "seconds": seconds,
+        "requests_sent": len(server.log),
+        "server_429s": sum(1 for entry in server.log if entry["status"] == 429),
+        "injected_429s": server.injected_429s,
+        "calls": calls,
+        "completed_calls": len(latencies["heavy"]) + len(latencies["light"]),
+        "failed_calls": len(failures),
+        "heavy_latency_s_p50": percentile(latencies["heavy"], 0.5),
+        "heavy_latency_s_p95": heavy_p95,
+        "light_latency_s_p50": percentile(latencies["light"], 0.5),
+        "light_latency_s_p95": light_p95,
+        "light_vs_heavy_p95": light_p95 / heavy_p95 if light_p95 and heavy_p95 else None,
+        "limiter": limiter.metrics() if limited else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rpm", type=int, default=60, help="server request budget per --period")
+    parser.add_argument("--tpm", type=int, default=20000, help="server token budget per --period")
+    parser.add_argument("--period", type=float, default=5, help="seconds standing in for one minute")
+    parser.add_argument("--heavy-threads", type=int, default=12)
+    parser.add_argument("--light", type=int, default=3, help="sessions asking one question at a time")
+    parser.add_argument("--requests", type=int, default=10, help="calls per thread")
+    parser.add_argument("--latency", type=float, default=0.05, help="server seconds per accepted call")
+    parser.add_argument("--inject-429", type=float, default=0.0, help="fraction of random extra 429s")
+    parser.add_argument("--concurrency", type=int, default=16, help="limiter max in-flight requests")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    runs = []
+    for limited in (False, True):
+        result = run(args, limited)
+        runs.append(result)
+        fmt = lambda v: f"{v:.2f}" if v is not None else "-"
+        print(f"{'limited' if limited else 'plain':<8} {result['seconds']:6.1f}s  429s={result['server_429s']:<4} "
+              f"failed={result['failed_calls']:<3} heavy p95={fmt(result['heavy_latency_s_p95'])}s "
+              f"light p50={fmt(result['light_latency_s_p50'])}s p95={fmt(result['light_latency_s_p95'])}s")
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": vars(args),
+        "runs": runs,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    for result in runs:
+        name = "limited" if result["limited"] else "plain"
+        check(result["completed_calls"] + result["failed_calls"] == result["calls"],
+              f"{name}: {result['completed_calls']} completed + {result['failed_calls']} failed of {result['calls']} calls")
+        if result["limited"]:
+            check(result["failed_calls"] == 0, f"limited: {result['failed_calls']} calls failed")
+            check(result["server_429s"] == result["injected_429s"],
+                  f"limited: {result['server_429s'] - result['injected_429s']} 429s beyond the injected ones")
+
+
+if __name__ == "__main__":
+    main()
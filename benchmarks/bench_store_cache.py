@@ -0,0 +1,131 @@
+"""
+Memory-bounded page store cache benchmark (rag_common/store_cache.py).
+
+    python benchmarks/bench_store_cache.py --output store_cache.json
+    python benchmarks/bench_store_cache.py --urls 40 --requests 400 --budget-mb 8 16 --embed-latency 0.2
+
+Builds in-memory Chroma stores for --urls synthetic pages through
+web_pipeline's build / spill / reload helpers, with FakeEmbeddings
+standing in for the API. It then replays --requests lookups with
+Zipf-skewed popularity (a few pages are asked about far more often)
+against a cache with each --budget-mb memory budget, plus an unbounded
+one like the old @st.cache_resource. Reported per budget: peak resident
+size, memory hits, reloads from disk, builds (each one costs a full
+re-embed), evictions and the mean latency of each path.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.append(ROOT)
+
+from langchain_core.documents import Document
+
+import corpus
+from fakes import FakeEmbeddings
+from rag_common.store_cache import VectorStoreCache
+from web_pipeline import build_page_store, chroma_nbytes, drop_chroma, load_chroma, save_chroma
+
+from bench_pipelines import git_commit
+
+
+def make_pages(count, seed=0):
+    """url -> chunks, page sizes varying 4x so the byte budget matters, not just the count."""
+    rng = random.Random(seed)
+    pages = {}
+    for i in range(count):
+        url = f"https://example.com/page-{i}"
+        pages[url] = [Document(page_content=corpus.paragraph(rng), metadata={"source": url})
+                      for _ in range(rng.randint(20, 80))]
+    return pages
+
+
+def run(args, pages, budget_mb, workdir):
+    embeddings = FakeEmbeddings(call_latency=args.embed_latency)
+    max_bytes = budget_mb * 1024 * 1024 if budget_mb else float("inf")
+    cache = VectorStoreCache(os.path.join(workdir, f"spill-{budget_mb}"), max_bytes=max_bytes, ttl=0)
+    urls = list(pages)
+    rng = random.Random(1)
+    weights = [1 / (rank + 1) ** args.zipf for rank in range(len(urls))]
+    sequence = rng.choices(urls, weights=weights, k=args.requests)
+
+    latencies = {"memory": [], "disk": [], "built": []}
+    peak = 0
+    for url in sequence:
+        start = time.perf_counter()
+        store, source = cache.get_or_build(
+            url,
+            build=lambda: build_page_store(pages[url], embeddings, url),
+            save=save_chroma,
+            load=lambda path: load_chroma(path, embeddings, url),
+            drop=drop_chroma,
+            size_of=chroma_nbytes,
+        )
+        store.similarity_search("what does the device do", k=2)
+        latencies[source].append(time.perf_counter() - start)
+        peak = max(peak, cache.resident_bytes())
+
+    metrics = cache.metrics()
+    cache.clear()  # free this run's collections before the next one
+    mean_ms = lambda values: 1000 * statistics.mean(values) if values else None
+    return {
+        "budget_mb": budget_mb or None,
+        "peak_resident_mb": peak / 2**20,
+        "memory_hits": len(latencies["memory"]),
+        "disk_reloads": len(latencies["disk"]),
+        "builds": len(latencies["built"]),
+        "evictions": metrics["evictions"],
+        "spilled_mb": metrics["spilled_bytes"] / 2**20,
+        "embed_calls": embeddings.calls,
+        "memory_ms_mean": mean_ms(latencies["memory"]),
+        "disk_ms_mean": mean_ms(latencies["disk"]),
+        "build_ms_mean": mean_ms(latencies["built"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--urls", type=int, default=30)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--zipf", type=float, default=1.1, help="popularity skew; 0 is uniform")
+    parser.add_argument("--budget-mb", type=float, nargs="+", default=[2, 8], help="memory budgets (0: unbounded)")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="seconds per embedding request")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    pages = make_pages(args.urls)
+    runs = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for budget_mb in [0] + args.budget_mb:
+            result = run(args, pages, budget_mb, workdir)
+            runs.append(result)
+            fmt = lambda v: f"{v:.1f}" if v is not None else "-"
+            print(f"budget={fmt(result['budget_mb']) if budget_mb else 'none':>6} MB  peak={result['peak_resident_mb']:6.1f} MB  "
+                  f"hits={result['memory_hits']:<4} reloads={result['disk_reloads']:<4} builds={result['builds']:<3} "
+                  f"ms: hit {fmt(result['memory_ms_mean'])} reload {fmt(result['disk_ms_mean'])} "
+                  f"build {fmt(result['build_ms_mean'])}")
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": vars(args),
+        "runs": runs,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Weather scraper benchmark against a local weather.com look-alike.
+
+    python benchmarks/bench_weather.py --cities 100 --contexts 1 4 8 --output weather_bench.json
+
+Serves the fixture site from corpus.make_weather_site (search typeahead,
+consent banner, images, fonts and an ad script that should be blocked) and
+runs demo_Climate_chk.scrape() over it once per pool size: cold (search per
+city), then again once the cache has expired (direct location pages), then
+with a fresh cache. Every scraped value is checked against the fixture; any
+failed, wrong or unexpectedly uncached city exits non-zero.
+Needs Playwright's Chromium (python -m playwright install chromium) or
+WEATHER_BROWSER_PATH.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.append(ROOT)
+
+import corpus
+from demo_Climate_chk import ResultCache, scrape
+
+from bench_pipelines import check, git_commit
+
+
+def timed_scrape(cities, contexts, base_url, cache, expected):
+    start = time.perf_counter()
+    results = asyncio.run(scrape(cities, contexts=contexts, base_url=base_url, cache=cache))
+    seconds = time.perf_counter() - start
+    wrong = [r.city for r in results if not r.error and (r.temperature, r.condition) != expected[r.city]]
+    return {
+        "seconds": seconds,
+        "cities_per_s": len(results) / seconds,
+        "failed": sum(1 for r in results if r.error),
+        "wrong": len(wrong),
+        "cached": sum(1 for r in results if r.cached),
+        "page_s_mean": sum(r.seconds for r in results if not r.cached) / max(1, sum(1 for r in results if not r.cached)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=50)
+    parser.add_argument("--contexts", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    runs = []
+    with tempfile.TemporaryDirectory() as workdir:
+        site = os.path.join(workdir, "site")
+        cities = corpus.city_names(args.cities)
+        expected = corpus.make_weather_site(site, cities)
+        base_url, server = corpus.serve_directory(site)
+        try:
+            for contexts in args.contexts:
+                cache = ResultCache(os.path.join(workdir, f"cache_{contexts}.json"), ttl=0)
+                cold = timed_scrape(cities, contexts, base_url, cache, expected)
+                # ttl=0: every entry is stale, but the saved location pages skip the search
+                direct = timed_scrape(cities, contexts, base_url, cache, expected)
+                cache.ttl = 3600
+                cached = timed_scrape(cities, contexts, base_url, cache, expected)
+                runs.append({"cities": args.cities, "contexts": contexts, "search": cold, "direct": direct, "cached": cached})
+                print(f"contexts={contexts:<3} search {cold['cities_per_s']:6.1f} cities/s · "
+                      f"direct {direct['cities_per_s']:6.1f} cities/s · cached {cached['seconds'] * 1000:.0f} ms "
+                      f"(failed {cold['failed'] + direct['failed']}, wrong {cold['wrong'] + direct['wrong']})")
+                for name, run in (("search", cold), ("direct", direct), ("cached", cached)):
+                    check(run["failed"] == 0 and run["wrong"] == 0,
+                          f"contexts={contexts} {name}: {run['failed']} failed, {run['wrong']} wrong")
+                check(cold["cached"] == 0 and direct["cached"] == 0, f"contexts={contexts}: ttl=0 entries served from cache")
+                check(cached["cached"] == len(cities), f"contexts={contexts}: {cached['cached']}/{len(cities)} served from cache")
+        finally:
+            server.shutdown()
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": vars(args),
+        "runs": runs,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
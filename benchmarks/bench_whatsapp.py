@@ -0,0 +1,99 @@
+"""
+Batch WhatsApp sender benchmark against a local mock chat page.
+
+    python benchmarks/bench_whatsapp.py --messages 200 --contacts 50 --output whatsapp.json
+
+Serves corpus.make_chat_site (chat list that loads late, search typeahead,
+composer, delivery tick that flips after a delay) and sends --messages
+messages through whatsapp_batch.send_batch() in one headless session.
+A --unknown fraction is addressed to contacts that do not exist and must
+come back as failures without stopping the batch; the run exits non-zero
+unless every other message is sent and only those fail. Needs Playwright's
+Chromium (python -m playwright install chromium) or WHATSAPP_BROWSER_PATH.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.append(ROOT)
+
+import corpus
+from whatsapp_batch import send_batch
+
+from bench_pipelines import check, git_commit
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--contacts", type=int, default=25)
+    parser.add_argument("--unknown", type=float, default=0.05, help="fraction sent to missing contacts")
+    parser.add_argument("--timeout", type=float, default=2, help="seconds per page step (failures wait this long)")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    contacts = corpus.contact_names(args.contacts)
+    every = round(1 / args.unknown) if args.unknown else 0
+    queue = [
+        (f"Nobody {i}" if every and i % every == every - 1 else contacts[i % len(contacts)],
+         f"Reminder {i}: your appointment is tomorrow 🌞")
+        for i in range(args.messages)
+    ]
+    unknown = sum(1 for contact, _ in queue if contact.startswith("Nobody"))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        site = os.path.join(workdir, "site")
+        corpus.make_chat_site(site, contacts)
+        base_url, server = corpus.serve_directory(site)
+        try:
+            start = time.perf_counter()
+            results = asyncio.run(send_batch(
+                queue, url=base_url, profile_dir=os.path.join(workdir, "profile"), headless=True,
+                timeout_ms=int(args.timeout * 1000), min_interval=0,
+            ))
+            seconds = time.perf_counter() - start
+        finally:
+            server.shutdown()
+
+    latencies = sorted(result.seconds for result in results if result.status == "sent")
+    failed = [result for result in results if result.status != "sent"]
+    run = {
+        "messages": len(results),
+        "seconds": seconds,
+        "messages_per_s": len(results) / seconds,
+        "latency_s_p50": statistics.median(latencies) if latencies else None,
+        "latency_s_p95": latencies[int(0.95 * (len(latencies) - 1))] if latencies else None,
+        "sent": len(results) - len(failed),
+        "failed": len(failed),
+        "failures_are_unknown_contacts": len(failed) == unknown and all(r.contact.startswith("Nobody") for r in failed),
+    }
+    print(f"{run['messages']} messages in {seconds:.1f}s ({run['messages_per_s']:.1f}/s), "
+          f"p50 {run['latency_s_p50']}s, failed {run['failed']} (expected {unknown})")
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": vars(args),
+        "runs": [run],
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    check(run["messages"] == len(queue), f"{run['messages']} results for {len(queue)} queued messages")
+    check(run["sent"] == len(queue) - unknown, f"sent {run['sent']}, expected {len(queue) - unknown}")
+    check(run["failures_are_unknown_contacts"], f"failed {[r.contact for r in failed]}, expected only the missing contacts")
+
+
+if __name__ == "__main__":
+    main()
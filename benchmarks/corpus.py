@@ -0,0 +1,291 @@
+"""
+Synthetic corpora for the offline benchmarks: PDFs, Q&A records, a small
+website, a weather.com look-alike and a mock chat page served from a local
+thread, all generated from a fixed seed.
+"""
+import functools
+import json
+import os
+import random
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+SUBJECTS = ["the pump", "the controller", "the battery", "the sensor", "the valve", "the firmware",
+            "the display", "the router", "the filter", "the motor", "the charger", "the thermostat"]
+VERBS = ["requires", "supports", "reports", "limits", "controls", "measures", "replaces", "protects"]
+OBJECTS = ["the warranty period", "a reset sequence", "the operating temperature", "the power draw",
+           "a calibration step", "the maintenance interval", "the network settings", "the error codes",
+           "the safety cutoff", "the water pressure", "the update channel", "the backup schedule"]
+QUALIFIERS = ["during installation", "after every update", "in cold climates", "under heavy load",
+              "when the light blinks", "before first use", "at night", "in eco mode"]
+
+TOPICS = ["General Science", "Climate", "Physics", "Computer Science"]
+
+
+def sentence(rng):
+    return (f"{rng.choice(SUBJECTS).capitalize()} {rng.choice(VERBS)} {rng.choice(OBJECTS)} "
+            f"{rng.choice(QUALIFIERS)} (section {rng.randint(1, 400)}).")
+
+
+def paragraph(rng, sentences=8):
+    return " ".join(sentence(rng) for _ in range(sentences))
+
+
+def queries(count, seed=1):
+    rng = random.Random(seed)
+    return [f"What does {rng.choice(SUBJECTS)} do with {rng.choice(OBJECTS)} {rng.choice(QUALIFIERS)}?"
+            for _ in range(count)]
+
+
+# --- PDFs ---
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, pages):
+    """Minimal text-only PDF (Helvetica, one content stream per page) that pypdf can extract."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for lines in pages:
+        body = "BT /F1 10 Tf 12 TL 40 780 Td " + " ".join(f"({_pdf_escape(line)}) Tj T*" for line in lines) + " ET"
+        stream = body.encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> "
+            b"/Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{i} 0 R" for i in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def make_pdfs(directory, documents, pages_per_document=10, lines_per_page=40, seed=0):
+    """Write `documents` PDFs of wrapped synthetic prose; returns their paths."""
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for d in range(documents):
+        pages = []
+        for _ in range(pages_per_document):
+            lines = []
+            while len(lines) < lines_per_page:
+                text = sentence(rng)
+                lines.extend(text[i:i + 95] for i in range(0, len(text), 95))
+            pages.append(lines[:lines_per_page])
+        path = os.path.join(directory, f"manual_{d:04d}.pdf")
+        write_pdf(path, pages)
+        paths.append(path)
+    return paths
+
+
+# --- Corrective RAG records ---
+def make_records(count, seed=0):
+    rng = random.Random(seed)
+    return [
+        {"q": f"What does {rng.choice(SUBJECTS)} do with {rng.choice(OBJECTS)}?", "a": paragraph(rng, 2),
+         "topic": TOPICS[i % len(TOPICS)]}
+        for i in range(count)
+    ]
+
+
+# --- Website ---
+def make_site(directory, pages, links_per_page=3, paragraphs_per_page=6, seed=0):
+    """Write index.html + page_N.html (linked breadth-first) and a sitemap.xml."""
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    names = ["index.html"] + [f"page_{i:05d}.html" for i in range(1, pages)]
+    for i, name in enumerate(names):
+        children = names[i * links_per_page + 1:(i + 1) * links_per_page + 1]
+        links = "".join(f'<li><a href="{child}">{child}</a></li>' for child in children)
+        body = "".join(f"<p>{paragraph(rng)}</p>" for _ in range(paragraphs_per_page))
+        with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+            f.write(f"<html><head><title>Page {i}</title></head><body><h1>Page {i}</h1>{body}<ul>{links}</ul></body></html>")
+    return names
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_directory(directory):
+    """Serve `directory` on a free localhost port from a daemon thread; returns (base_url, server)."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(_QuietHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/", server
+
+
+def write_sitemap(directory, base_url, names):
+    urls = "".join(f"<url><loc>{base_url}{name}</loc></url>" for name in names)
+    with open(os.path.join(directory, "sitemap.xml"), "w", encoding="utf-8") as f:
+        f.write(f'<?xml version="1.0" encoding="UTF-8"?>'
+                f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>')
+    return base_url + "sitemap.xml"
+
+
+# --- Weather site (demo_Climate_chk.py fixture) ---
+WEATHER_PHRASES = ["Sunny", "Partly Cloudy", "Cloudy", "Light Rain", "Thunderstorms", "Haze", "Clear", "Fog"]
+
+_WEATHER_INDEX = """<html><head><title>Weather</title>
+<link rel="stylesheet" href="https://fonts.example.invalid/font.css"><script src="https://securepubads.g.doubleclick.net/tag/js/gpt.js"></script>
+</head><body>
+<div id="consent"><button onclick="this.parentNode.remove()">Accept all</button></div>
+<input id="headerSearch_LocationSearch_input" type="search" autocomplete="off">
+<div id="headerSearch_LocationSearch_listbox" role="listbox"></div>
+<img src="hero.jpg" width="1200" height="600">
+<script>
+const LOCATIONS = %s;
+const input = document.getElementById("headerSearch_LocationSearch_input");
+const listbox = document.getElementById("headerSearch_LocationSearch_listbox");
+input.addEventListener("input", () => {
+  // Suggestions arrive a moment after typing, like the real typeahead
+  setTimeout(() => {
+    const query = input.value.trim().toLowerCase();
+    listbox.innerHTML = "";
+    for (const [name, href] of Object.entries(LOCATIONS)) {
+      if (query && name.toLowerCase().startsWith(query)) {
+        const option = document.createElement("button");
+        option.setAttribute("role", "option");
+        option.textContent = name;
+        option.onclick = () => { location.href = href; };
+        listbox.appendChild(option);
+      }
+    }
+  }, 50);
+});
+</script></body></html>"""
+
+_WEATHER_PAGE = """<html><head><title>{city} Weather</title></head><body>
+<img src="../../../../radar.png" width="800" height="600">
+<div id="WxuCurrentConditions-main-{suffix}"><section data-testid="CurrentConditionsContainer">
+<div class="CurrentConditions--primary--{suffix}">
+<span data-testid="TemperatureValue" class="CurrentConditions--tempValue--{suffix}">{temperature}°</span>
+<div data-testid="wxPhrase" class="CurrentConditions--phraseValue--{suffix}">{phrase}</div>
+</div></section></div></body></html>"""
+
+
+def city_names(count):
+    return [f"City {i:04d}" for i in range(count)]
+
+
+def make_weather_site(directory, cities, seed=0):
+    """
+    Write a search page plus one location page per city with the element ids,
+    roles and data-testids demo_Climate_chk.py relies on (and random class
+    suffixes it must not). Returns {city: (temperature, phrase)}.
+    """
+    rng = random.Random(seed)
+    os.makedirs(os.path.join(directory, "weather", "today", "l"), exist_ok=True)
+    expected, locations = {}, {}
+    for i, city in enumerate(cities):
+        temperature, phrase = f"{rng.randint(-10, 42)}°", rng.choice(WEATHER_PHRASES)
+        href = f"weather/today/l/{i:06d}.html"
+        with open(os.path.join(directory, href), "w", encoding="utf-8") as f:
+            f.write(_WEATHER_PAGE.format(city=city, suffix=f"{rng.getrandbits(32):08x}",
+                                         temperature=temperature[:-1], phrase=phrase))
+        expected[city] = (temperature, phrase)
+        locations[city] = "/" + href
+    with open(os.path.join(directory, "index.html"), "w", encoding="utf-8") as f:
+        f.write(_WEATHER_INDEX % json.dumps(locations))
+    return expected
+
+
+# --- Chat page (whatsapp_batch.py fixture) ---
+_CHAT_PAGE = """<html><head><title>Chat</title></head><body>
+<div id="side">
+  <div contenteditable="true" role="textbox" data-tab="3" title="Search"></div>
+  <div id="pane-side-loading">Loading chats...</div>
+</div>
+<div id="main" style="display:none">
+  <header><span id="chat-title"></span></header>
+  <div id="messages"></div>
+  <footer><div contenteditable="true" role="textbox" data-tab="10"></div></footer>
+</div>
+<script>
+const CONTACTS = %s;
+const sent = {};
+let current = null;
+const search = document.querySelector("[data-tab='3']");
+const composer = document.querySelector("[data-tab='10']");
+const main = document.getElementById("main");
+const title = document.getElementById("chat-title");
+const messages = document.getElementById("messages");
+
+function renderList(filter) {
+  const pane = document.getElementById("pane-side");
+  pane.innerHTML = "";
+  for (const name of CONTACTS) {
+    if (!name.toLowerCase().includes(filter)) continue;
+    const row = document.createElement("div");
+    row.setAttribute("role", "listitem");
+    const span = document.createElement("span");
+    span.title = name;
+    span.textContent = name;
+    row.appendChild(span);
+    row.onclick = () => openChat(name);
+    pane.appendChild(row);
+  }
+}
+
+function openChat(name) {
+  current = name;
+  main.style.display = "block";
+  title.title = name;
+  title.textContent = name;
+  messages.innerHTML = (sent[name] || []).map(
+    text => '<div class="message-out"><span data-icon="msg-dblcheck"></span></div>').join("");
+}
+
+// The chat list appears once the "session" has loaded
+setTimeout(() => {
+  const pane = document.createElement("div");
+  pane.id = "pane-side";
+  document.getElementById("pane-side-loading").replaceWith(pane);
+  renderList("");
+}, 300);
+
+search.addEventListener("input", () => setTimeout(() => renderList(search.textContent.trim().toLowerCase()), 30));
+document.addEventListener("keydown", event => {
+  if (event.key === "Escape") { search.textContent = ""; renderList(""); }
+});
+composer.addEventListener("keydown", event => {
+  if (event.key !== "Enter" || event.shiftKey) return;
+  event.preventDefault();
+  const text = composer.innerText.trim();
+  if (!text || !current) return;
+  composer.textContent = "";
+  (sent[current] = sent[current] || []).push(text);
+  const bubble = document.createElement("div");
+  bubble.className = "message-out";
+  bubble.innerHTML = '<span class="text"></span><span data-icon="msg-time"></span>';
+  bubble.firstChild.textContent = text;
+  messages.appendChild(bubble);
+  // Delivered a moment later, like the real clock -> tick change
+  setTimeout(() => bubble.lastChild.setAttribute("data-icon", "msg-check"), 40);
+});
+</script></body></html>"""
+
+
+def contact_names(count):
+    return [f"Contact {i:04d}" for i in range(count)]
+
+
+def make_chat_site(directory, contacts):
+    """Write a single-page WhatsApp Web look-alike with the attributes whatsapp_batch.py waits on."""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "index.html"), "w", encoding="utf-8") as f:
+        f.write(_CHAT_PAGE % json.dumps(contacts))
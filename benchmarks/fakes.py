@@ -0,0 +1,123 @@
+"""
+Deterministic, offline stand-ins for ChatOpenAI and OpenAIEmbeddings.
+
+Both sleep for a configurable latency so the benchmarks can model a slow or
+fast API without a key or network access. The embeddings are hashed
+bag-of-words vectors, so texts sharing words land near each other and
+retrieval still returns sensible neighbours.
+"""
+import hashlib
+import re
+import threading
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+WORD_RE = re.compile(r"\w+")
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Sleeps `call_latency` seconds per request plus `per_text_latency` per
+    text, then returns normalized hashed bag-of-words vectors.
+    """
+
+    def __init__(self, dim=384, call_latency=0.0, per_text_latency=0.0):
+        self.dim = dim
+        self.call_latency = call_latency
+        self.per_text_latency = per_text_latency
+        self.calls = 0
+        self.texts = 0
+        self._lock = threading.Lock()
+
+    def _vector(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in WORD_RE.findall(text.lower()):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dim] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def _wait(self, count):
+        with self._lock:
+            self.calls += 1
+            self.texts += count
+        delay = self.call_latency + self.per_text_latency * count
+        if delay:
+            time.sleep(delay)
+
+    def embed_documents(self, texts):
+        self._wait(len(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        self._wait(1)
+        return self._vector(text)
+
+
+class PrecomputedEmbeddings(Embeddings):
+    """Returns vectors computed earlier, so index build time excludes embedding."""
+
+    def __init__(self, texts, vectors, fallback):
+        self.vectors = dict(zip(texts, vectors))
+        self.fallback = fallback
+
+    def embed_documents(self, texts):
+        return [self.vectors[text] if text in self.vectors else self.fallback.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.fallback.embed_query(text)
+
+
+def canned_reply(prompt):
+    """Answer shaped like what each of the apps' prompts expects back."""
+    if "Respond with just one word" in prompt:
+        return "FACTUAL"
+    if "Rewrite it to make it more specific" in prompt:
+        match = re.search(r'"(.*?)"', prompt, re.S)
+        return (match.group(1) if match else prompt[-80:]) + " details and explanation"
+    if "EVALUATE_CONTEXT" in prompt:
+        return (
+            "- Relevance Score (0-1): 0.8\n- Overall Quality: GOOD\n- Action Needed: No\n"
+            "- Refined Query (if needed): None\n- Reasoning: synthetic"
+        )
+    # Generation: echo the start of the context so answers depend on retrieval
+    words = WORD_RE.findall(prompt)
+    return "Based on the context: " + " ".join(words[20:60])
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that waits `latency` seconds before the first token and
+    `token_latency` seconds per streamed token, then returns canned_reply().
+    """
+
+    latency: float = 0.0
+    token_latency: float = 0.0
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    def _reply(self, messages):
+        return canned_reply("\n".join(str(message.content) for message in messages))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        text = self._reply(messages)
+        time.sleep(self.latency + self.token_latency * len(text.split()))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        text = self._reply(messages)
+        time.sleep(self.latency)
+        for word in text.split(" "):
+            if self.token_latency:
+                time.sleep(self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
@@ -0,0 +1,157 @@
+"""
+Local stand-in for the OpenAI API that enforces its own rate limits.
+
+    server = MockOpenAI(rpm=120, tpm=40000, inject_429=0.05).start()
+    ChatOpenAI(base_url=server.base_url, api_key="test", http_client=...)
+
+Answers /v1/chat/completions (plain and streamed, with the final usage
+chunk when `stream_options.include_usage` is set) and /v1/embeddings after
+`latency` seconds. Like the real API it keeps request and token budgets
+that replenish continuously over `window` seconds (a minute by default)
+and answers 429 with Retry-After once either is spent; `inject_429` adds
+random 429s on top. Every request is recorded
+(time, 429 or not, the client's X-Session header) for the benchmarks.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EMBEDDING_DIM = 1536
+
+
+class MockOpenAI:
+    def __init__(self, rpm=0, tpm=0, latency=0.05, inject_429=0.0, seed=0, window=60.0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = window
+        self.latency = latency
+        self.inject_429 = inject_429
+        self.random = random.Random(seed)
+        self.requests_left = float(rpm)
+        self.tokens_left = float(tpm)
+        self.updated = time.monotonic()
+        self.log = []  # dicts: time, path, status, session, tokens
+        self.injected_429s = 0
+        self.lock = threading.Lock()
+        self.server = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                mock.handle(self, body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def shutdown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    # --- Limits ---
+    def admit(self, tokens):
+        """None when the request fits the remaining budgets, else seconds until it would."""
+        with self.lock:
+            now = time.monotonic()
+            elapsed, self.updated = now - self.updated, now
+            self.requests_left = min(self.rpm, self.requests_left + elapsed * self.rpm / self.window)
+            self.tokens_left = min(self.tpm, self.tokens_left + elapsed * self.tpm / self.window)
+            if self.inject_429 and self.random.random() < self.inject_429:
+                self.injected_429s += 1
+                return 1.0
+            waits = []
+            if self.rpm and self.requests_left < 1:
+                waits.append((1 - self.requests_left) * self.window / self.rpm)
+            if self.tpm and self.tokens_left < tokens:
+                waits.append((tokens - self.tokens_left) * self.window / self.tpm)
+            if waits:
+                return max(0.1, max(waits))
+            self.requests_left -= 1
+            self.tokens_left -= tokens
+            return None
+
+    def handle(self, handler, body):
+        embeddings = handler.path.endswith("/embeddings")
+        if embeddings:
+            inputs = body.get("input", [])
+            inputs = inputs if isinstance(inputs, list) else [inputs]
+            prompt_tokens = sum(len(x) if isinstance(x, list) else len(str(x)) // 4 + 1 for x in inputs)
+            completion_tokens = 0
+        else:
+            prompt_tokens = sum(len(str(m.get("content", ""))) // 4 + 1 for m in body.get("messages", []))
+            completion_tokens = min(body.get("max_tokens") or 20, 20)
+        tokens = prompt_tokens + completion_tokens
+
+        retry_after = self.admit(tokens)
+        with self.lock:
+            self.log.append({
+                "time": time.monotonic(), "path": handler.path, "status": 429 if retry_after else 200,
+                "session": handler.headers.get("X-Session"), "tokens": tokens,
+            })
+        if retry_after:
+            self.send_json(handler, 429, {"error": {
+                "message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded",
+            }}, {"Retry-After": f"{retry_after:.2f}"})
+            return
+
+        time.sleep(self.latency)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": tokens}
+        if embeddings:
+            data = [{"object": "embedding", "index": i, "embedding": [0.01] * EMBEDDING_DIM} for i in range(len(inputs))]
+            self.send_json(handler, 200, {"object": "list", "data": data, "model": body.get("model"), "usage": usage})
+        elif body.get("stream"):
+            self.send_stream(handler, body, completion_tokens, usage)
+        else:
+            self.send_json(handler, 200, {
+                "id": "chatcmpl-mock", "object": "chat.completion", "created": int(time.time()), "model": body.get("model"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "word " * completion_tokens}}],
+                "usage": usage,
+            })
+
+    @staticmethod
+    def send_json(handler, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    @staticmethod
+    def send_stream(handler, body, completion_tokens, usage):
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+        for i in range(completion_tokens + 1):
+            delta = {"content": "word "} if i < completion_tokens else {}
+            chunk = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": body.get("model"),
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": None if delta else "stop"}]}
+            handler.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        if (body.get("stream_options") or {}).get("include_usage"):
+            # Like the API: one last chunk with no choices carrying the usage
+            chunk = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": body.get("model"), "choices": [], "usage": usage}
+            handler.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        handler.wfile.write(b"data: [DONE]\n\n")
+        handler.close_connection = True
@@ -0,0 +1,291 @@
+"""
+Bulk email over a small pool of persistent SMTP connections.
+
+Used by `demo_email.py --bulk`. Each worker thread keeps one SMTP session
+open (EHLO / STARTTLS / login once) and sends message after message on it.
+When the server advertises PIPELINING (RFC 2920) the envelope (MAIL FROM,
+every RCPT TO and DATA) goes out in one write, so a message costs two round
+trips instead of three or more.
+
+Temporary failures (4xx replies, dropped connections) are retried with
+exponential backoff on a fresh connection; permanent ones (5xx, rejected
+credentials, a server lacking a required extension) are reported straight
+away. Any other error is recorded as that recipient's failure and the
+batch carries on. A shared throttle caps messages per second across
+all connections, since providers rate-limit per account rather than per
+connection.
+"""
+import csv
+import logging
+import os
+import queue
+import random
+import re
+import smtplib
+import ssl
+import threading
+import time
+from dataclasses import asdict, dataclass, fields
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid, parseaddr
+
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USER = os.getenv("SMTP_USER", "")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")  # for Gmail, an app password
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") not in ("", "0", "false")
+SMTP_SENDER = os.getenv("SMTP_SENDER", SMTP_USER)
+
+LINE_END_RE = re.compile(rb"\r\n|\r|\n")
+LEADING_DOT_RE = re.compile(rb"(?m)^\.")
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SendResult:
+    recipient: str
+    status: str = "sent"  # "sent" or "failed"
+    attempts: int = 0
+    code: int = None
+    error: str = None
+    seconds: float = 0.0
+
+
+class TemplateError(ValueError):
+    pass
+
+
+class PermanentFailure(Exception):
+    def __init__(self, code, message):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class TransientFailure(Exception):
+    def __init__(self, code, message):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+def read_recipients(path):
+    """Rows with at least an "email" key: a CSV with an email column, or one address per line."""
+    with open(path, newline="", encoding="utf-8") as f:
+        first = f.readline()
+        f.seek(0)
+        if "," in first or first.strip().lower() == "email":
+            rows = list(csv.DictReader(f))
+            if rows and "email" not in rows[0]:
+                raise ValueError(f"{path}: CSV needs an 'email' column")
+            return [row for row in rows if row.get("email", "").strip()]
+        return [{"email": line.strip()} for line in f if line.strip() and not line.startswith("#")]
+
+
+def render(template, row):
+    try:
+        return template.format_map(row)
+    except (KeyError, IndexError, ValueError) as e:
+        raise TemplateError(f"template needs {e} which the recipient row does not have") from e
+
+
+def build_message(sender, row, subject_template, body_template):
+    message = EmailMessage()
+    message["From"] = sender
+    message["To"] = row["email"].strip()
+    message["Subject"] = render(subject_template, row)
+    message["Date"] = formatdate(localtime=True)
+    message["Message-ID"] = make_msgid()
+    message.set_content(render(body_template, row))
+    return message
+
+
+class Throttle:
+    """At most `rate` acquisitions per second across threads (0: unlimited)."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def _dot_stuff(body):
+    """DATA payload as SMTP.data() sends it: CRLF line endings, leading dots doubled, final "."."""
+    body = LEADING_DOT_RE.sub(b"..", LINE_END_RE.sub(b"\r\n", body))
+    if not body.endswith(b"\r\n"):
+        body += b"\r\n"
+    return body + b".\r\n"
+
+
+class SMTPConnection:
+    """One persistent SMTP session, (re)opened on demand."""
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, user=SMTP_USER, password=SMTP_PASSWORD,
+                 starttls=SMTP_STARTTLS, timeout=30):
+        self.host, self.port = host, port
+        self.user, self.password = user, password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.smtp = None
+
+    def open(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        smtp.ehlo()
+        if self.starttls:
+            smtp.starttls(context=ssl.create_default_context())
+            smtp.ehlo()
+        if self.user:
+            smtp.login(self.user, self.password)
+        self.smtp = smtp
+
+    def close(self):
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                self.smtp.close()
+            self.smtp = None
+
+    def send(self, message):
+        """Raises PermanentFailure / TransientFailure, or OSError / SMTPServerDisconnected on a dead session."""
+        if self.smtp is None:
+            self.open()
+        sender = message["From"]
+        recipients = [message["To"]]
+        if self.smtp.has_extn("pipelining"):
+            self._send_pipelined(sender, recipients, message.as_bytes())
+            return
+        try:
+            self.smtp.sendmail(sender, recipients, message.as_bytes())
+        except smtplib.SMTPRecipientsRefused as e:
+            code, reply = next(iter(e.recipients.values()))
+            self._raise(code, reply)
+        except (smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+            self._raise(e.smtp_code, e.smtp_error)
+
+    def _send_pipelined(self, sender, recipients, body):
+        # The envelope takes bare addresses, not "Name <address>" headers
+        sender = parseaddr(sender)[1]
+        recipients = [parseaddr(recipient)[1] for recipient in recipients]
+        smtp = self.smtp
+        smtp.send(f"MAIL FROM:<{sender}>\r\n" + "".join(f"RCPT TO:<{r}>\r\n" for r in recipients) + "DATA\r\n")
+        mail_reply = smtp.getreply()
+        rcpt_replies = [smtp.getreply() for _ in recipients]
+        data_code, data_message = smtp.getreply()
+        failure = mail_reply if mail_reply[0] != 250 else next((r for r in rcpt_replies if r[0] not in (250, 251)), None)
+        if data_code == 354:
+            if failure:
+                # The server accepted DATA anyway: end it empty, then report the envelope failure
+                smtp.send(b".\r\n")
+                smtp.getreply()
+            else:
+                smtp.send(_dot_stuff(body))
+                failure = smtp.getreply()
+                if failure[0] == 250:
+                    return
+        elif failure is None:
+            failure = (data_code, data_message)
+        smtp.rset()
+        self._raise(*failure)
+
+    @staticmethod
+    def _raise(code, reply):
+        reply = reply.decode("utf-8", "replace") if isinstance(reply, bytes) else str(reply)
+        if 400 <= code < 500:
+            raise TransientFailure(code, reply)
+        raise PermanentFailure(code, reply)
+
+
+def send_bulk(rows, subject_template, body_template, sender=SMTP_SENDER, connections=4, rate=0.0,
+              max_retries=3, backoff=1.0, connect=None, on_result=None):
+    """
+    Send one message per recipient row; returns SendResults in row order.
+
+    `connect()` returns a fresh SMTPConnection (default: from SMTP_* env).
+    `rate` caps messages per second across all connections (0: no cap).
+    """
+    connect = connect or SMTPConnection
+    throttle = Throttle(rate)
+    results = [None] * len(rows)
+    work = queue.Queue()
+    for index, row in enumerate(rows):
+        work.put((index, row))
+
+    def worker():
+        connection = connect()
+        try:
+            while True:
+                try:
+                    index, row = work.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    results[index] = send_one(connection, row)
+                except Exception as e:
+                    # A bad row (e.g. a header it cannot encode) must not stop this worker's queue
+                    logger.exception("row %d failed", index)
+                    results[index] = SendResult(recipient=str(row.get("email", "")).strip(), status="failed",
+                                                attempts=1, error=f"{type(e).__name__}: {e}")
+                    connection.close()
+                if on_result:
+                    on_result(results[index])
+        finally:
+            connection.close()
+
+    def send_one(connection, row):
+        result = SendResult(recipient=row["email"].strip())
+        start = time.perf_counter()
+        try:
+            message = build_message(sender, row, subject_template, body_template)
+        except TemplateError as e:
+            result.status, result.error = "failed", str(e)
+            return result
+        while True:
+            result.attempts += 1
+            throttle.wait()
+            try:
+                connection.send(message)
+                break
+            except PermanentFailure as e:
+                result.status, result.code, result.error = "failed", e.code, str(e)
+                break
+            except (TransientFailure, smtplib.SMTPException, OSError) as e:
+                result.code = getattr(e, "code", getattr(e, "smtp_code", None))
+                result.error = f"{type(e).__name__}: {e}"
+                # Start the retry on a clean session: the failure may have left this one unusable
+                connection.close()
+                permanent = (smtplib.SMTPAuthenticationError, smtplib.SMTPNotSupportedError)
+                if isinstance(e, permanent) or result.attempts > max_retries:
+                    result.status = "failed"
+                    break
+                delay = backoff * 2 ** (result.attempts - 1) * (0.5 + random.random())
+                logger.info("%s: %s, retrying in %.1fs", result.recipient, result.error, delay)
+                time.sleep(delay)
+        if result.status == "sent":
+            result.code, result.error = 250, None
+        result.seconds = time.perf_counter() - start
+        return result
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, min(connections, len(rows))))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def write_report(results, path):
+    """CSV of every send (status, attempts, last SMTP code and error)."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=[field.name for field in fields(SendResult)])
+        writer.writeheader()
+        writer.writerows(asdict(result) for result in results)
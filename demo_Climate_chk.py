@@ -1,44 +1,307 @@
-from playwright.sync_api import sync_playwright
+"""
+Current weather for many cities from weather.com, scraped with headless
+Playwright.
 
-CITY = "Chennai"
+    python demo_Climate_chk.py Chennai Mumbai Delhi
+    python demo_Climate_chk.py --cities-file cities.txt --contexts 8 --output weather.csv
+    python demo_Climate_chk.py --cities-file cities.txt --every 1800 --output weather.json
+    python demo_Climate_chk.py Chennai --base-url http://127.0.0.1:8000/   # local fixture site
 
-with sync_playwright() as p:
-    browser = p.chromium.launch(headless=False)
-    context = browser.new_context()
-    page = context.new_page()
+One headless Chromium serves every city through a bounded pool of browser
+contexts (--contexts), so hundreds of cities run concurrently without
+hundreds of browsers. Images, media, fonts and ad/analytics hosts are
+blocked before they are requested. Elements are found by id, role and
+data-testid instead of generated CSS-module class names.
 
-    # Step 1: Visit weather.com
-    page.goto("https://weather.com", timeout=60000)
+Results are cached in WEATHER_CACHE_FILE for WEATHER_CACHE_TTL seconds.
+The location page each search resolved to is remembered as well, so once a
+result expires the city is fetched directly without repeating the search.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, fields
 
-    # Step 2: Accept cookies (if shown)
-    try:
-        page.locator("button:has-text('Accept')").click(timeout=5000)
-    except:
-        pass  # Safe to ignore if not shown
+from playwright.async_api import Error as PlaywrightError
+from playwright.async_api import async_playwright
+
+BASE_URL = os.getenv("WEATHER_BASE_URL", "https://weather.com/")
+CACHE_FILE = os.getenv("WEATHER_CACHE_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "weather.json"))
+CACHE_TTL = int(os.getenv("WEATHER_CACHE_TTL", "900"))
+BROWSER_PATH = os.getenv("WEATHER_BROWSER_PATH", "")  # e.g. a system Chrome instead of Playwright's Chromium
+
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+BLOCKED_HOSTS = (
+    "doubleclick.net", "googlesyndication.com", "googletagservices.com", "googletagmanager.com",
+    "google-analytics.com", "amazon-adsystem.com", "adsafeprotected.com", "taboola.com", "outbrain.com",
+    "scorecardresearch.com", "chartbeat.net", "krxd.net", "pubmatic.com", "rubiconproject.com",
+)
+
+# Ids, roles and data-testids: these survive weather.com's class-name rebuilds
+SEARCH_INPUT = "#headerSearch_LocationSearch_input"
+SEARCH_OPTION = "#headerSearch_LocationSearch_listbox [role='option']"
+CURRENT_CONDITIONS = "[data-testid='CurrentConditionsContainer']"
+TEMPERATURE = f"{CURRENT_CONDITIONS} [data-testid='TemperatureValue']"
+PHRASE = f"{CURRENT_CONDITIONS} [data-testid='wxPhrase']"
+CONSENT_BUTTON = "button:has-text('Accept')"
+
+logger = logging.getLogger("weather")
+
+
+@dataclass
+class Conditions:
+    city: str
+    temperature: str = ""
+    condition: str = ""
+    url: str = ""
+    fetched_at: float = 0.0
+    seconds: float = 0.0
+    cached: bool = False
+    error: str = None
+
+
+class ResultCache:
+    """City -> last successful Conditions, persisted as JSON; fresh for `ttl` seconds."""
+
+    def __init__(self, path, ttl=CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        try:
+            with open(path, encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    @staticmethod
+    def _key(city):
+        return city.strip().lower()
+
+    def get(self, city):
+        entry = self._entries.get(self._key(city))
+        if entry and time.time() - entry["fetched_at"] < self.ttl:
+            return Conditions(**{**entry, "city": city, "cached": True, "seconds": 0.0})
+        return None
+
+    def location_url(self, city):
+        """Page the last search for `city` resolved to, fresh or not."""
+        entry = self._entries.get(self._key(city))
+        return entry["url"] if entry else None
+
+    def put(self, result):
+        self._entries[self._key(result.city)] = asdict(result)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp, self.path)
+
+
+async def block_heavy_requests(route):
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or any(host in request.url for host in BLOCKED_HOSTS):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+class ContextPool:
+    """`size` browser contexts shared by all cities; acquire() waits for a free one."""
+
+    def __init__(self, browser, size):
+        self.browser = browser
+        self.size = size
+        self._free = asyncio.Queue()
+        self._contexts = []
+
+    async def __aenter__(self):
+        for _ in range(self.size):
+            context = await self.browser.new_context(locale="en-US")
+            await context.route("**/*", block_heavy_requests)
+            self._contexts.append(context)
+            self._free.put_nowait(context)
+        return self
+
+    async def __aexit__(self, *exc):
+        for context in self._contexts:
+            await context.close()
+
+    @asynccontextmanager
+    async def acquire(self):
+        context = await self._free.get()
+        try:
+            yield context
+        finally:
+            self._free.put_nowait(context)
 
-    # Step 3: Click the search icon (top right)
+
+async def _dismiss_consent(page):
+    button = page.locator(CONSENT_BUTTON)
     try:
-        page.locator("#headerSearch_LocationSearch_input").click(timeout=8000)
-    except:
-        print("❌ Could not find search icon.")
-
-    # Step 4: Search for city
-    search_input = page.locator("#headerSearch_LocationSearch_input")
-    search_input.wait_for(timeout=10000)
-    search_input.fill(CITY)
-    page.keyboard.press("Enter")
-
-    # Step 5: Wait for weather data
-    temp_locator = page.locator("#WxuCurrentConditions-main-b3094163-ef75-4558-8d9a-e35e6b9b1034 > div > section > div > div > div.CurrentConditions--body--r20G9 > div.CurrentConditions--primary--A\+Brf > div > div.CurrentConditions--tempIconContainer--mWt\+L > span.CurrentConditions--tempValue--zUBSz")
-    desc_locator = page.locator("#WxuCurrentConditions-main-b3094163-ef75-4558-8d9a-e35e6b9b1034 > div > section > div > div > div.CurrentConditions--body--r20G9 > div.CurrentConditions--primary--A\+Brf > div > div.CurrentConditions--phraseValue---VS-k")
-
-    temp_locator.wait_for(timeout=15000)
-    temperature = temp_locator.inner_text()
-    description = desc_locator.inner_text()
-
-    # Step 6: Output result
-    print(f"\n📍 Weather in {CITY}")
-    print(f"🌡️ Temperature: {temperature}")
-    print(f"🌤️ Condition: {description}\n")
-
-    browser.close()
+        if await button.count():
+            await button.first.click(timeout=2000)
+    except PlaywrightError:
+        pass  # Banner not shown or already gone
+
+
+async def _read_conditions(page, city, timeout_ms):
+    temperature = page.locator(TEMPERATURE).first
+    await temperature.wait_for(timeout=timeout_ms)
+    return Conditions(
+        city=city,
+        temperature=(await temperature.inner_text()).strip(),
+        condition=(await page.locator(PHRASE).first.inner_text(timeout=timeout_ms)).strip(),
+        url=page.url,
+        fetched_at=time.time(),
+    )
+
+
+async def _search(page, city, base_url, timeout_ms):
+    await page.goto(base_url, wait_until="domcontentloaded", timeout=timeout_ms)
+    await _dismiss_consent(page)
+    await page.locator(SEARCH_INPUT).fill(city, timeout=timeout_ms)
+    await page.locator(SEARCH_OPTION).first.click(timeout=timeout_ms)
+    return await _read_conditions(page, city, timeout_ms)
+
+
+async def fetch_city(pool, city, base_url=BASE_URL, location_url=None, timeout_ms=15000):
+    """Conditions for one city; never raises, failures come back in `error`."""
+    start = time.perf_counter()
+    async with pool.acquire() as context:
+        page = None
+        try:
+            page = await context.new_page()
+            result = None
+            if location_url:
+                try:
+                    await page.goto(location_url, wait_until="domcontentloaded", timeout=timeout_ms)
+                    result = await _read_conditions(page, city, timeout_ms)
+                except Exception:
+                    logger.info("%s: saved location page failed, searching again", city)
+            if result is None:
+                result = await _search(page, city, base_url, timeout_ms)
+        except Exception as e:
+            # Any failure (browser, page layout, parsing) only costs this city its result
+            message = str(e).splitlines()
+            result = Conditions(city=city, error=f"{type(e).__name__}: {message[0]}" if message else type(e).__name__)
+        finally:
+            if page is not None:
+                try:
+                    await page.close()
+                except PlaywrightError:
+                    pass  # context or browser already gone; the result above stands
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+async def scrape(cities, contexts=4, base_url=BASE_URL, cache=None, timeout_ms=15000, headless=True, on_result=None):
+    """Conditions for every city (in input order); fresh cache entries skip the browser."""
+    if contexts < 1:
+        raise ValueError(f"contexts must be at least 1, got {contexts}")
+    cities = list(dict.fromkeys(city.strip() for city in cities if city.strip()))
+    results = {}
+    pending = []
+    for city in cities:
+        hit = cache.get(city) if cache else None
+        if hit:
+            results[city] = hit
+            if on_result:
+                on_result(hit)
+        else:
+            pending.append(city)
+
+    if pending:
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=headless, executable_path=BROWSER_PATH or None)
+            try:
+                async with ContextPool(browser, min(contexts, len(pending))) as pool:
+                    async def one(city):
+                        location_url = cache.location_url(city) if cache else None
+                        result = await fetch_city(pool, city, base_url, location_url, timeout_ms)
+                        results[city] = result
+                        if cache and not result.error:
+                            # Cached as soon as it lands, so an interrupted batch keeps what it fetched
+                            cache.put(result)
+                        if on_result:
+                            on_result(result)
+
+                    await asyncio.gather(*(one(city) for city in pending))
+            finally:
+                await browser.close()
+                if cache:
+                    cache.save()
+    return [results[city] for city in cities]
+
+
+def write_results(results, path):
+    rows = [asdict(result) for result in results]
+    if path.endswith(".csv"):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=[field.name for field in fields(Conditions)])
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+def read_cities(args):
+    cities = list(args.cities)
+    if args.cities_file:
+        with open(args.cities_file, encoding="utf-8") as f:
+            cities.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    return cities
+
+
+def print_result(result):
+    if result.error:
+        print(f"❌ {result.city}: {result.error}")
+    else:
+        source = "cache" if result.cached else f"{result.seconds:.1f}s"
+        print(f"📍 {result.city}: 🌡️ {result.temperature} · 🌤️ {result.condition} ({source})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cities", nargs="*", help="city names (default: Chennai)")
+    parser.add_argument("--cities-file", help="one city per line")
+    parser.add_argument("--contexts", type=int, default=4, help="browser contexts scraping in parallel")
+    parser.add_argument("--base-url", default=BASE_URL, help="site to search (e.g. a local fixture server)")
+    parser.add_argument("--timeout", type=float, default=15, help="seconds to wait for each page step")
+    parser.add_argument("--ttl", type=int, default=CACHE_TTL, help="seconds a cached result stays fresh")
+    parser.add_argument("--cache-file", default=CACHE_FILE)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--output", help=".json or .csv")
+    parser.add_argument("--every", type=float, default=0, help="repeat every N seconds (0: run once)")
+    parser.add_argument("--headed", action="store_true", help="show the browser (debugging)")
+    args = parser.parse_args()
+    if args.contexts < 1:
+        parser.error("--contexts must be at least 1")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    cities = read_cities(args) or ["Chennai"]
+    while True:
+        cache = None if args.no_cache else ResultCache(args.cache_file, ttl=args.ttl)
+        start = time.perf_counter()
+        results = asyncio.run(scrape(
+            cities, contexts=args.contexts, base_url=args.base_url, cache=cache,
+            timeout_ms=int(args.timeout * 1000), headless=not args.headed, on_result=print_result,
+        ))
+        failed = sum(1 for result in results if result.error)
+        cached = sum(1 for result in results if result.cached)
+        logger.info("%d cities (%d cached, %d failed) in %.1fs", len(results), cached, failed, time.perf_counter() - start)
+        if args.output:
+            write_results(results, args.output)
+        if not args.every:
+            raise SystemExit(1 if failed else 0)
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    main()
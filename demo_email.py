@@ -1,32 +1,117 @@
-import pyautogui
+"""
+Send email by driving the Gmail UI (one message), or in bulk over SMTP.
+
+    python demo_email.py                                    # Gmail UI automation
+    python demo_email.py --bulk recipients.csv --subject "Order {order_id} shipped" \\
+        --body-file body.txt --connections 4 --rate 10 --report send_report.csv
+
+Bulk mode reads a CSV with an "email" column (other columns fill {name}
+placeholders in the subject/body) or a file of one address per line, and
+sends through bulk_email.py. SMTP settings come from SMTP_HOST, SMTP_PORT,
+SMTP_USER, SMTP_PASSWORD, SMTP_STARTTLS and SMTP_SENDER, or the flags below.
+"""
+import argparse
+import logging
+import sys
 import time
 import webbrowser
 
-# Global pause between commands
-pyautogui.PAUSE = 1
-pyautogui.FAILSAFE = True  # Move mouse to top-left to stop script
+import bulk_email
+
+
+def send_via_gmail_ui():
+    import pyautogui
+
+    # Global pause between commands
+    pyautogui.PAUSE = 1
+    pyautogui.FAILSAFE = True  # Move mouse to top-left to stop script
+
+    # Step 1: Open Gmail in the browser
+    webbrowser.open("https://mail.google.com/mail/u/0/#inbox")
+    time.sleep(5)  # Wait for Gmail to load
+
+    # Step 2: Click the Compose button (replace x, y with your actual coordinates)
+    pyautogui.click(x=142, y=254)  # <-- Update this to your Compose button
+    time.sleep(2)
+
+    # Step 3: Type recipient email
+    pyautogui.write('receiver@example.com')
+    pyautogui.press('tab')  # Navigate to subject
+    pyautogui.press('tab')  # Navigate to subject
+
+    # Step 4: Type subject
+    pyautogui.write('Test Email from Python RPA')
+    pyautogui.press('tab')  # Navigate to body
+
+    # Step 5: Type email body
+    pyautogui.write('Hi,\n\nThis is a test email sent using PyAutoGUI automation.\n\nRegards,\nRPA Bot')
+    time.sleep(1)
+
+    # Step 6: Send the email using Ctrl + Enter
+    pyautogui.hotkey('ctrl', 'enter')
+    print("Email sent!")
+
+
+def send_bulk_from_args(args):
+    if args.body_file:
+        with open(args.body_file, encoding="utf-8") as f:
+            body = f.read()
+    else:
+        body = args.body
+    if not (args.subject and body):
+        raise SystemExit("--bulk needs --subject and --body or --body-file")
+    if not args.sender:
+        raise SystemExit("--bulk needs --sender (or SMTP_SENDER / SMTP_USER)")
+
+    rows = bulk_email.read_recipients(args.bulk)
+    done = 0
+
+    def on_result(result):
+        nonlocal done
+        done += 1
+        if result.status != "sent":
+            logging.warning("%s failed after %d attempt(s): %s", result.recipient, result.attempts, result.error)
+        elif done % 100 == 0:
+            logging.info("%d/%d sent", done, len(rows))
 
-# Step 1: Open Gmail in the browser
-webbrowser.open("https://mail.google.com/mail/u/0/#inbox")
-time.sleep(5)  # Wait for Gmail to load
+    start = time.perf_counter()
+    results = bulk_email.send_bulk(
+        rows, args.subject, body, sender=args.sender, connections=args.connections, rate=args.rate,
+        max_retries=args.retries,
+        connect=lambda: bulk_email.SMTPConnection(args.host, args.port, starttls=not args.no_starttls),
+        on_result=on_result,
+    )
+    elapsed = time.perf_counter() - start
+    failed = [result for result in results if result.status != "sent"]
+    print(f"📧 {len(results) - len(failed)} sent, {len(failed)} failed in {elapsed:.1f}s "
+          f"({len(results) / max(elapsed, 1e-9):.1f} messages/s)")
+    if args.report:
+        bulk_email.write_report(results, args.report)
+        print(f"Report written to {args.report}")
+    return 1 if failed else 0
 
-# Step 2: Click the Compose button (replace x, y with your actual coordinates)
-pyautogui.click(x=142, y=254)  # <-- Update this to your Compose button
-time.sleep(2)
 
-# Step 3: Type recipient email
-pyautogui.write('receiver@example.com')
-pyautogui.press('tab')  # Navigate to subject
-pyautogui.press('tab')  # Navigate to subject
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bulk", metavar="RECIPIENTS", help="CSV with an email column, or one address per line")
+    parser.add_argument("--subject", help="subject template, e.g. 'Hello {name}'")
+    parser.add_argument("--body", help="body template")
+    parser.add_argument("--body-file", help="file holding the body template")
+    parser.add_argument("--sender", default=bulk_email.SMTP_SENDER)
+    parser.add_argument("--host", default=bulk_email.SMTP_HOST)
+    parser.add_argument("--port", type=int, default=bulk_email.SMTP_PORT)
+    parser.add_argument("--no-starttls", action="store_true", default=not bulk_email.SMTP_STARTTLS)
+    parser.add_argument("--connections", type=int, default=4, help="persistent SMTP connections")
+    parser.add_argument("--rate", type=float, default=0, help="max messages per second overall (0: no cap)")
+    parser.add_argument("--retries", type=int, default=3, help="retries for temporary failures")
+    parser.add_argument("--report", help="write every send's status to this CSV")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 
-# Step 4: Type subject
-pyautogui.write('Test Email from Python RPA')
-pyautogui.press('tab')  # Navigate to body
+    if args.bulk:
+        sys.exit(send_bulk_from_args(args))
+    send_via_gmail_ui()
 
-# Step 5: Type email body
-pyautogui.write('Hi,\n\nThis is a test email sent using PyAutoGUI automation.\n\nRegards,\nRPA Bot')
-time.sleep(1)
 
-# Step 6: Send the email using Ctrl + Enter
-pyautogui.hotkey('ctrl', 'enter')
-print("Email sent!")
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,19 @@
+import asyncio
 import os
+import uuid
+from contextlib import nullcontext
 from dotenv import load_dotenv
 import streamlit as st
 
-from langchain_community.document_loaders import WebBaseLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_community.vectorstores import Chroma
-from langchain.chains import RetrievalQA
-from langchain_core.prompts import PromptTemplate
+from rag_common.crawler import CrawlState, crawl
+from rag_common.rate_limit import render_limiter_metrics, session_scope
+from rag_common.streaming import StreamlitTokenHandler
+from rag_common.tracing import render_latency_panel
+from rag_common.web_index import PersistentWebIndex, collection_name_for
+from web_pipeline import (
+    DEDUP_THRESHOLD, WEB_INDEX_DIR, WebQA, build_embeddings, build_page_store, chroma_nbytes, drop_chroma, load_chroma,
+    load_url_chunks, new_store_cache, page_store_key, save_chroma,
+)
 
 # --- 0. Streamlit Page Configuration ---
 st.set_page_config(
@@ -51,45 +57,61 @@ with st.sidebar:
         "https://www.jovintech.in/#[object%20Object]" # Default URL
     )
 
+    load_mode = st.radio("Mode", ["Single page", "Crawl site / sitemap"])
+    if load_mode == "Crawl site / sitemap":
+        st.caption("Enter a seed URL (same-host links are followed) or a sitemap .xml URL.")
+        max_pages = st.number_input("Max pages", min_value=1, max_value=5000, value=50)
+        max_depth = st.number_input("Max link depth", min_value=0, max_value=10, value=2)
+        per_host = st.number_input("Concurrent requests per host", min_value=1, max_value=32, value=4)
+        refresh_crawl = st.button("🔄 Refresh crawl")
+
+    show_latency = st.checkbox("Show latency panel", value=os.getenv("RAG_LATENCY_PANEL", "") not in ("", "0", "false"))
+
     st.markdown("---")
-    st.info("💡 **Tip:** Clear cache if you change the URL to re-process content.")
-    if st.button("Clear Cache"):
-        st.cache_resource.clear()
-        st.success("Cache cleared!")
-        st.rerun() # Rerun the app to re-process with new URL (if entered)
+    # Drops only this URL's store; other users' pages stay cached
+    reprocess = load_mode == "Single page" and st.button("♻️ Re-process this URL")
+    store_metrics = st.empty()
 
 # --- Define Caching for Expensive Operations ---
-@st.cache_resource(show_spinner="Loading and processing website content...")
+@st.cache_resource
+def get_embeddings(api_key: str):
+    """Embeddings backed by the shared on-disk cache (see web_pipeline.build_embeddings)."""
+    return build_embeddings(api_key)
+
+
+@st.cache_resource
+def get_store_cache():
+    # Shared by every session: memory budget, LRU/TTL eviction, evicted stores spilled to disk
+    return new_store_cache()
+
+
 def load_and_process_website(url: str, api_key: str):
     """
     Loads website content, splits it into chunks, creates embeddings,
-    and stores them in a vector database. Caches the result.
+    and stores them in a vector database. Runs only on a cache miss.
     """
-    if not url:
-        return None, None
-
     try:
         # Set the OpenAI API key for LangChain's models globally
         os.environ["OPENAI_API_KEY"] = api_key
 
         st.write(f"Loading content from: {url}")
-        loader = WebBaseLoader(url)
-        docs = loader.load()
-        st.write(f"Loaded {len(docs)} document(s).")
-
-        st.write("Splitting documents into chunks...")
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-        )
-        chunks = text_splitter.split_documents(docs)
-        st.write(f"Split into {len(chunks)} chunks.")
+        docs, chunks, dedup_report = load_url_chunks(url)
+        st.write(f"Loaded {len(docs)} document(s), split into {len(chunks)} chunks.")
+        if dedup_report and dedup_report.removed:
+            savings = dedup_report.savings()
+            st.write(
+                f"Skipped {dedup_report.removed} duplicate chunks ({dedup_report.exact_dropped} exact, "
+                f"{dedup_report.near_dropped} near), ~{savings['embedding_tokens_saved']} embedding tokens saved."
+            )
 
         st.write("Creating embeddings and storing in vector database (ChromaDB)...")
-        embeddings = OpenAIEmbeddings()
-        vectorstore = Chroma.from_documents(chunks, embeddings)
-        st.write("Vector database created.")
+        embeddings = get_embeddings(api_key)
+        hits, misses = embeddings.hits, embeddings.misses
+        vectorstore = build_page_store(chunks, embeddings, url)
+        st.write(
+            f"Vector database created ({embeddings.hits - hits} chunk embeddings reused from cache, "
+            f"{embeddings.misses - misses} newly embedded)."
+        )
 
         return vectorstore
 
@@ -99,35 +121,96 @@ def load_and_process_website(url: str, api_key: str):
         return None
 
 
-# --- Load and Process Website Content ---
-# This function will only run once and cache its results
-vectorstore = load_and_process_website(website_url, OPENAI_API_KEY)
+def page_store_hooks(url: str, api_key: str):
+    """How the store cache builds, spills, reloads, frees and sizes the store of one page."""
+    embeddings = get_embeddings(api_key)
+    return dict(
+        build=lambda: load_and_process_website(url, api_key),
+        save=save_chroma,
+        load=lambda path: load_chroma(path, embeddings, url),
+        drop=drop_chroma,
+        size_of=chroma_nbytes,
+    )
 
-if vectorstore:
-    # --- 5. Set up the Retriever ---
-    retriever = vectorstore.as_retriever()
-
-    # --- 6. Define the LLM and Prompt Template ---
-    llm = ChatOpenAI(model_name="gpt-3.5-turbo", temperature=0.5)
-
-    qa_template = """Use the following pieces of context to answer the user's question.
-    If you don't know the answer, just say that you don't know, don't try to make up an answer.
-    ----------------
-    {context}
-    ----------------
-    Question: {question}
-    Answer:"""
-    QA_CHAIN_PROMPT = PromptTemplate.from_template(qa_template)
-
-    # --- 7. Create the RetrievalQA Chain ---
-    qa_chain = RetrievalQA.from_chain_type(
-        llm=llm,
-        chain_type="stuff",
-        retriever=retriever,
-        return_source_documents=True,
-        chain_type_kwargs={"prompt": QA_CHAIN_PROMPT}
+
+@st.cache_resource(show_spinner="Opening site index...")
+def get_site_index(seed_url: str, api_key: str):
+    """Persistent Chroma collection for one crawl seed (survives restarts)."""
+    return PersistentWebIndex(WEB_INDEX_DIR, get_embeddings(api_key), collection_name_for(seed_url),
+                              dedup_threshold=DEDUP_THRESHOLD)
+
+
+@st.cache_resource
+def get_crawl_log():
+    # seed URL -> stats of the last crawl in this process
+    return {}
+
+
+def crawl_site(seed_url: str, api_key: str):
+    """
+    Crawls the site concurrently with conditional GETs and upserts only new or
+    changed chunks into the persistent collection.
+    """
+    index = get_site_index(seed_url, api_key)
+    state = CrawlState(os.path.join(WEB_INDEX_DIR, collection_name_for(seed_url) + ".crawl.json"))
+    progress = st.empty()
+    fetched = []
+
+    def on_page(result):
+        fetched.append(result)
+        progress.write(f"Fetched {len(fetched)} page(s)... latest: {result.status} {result.url}")
+
+    with st.spinner(f"Crawling {seed_url}..."):
+        results = asyncio.run(crawl(
+            seed_url, state,
+            max_pages=int(max_pages), max_depth=int(max_depth), per_host=int(per_host),
+            user_agent=USER_AGENT, on_page=on_page,
+        ))
+        stats = index.sync(results, state)
+    progress.empty()
+    get_crawl_log()[seed_url] = stats
+    return index
+
+
+# --- Load and Process Website Content ---
+if load_mode == "Crawl site / sitemap" and website_url:
+    if refresh_crawl or website_url not in get_crawl_log():
+        try:
+            site_index = crawl_site(website_url, OPENAI_API_KEY)
+        except Exception as e:
+            # Unreachable sitemap, malformed sitemap XML or an invalid URL
+            st.error(f"Failed to crawl {website_url}: {e}")
+            st.stop()
+    else:
+        site_index = get_site_index(website_url, OPENAI_API_KEY)
+    stats = get_crawl_log()[website_url]
+    st.caption(
+        f"Last crawl: {stats['new']} new, {stats['changed']} changed, {stats['unchanged']} unchanged, "
+        f"{stats['gone']} gone, {stats['error']} failed pages · {stats['chunks_added']} chunks embedded, "
+        f"{stats['chunks_removed']} removed, {stats['chunks_kept']} kept, "
+        f"{stats['chunks_deduplicated']} duplicates skipped"
     )
+    vectorstore = site_index.vectorstore
+elif website_url:
+    if reprocess:
+        get_store_cache().invalidate(page_store_key(website_url))
+    with st.spinner("Loading and processing website content..."):
+        vectorstore, store_source = get_store_cache().get_or_build(
+            page_store_key(website_url), **page_store_hooks(website_url, OPENAI_API_KEY)
+        )
+    if store_source == "disk":
+        st.caption("♻️ Reloaded this page's vectors from disk, nothing re-embedded.")
+else:
+    vectorstore = None
 
+metrics = get_store_cache().metrics()
+store_metrics.caption(
+    f"🗃️ Page stores: {metrics['resident']} in memory ({metrics['resident_bytes'] / 2**20:.1f} of "
+    f"{metrics['max_bytes'] / 2**20:.0f} MB), {metrics['spilled']} on disk · {metrics['hits']} hits, "
+    f"{metrics['disk_hits']} reloads, {metrics['misses']} builds, {metrics['evictions'] + metrics['expired']} evictions"
+)
+
+if vectorstore:
     # --- 8. Interact with the LLM Application (UI) ---
     st.subheader("Ask a Question")
     user_question = st.text_area(
@@ -140,13 +223,38 @@ if vectorstore:
         if user_question:
             with st.spinner("Thinking..."):
                 try:
-                    response = qa_chain.invoke({"query": user_question})
                     st.success("Answer:")
-                    st.write(response['result'])
+                    answer_box = st.empty()
+                    stream_handler = StreamlitTokenHandler(answer_box)
+                    # OpenAI calls of this browser session queue fairly against the others
+                    rate_limit_session = st.session_state.setdefault("rate_limit_session", uuid.uuid4().hex)
+                    # --- 5-7. Retriever, LLM and RetrievalQA chain (see web_pipeline.py) ---
+                    # The page's store may have been evicted since it was loaded above; the lease
+                    # reloads it if needed and keeps it in memory until the answer is done
+                    if load_mode == "Single page":
+                        store = get_store_cache().lease(
+                            page_store_key(website_url), **page_store_hooks(website_url, OPENAI_API_KEY)
+                        )
+                    else:
+                        store = nullcontext((vectorstore, None))
+                    with store as (answer_store, _), session_scope(rate_limit_session):
+                        response = WebQA(answer_store).run(user_question, callbacks=[stream_handler])
+                    answer_box.write(response.answer)
+                    st.caption(stream_handler.latency_caption())
+                    packing = response.details.get("packing")
+                    if packing:
+                        st.caption(
+                            f"📦 Context: {packing['chunks_in']} chunks packed into {packing['passages_out']} passages, "
+                            f"{packing['tokens_in']} → {packing['tokens_out']} tokens ({packing['tokens_saved']} saved)"
+                        )
+                    render_limiter_metrics(st)
+                    if show_latency:
+                        with st.expander("⏱️ Latency by stage", expanded=True):
+                            render_latency_panel(st, response.spans)
 
-                    if 'source_documents' in response and response['source_documents']:
+                    if response.sources:
                         st.subheader("Sources Used:")
-                        for i, doc in enumerate(response['source_documents']):
+                        for i, doc in enumerate(response.sources):
                             st.markdown(f"**Source {i+1}:** {doc.metadata.get('source', 'N/A')}")
                             st.markdown(f"Snippet: *{doc.page_content[:300]}...*")
                             st.markdown("---")
@@ -157,4 +265,4 @@ if vectorstore:
         else:
             st.warning("Please enter a question to get an answer.")
 else:
-    st.info("Please enter a valid website URL in the sidebar to begin.")
\ No newline at end of file
+    st.info("Please enter a valid website URL in the sidebar to begin.")
@@ -0,0 +1 @@
+"""Shared helpers for the RAG demo apps (caching, ingestion, indexing)."""
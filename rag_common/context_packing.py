@@ -0,0 +1,177 @@
+"""
+Token-budgeted context packing for "stuff" chains.
+
+Retrieved chunks are sent to the LLM verbatim, so the text the splitter
+repeats between neighbouring chunks (chunk_overlap) and chunks retrieved
+twice through different pages are paid for more than once. ContextPacker
+rebuilds the context before generation:
+
+1. chunks from the same source/page whose text overlaps (the end of one is
+   the start of the other) are stitched into one passage;
+2. chunks whose text is already contained in a kept passage are dropped;
+3. passages are added in relevance order (rank of their best chunk) until
+   the token budget is full; the passage that crosses the budget is cut
+   at the last whole word that fits.
+
+Token counts use tiktoken when it is installed and ~4 characters per token
+otherwise.
+"""
+import functools
+import re
+from dataclasses import asdict, dataclass
+
+from langchain_core.documents import Document
+
+WHITESPACE_RE = re.compile(r"\s+")
+MIN_OVERLAP_CHARS = 20  # shorter matches are likely coincidence, not splitter overlap
+MIN_TRUNCATED_TOKENS = 50  # a shorter tail is not worth sending
+
+
+@functools.lru_cache(maxsize=None)
+def token_counter(model="gpt-3.5-turbo"):
+    """Returns (count(text), truncate(text, tokens)) for `model`."""
+    try:
+        import tiktoken
+
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # No tiktoken, or no network to fetch its encoding files
+        return (lambda text: (len(text) + 3) // 4), (lambda text, tokens: text[:tokens * 4])
+    return (
+        lambda text: len(encoding.encode(text, disallowed_special=())),
+        lambda text, tokens: encoding.decode(encoding.encode(text, disallowed_special=())[:tokens]),
+    )
+
+
+def _group_key(metadata):
+    return metadata.get("source"), metadata.get("page")
+
+
+def _overlap(left, right):
+    """Length of the longest suffix of `left` that is a prefix of `right` (0 below MIN_OVERLAP_CHARS)."""
+    probe = right[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return 0
+    start = max(0, len(left) - len(right))
+    while True:
+        position = left.find(probe, start)
+        if position < 0:
+            return 0
+        if right.startswith(left[position:]):
+            return len(left) - position
+        start = position + 1
+
+
+@dataclass
+class PackReport:
+    chunks_in: int = 0
+    passages_out: int = 0
+    merged: int = 0  # chunks stitched onto a neighbour
+    duplicates_removed: int = 0
+    dropped_for_budget: int = 0
+    truncated: int = 0
+    tokens_in: int = 0
+    tokens_out: int = 0
+
+    @property
+    def tokens_saved(self):
+        return self.tokens_in - self.tokens_out
+
+    def to_dict(self):
+        return {**asdict(self), "tokens_saved": self.tokens_saved}
+
+
+class _Passage:
+    def __init__(self, doc, rank):
+        self.text = doc.page_content.strip()
+        self.metadata = dict(doc.metadata)
+        self.rank = rank
+        self.chunks = 1
+
+    def absorb(self, other):
+        self.rank = min(self.rank, other.rank)
+        self.chunks += other.chunks
+
+
+class ContextPacker:
+    """
+    `pack(docs)` returns (documents to stuff, PackReport). Input order is
+    taken as relevance order. token_budget=0 merges and deduplicates only.
+    """
+
+    def __init__(self, token_budget=3000, model="gpt-3.5-turbo"):
+        self.token_budget = token_budget
+        self.count_tokens, self.truncate = token_counter(model)
+
+    def _stitch(self, passage, group):
+        """Merge `passage` into an overlapping passage of its group; returns the merged one or None."""
+        for other in group:
+            if passage.text in other.text:
+                other.absorb(passage)
+                return other
+            if other.text in passage.text:
+                other.text = passage.text
+                other.absorb(passage)
+                return other
+            overlap = _overlap(other.text, passage.text)
+            if overlap:
+                other.text += passage.text[overlap:]
+                other.absorb(passage)
+                return other
+            overlap = _overlap(passage.text, other.text)
+            if overlap:
+                other.text = passage.text + other.text[overlap:]
+                other.absorb(passage)
+                return other
+        return None
+
+    def pack(self, docs):
+        report = PackReport(chunks_in=len(docs))
+        report.tokens_in = sum(self.count_tokens(doc.page_content) for doc in docs)
+
+        groups = {}
+        for rank, doc in enumerate(docs):
+            passage = _Passage(doc, rank)
+            if not passage.text:
+                continue
+            group = groups.setdefault(_group_key(passage.metadata), [])
+            merged = self._stitch(passage, group)
+            # A chunk can bridge two passages: keep stitching until nothing overlaps
+            while merged is not None:
+                group.remove(merged)
+                passage, merged = merged, self._stitch(merged, group)
+            group.append(passage)
+
+        passages = sorted((p for group in groups.values() for p in group), key=lambda p: p.rank)
+
+        # The same text reached through different sources/pages is sent once
+        kept, seen = [], []
+        for passage in passages:
+            normalized = WHITESPACE_RE.sub(" ", passage.text).lower()
+            if any(normalized in other for other in seen):
+                report.duplicates_removed += passage.chunks
+                continue
+            seen.append(normalized)
+            kept.append(passage)
+        report.merged = sum(p.chunks - 1 for p in kept)
+
+        packed, used = [], 0
+        for passage in kept:
+            tokens = self.count_tokens(passage.text)
+            remaining = self.token_budget - used
+            if self.token_budget and tokens > remaining:
+                if remaining < MIN_TRUNCATED_TOKENS:
+                    report.dropped_for_budget += 1
+                    continue
+                passage.text = self.truncate(passage.text, remaining).rsplit(" ", 1)[0]
+                tokens = self.count_tokens(passage.text)
+                report.truncated += 1
+            used += tokens
+            packed.append(Document(page_content=passage.text, metadata={**passage.metadata, "chunks": passage.chunks}))
+
+        report.passages_out = len(packed)
+        report.tokens_out = used
+        return packed, report
@@ -0,0 +1,219 @@
+"""
+Async site crawler with conditional GETs.
+
+Pages are fetched concurrently over one pooled aiohttp session with global
+and per-host connection limits. ETag / Last-Modified validators from the
+previous crawl are sent back, so unchanged pages cost a 304 and no
+re-processing. The crawl state is kept in a small JSON file; a crawl only
+reports what it saw, and each page's new validators are recorded once the
+caller has processed it (PersistentWebIndex.sync), so a failed sync is
+retried on the next crawl instead of being skipped as unchanged.
+
+    python -m rag_common.crawler http://127.0.0.1:8000/ --state /tmp/crawl.json
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from urllib.parse import urldefrag, urljoin, urlparse
+
+import aiohttp
+from bs4 import BeautifulSoup
+
+SITEMAP_NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+
+@dataclass
+class PageResult:
+    url: str
+    status: str  # "new", "changed", "unchanged", "gone" or "error"
+    text: str = ""
+    title: str = ""
+    links: list = field(default_factory=list)
+    error: str = None
+    page: dict = None  # state entry to record once the page is processed (validators, hash, links, title)
+
+
+class CrawlState:
+    """Per-URL validators, content hash and outgoing links, persisted as JSON."""
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path, encoding="utf-8") as f:
+                self.pages = json.load(f)
+        except (OSError, ValueError):
+            self.pages = {}
+
+    def record(self, result):
+        """Commit one processed PageResult: store its validators, or forget a gone page."""
+        if result.status == "gone":
+            self.pages.pop(result.url, None)
+        elif result.page is not None:
+            self.pages[result.url] = result.page
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.pages, f)
+        os.replace(tmp_path, self.path)
+
+
+def _normalize_url(url):
+    return urldefrag(url)[0]
+
+
+def _extract(html, base_url):
+    soup = BeautifulSoup(html, "html.parser")
+    title = soup.title.get_text(strip=True) if soup.title else ""
+    links = []
+    for anchor in soup.find_all("a", href=True):
+        link = _normalize_url(urljoin(base_url, anchor["href"]))
+        if urlparse(link).scheme in ("http", "https"):
+            links.append(link)
+    for tag in soup(["script", "style", "noscript"]):
+        tag.decompose()
+    return soup.get_text(separator="\n", strip=True), title, links
+
+
+def _failed(url, previous, error):
+    # Keep the last known links so pages reached only through this one are not reported gone
+    return PageResult(url, "error", links=previous.get("links", []), error=error)
+
+
+async def fetch_page(session, url, state):
+    """Conditional GET of one page, classified against the previous crawl (`state` is not modified)."""
+    previous = state.pages.get(url, {})
+    headers = {}
+    if previous.get("etag"):
+        headers["If-None-Match"] = previous["etag"]
+    if previous.get("last_modified"):
+        headers["If-Modified-Since"] = previous["last_modified"]
+
+    try:
+        async with session.get(url, headers=headers) as response:
+            if response.status == 304:
+                return PageResult(url, "unchanged", links=previous.get("links", []), page=previous)
+            if response.status in (404, 410):
+                return PageResult(url, "gone")
+            if response.status >= 400:
+                return _failed(url, previous, f"HTTP {response.status}")
+            if "html" not in response.headers.get("Content-Type", "text/html"):
+                return _failed(url, previous, f"skipped {response.headers.get('Content-Type')}")
+            html = await response.text(errors="replace")
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        return _failed(url, previous, str(e) or type(e).__name__)
+
+    text, title, links = _extract(html, url)
+    content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    # Servers without validators still get skipped when the text is identical
+    status = "unchanged" if previous.get("content_hash") == content_hash else ("changed" if previous else "new")
+    page = {
+        "etag": etag,
+        "last_modified": last_modified,
+        "content_hash": content_hash,
+        "links": links,
+        "title": title,
+    }
+    return PageResult(url, status, text=text, title=title, links=links, page=page)
+
+
+async def read_sitemap(session, url):
+    """Return page URLs from a sitemap, following nested sitemap indexes."""
+    async with session.get(url) as response:
+        response.raise_for_status()
+        root = ET.fromstring(await response.read())
+    locs = [loc.text.strip() for loc in root.iter(f"{SITEMAP_NS}loc") if loc.text]
+    if root.tag == f"{SITEMAP_NS}sitemapindex":
+        nested = await asyncio.gather(*[read_sitemap(session, loc) for loc in locs])
+        return [page for pages in nested for page in pages]
+    return locs
+
+
+async def crawl(seed, state, max_pages=50, max_depth=2, concurrency=16, per_host=4,
+                timeout=20, user_agent=None, on_page=None):
+    """
+    Crawl from a seed URL (same host, breadth-first up to `max_depth`) or from
+    a sitemap (seed ending in .xml). Returns a list of PageResult; pages that
+    were in `state` but now return 404/410, or are no longer listed in the
+    sitemap / linked from the crawled pages, come back as "gone". Nothing is
+    written to `state`: record() each result once it has been processed,
+    then save().
+    """
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=per_host)
+    headers = {"User-Agent": user_agent} if user_agent else {}
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    results = []
+
+    async def fetch(url):
+        result = await fetch_page(session, url, state)
+        if on_page:
+            on_page(result)
+        return result
+
+    async with aiohttp.ClientSession(connector=connector, headers=headers, timeout=client_timeout) as session:
+        if urlparse(seed).path.endswith(".xml"):
+            urls = list(dict.fromkeys(_normalize_url(u) for u in await read_sitemap(session, seed)))
+            results = await asyncio.gather(*[fetch(u) for u in urls[:max_pages]])
+            listed, complete = set(urls), True
+        else:
+            host = urlparse(seed).netloc
+            seen = {_normalize_url(seed)}
+            level = [_normalize_url(seed)]
+            complete = True
+            for depth in range(max_depth + 1):
+                if len(level) > max_pages - len(results):
+                    # Pages linked only from the ones cut here were never discovered
+                    complete = False
+                    level = level[:max_pages - len(results)]
+                if not level:
+                    break
+                batch = await asyncio.gather(*[fetch(u) for u in level])
+                results.extend(batch)
+                level = []
+                for result in batch:
+                    for link in result.links:
+                        if link not in seen and urlparse(link).netloc == host:
+                            seen.add(link)
+                            level.append(link)
+            listed = seen
+            # A page that failed on its first crawl has no known links to stand in for its real ones
+            if any(r.status == "error" and r.url not in state.pages for r in results):
+                complete = False
+
+    results = list(results)
+    if complete:
+        for url in state.pages:
+            if url not in listed:
+                result = PageResult(url, "gone")
+                if on_page:
+                    on_page(result)
+                results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl a site (or sitemap) and report what changed.")
+    parser.add_argument("seed")
+    parser.add_argument("--state", default=".crawl_state.json")
+    parser.add_argument("--max-pages", type=int, default=50)
+    parser.add_argument("--max-depth", type=int, default=2)
+    parser.add_argument("--per-host", type=int, default=4)
+    args = parser.parse_args()
+
+    state = CrawlState(args.state)
+    results = asyncio.run(crawl(args.seed, state, max_pages=args.max_pages, max_depth=args.max_depth, per_host=args.per_host))
+    for result in results:
+        print(f"{result.status:<10} {result.url}" + (f"  ({result.error})" if result.error else ""))
+        state.record(result)
+    state.save()
+
+
+if __name__ == "__main__":
+    main()
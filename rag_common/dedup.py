@@ -0,0 +1,155 @@
+"""
+Exact and near-duplicate chunk elimination between splitting and embedding.
+
+Repeated headers/footers, navigation boilerplate and duplicated pages are
+caught in two steps:
+
+- exact: SHA-256 of the whitespace/case-normalized text;
+- near: MinHash over word 3-gram shingles with LSH banding; a
+  candidate is dropped when its estimated Jaccard similarity to a kept
+  chunk reaches `threshold`.
+
+The first occurrence is kept. Every dropped chunk is recorded with its own
+metadata and the metadata of the chunk it duplicates, so nothing is lost
+silently. Chunks produced by the splitter's overlap are not affected: two
+neighbouring chunks share at most `chunk_overlap` characters, far below the
+default threshold.
+"""
+import hashlib
+import re
+import zlib
+from dataclasses import dataclass, field
+
+import numpy as np
+
+WHITESPACE_RE = re.compile(r"\s+")
+WORD_RE = re.compile(r"\w+")
+PRIME = 4294967291  # largest prime below 2**32
+ADA_002_USD_PER_1K_TOKENS = 0.0001
+
+
+def normalize(text):
+    return WHITESPACE_RE.sub(" ", text).strip().lower()
+
+
+def _shingle_hashes(text, size):
+    """Unique 32-bit hashes of all word `size`-grams (combined in numpy from per-word CRC32s)."""
+    words = np.array([zlib.crc32(word.encode("utf-8")) for word in WORD_RE.findall(text)] or [0], dtype=np.uint64)
+    if len(words) < size:
+        words = np.pad(words, (0, size - len(words)))
+    windows = len(words) - size + 1
+    hashes = np.zeros(windows, dtype=np.uint64)
+    for offset in range(size):
+        hashes = (hashes * np.uint64(1000003) + words[offset:offset + windows]) % np.uint64(PRIME)
+    return np.unique(hashes)
+
+
+@dataclass
+class DedupReport:
+    chunks_in: int = 0
+    kept: int = 0
+    exact_dropped: int = 0
+    near_dropped: int = 0
+    chars_dropped: int = 0
+    dropped: list = field(default_factory=list)  # provenance of every dropped chunk
+
+    @property
+    def removed(self):
+        return self.exact_dropped + self.near_dropped
+
+    def savings(self, dim=1536, usd_per_1k_tokens=ADA_002_USD_PER_1K_TOKENS):
+        """Estimated embedding tokens/cost and index bytes not spent on duplicates (~4 chars per token)."""
+        tokens = self.chars_dropped / 4
+        return {
+            "chunks_removed": self.removed,
+            "fraction_removed": self.removed / self.chunks_in if self.chunks_in else 0.0,
+            "embedding_tokens_saved": int(tokens),
+            "embedding_cost_saved_usd": tokens / 1000 * usd_per_1k_tokens,
+            "index_bytes_saved": self.removed * dim * 4 + self.chars_dropped,
+        }
+
+    def summary(self, **savings_kwargs):
+        return {"chunks_in": self.chunks_in, "kept": self.kept, "exact_dropped": self.exact_dropped,
+                "near_dropped": self.near_dropped, **self.savings(**savings_kwargs)}
+
+
+class ChunkDeduplicator:
+    """
+    Streaming filter over chunk Documents; `filter(chunks)` yields the ones
+    to embed and fills `report`. State persists across calls, so one
+    instance deduplicates across every file/page it is fed.
+    """
+
+    def __init__(self, threshold=0.85, num_perm=64, bands=16, shingle_size=3, seed=0):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(seed)
+        # (a * h + b) mod PRIME with a, b, h < PRIME < 2**32 never overflows uint64
+        self._a = rng.integers(1, PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, PRIME, size=num_perm, dtype=np.uint64)
+        self._exact = {}
+        self._buckets = [{} for _ in range(bands)]
+        self._signatures = []
+        self._metadata = []
+        self.report = DedupReport()
+
+    def signature(self, text):
+        hashes = _shingle_hashes(text, self.shingle_size)
+        return ((self._a[:, None] * hashes[None, :] + self._b[:, None]) % np.uint64(PRIME)).min(axis=1)
+
+    def _band_keys(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def check(self, text, metadata=None):
+        """
+        Returns None for a new chunk (and remembers it), or
+        (kind, similarity, metadata of the kept chunk) for a duplicate.
+        """
+        normalized = normalize(text)
+        digest = hashlib.sha256(normalized.encode("utf-8")).digest()
+        if digest in self._exact:
+            return "exact", 1.0, self._metadata[self._exact[digest]]
+
+        signature = self.signature(normalized)
+        keys = self._band_keys(signature)
+        candidates = {c for band, key in enumerate(keys) for c in self._buckets[band].get(key, ())}
+        if candidates:
+            candidates = list(candidates)
+            similarities = (np.stack([self._signatures[c] for c in candidates]) == signature).mean(axis=1)
+            best = int(similarities.argmax())
+            if similarities[best] >= self.threshold:
+                return "near", float(similarities[best]), self._metadata[candidates[best]]
+
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        self._metadata.append(dict(metadata or {}))
+        self._exact[digest] = index
+        for band, key in enumerate(keys):
+            self._buckets[band].setdefault(key, []).append(index)
+        return None
+
+    def filter(self, chunks):
+        for doc in chunks:
+            self.report.chunks_in += 1
+            duplicate = self.check(doc.page_content, doc.metadata)
+            if duplicate is None:
+                self.report.kept += 1
+                yield doc
+                continue
+            kind, similarity, original = duplicate
+            if kind == "exact":
+                self.report.exact_dropped += 1
+            else:
+                self.report.near_dropped += 1
+            self.report.chars_dropped += len(doc.page_content)
+            self.report.dropped.append({
+                "kind": kind,
+                "similarity": round(similarity, 3),
+                "metadata": dict(doc.metadata),
+                "duplicate_of": original,
+                "snippet": doc.page_content[:120],
+            })
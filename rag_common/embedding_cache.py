@@ -0,0 +1,126 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_PATH = os.getenv(
+    "RAG_EMBEDDING_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "embeddings.sqlite"),
+)
+SQLITE_MAX_PARAMS = 500
+QUERY_CACHE_SIZE = 256
+
+
+def normalize_text(text):
+    """Normalize chunk text so trivially different copies share one embedding."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper backed by a local SQLite store.
+
+    Vectors are keyed by SHA-256 of the model name and normalized text, so
+    the same chunk is embedded once across uploads, URLs, sessions and
+    restarts. Only cache misses are sent to the wrapped model, deduplicated
+    and in batches of `batch_size`. `hits` / `misses` count texts served
+    from the store vs. sent to the model.
+
+    Queries are not chunks: they are kept in a small in-memory LRU
+    (`query_hits` / `query_misses`) so ad-hoc questions neither grow the
+    table nor skew the chunk reuse rate.
+    """
+
+    def __init__(self, embeddings, model_name, path=DEFAULT_PATH, batch_size=256):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+        self.query_hits = 0
+        self.query_misses = 0
+        self._queries = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT, vector BLOB)"
+        )
+        self._conn.commit()
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.model_name}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys):
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), SQLITE_MAX_PARAMS):
+                part = keys[start:start + SQLITE_MAX_PARAMS]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def _store(self, items):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)",
+                [(key, self.model_name, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items],
+            )
+            self._conn.commit()
+
+    def embed_documents(self, texts):
+        keys = [self._key(text) for text in texts]
+        vectors = self._lookup(list(dict.fromkeys(keys)))
+
+        # One request per unique missing text, in large batches
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+        missing_items = list(missing.items())
+        for start in range(0, len(missing_items), self.batch_size):
+            batch = missing_items[start:start + self.batch_size]
+            new_vectors = self.embeddings.embed_documents([text for _, text in batch])
+            stored = [(key, vector) for (key, _), vector in zip(batch, new_vectors)]
+            self._store(stored)
+            vectors.update(stored)
+
+        with self._lock:
+            self.misses += len(missing_items)
+            self.hits += len(texts) - len(missing_items)
+        return [list(vectors[key]) for key in keys]
+
+    def embed_query(self, text):
+        key = self._key(text)
+        with self._lock:
+            if key in self._queries:
+                self._queries.move_to_end(key)
+                self.query_hits += 1
+                return list(self._queries[key])
+            self.query_misses += 1
+        vector = self.embeddings.embed_query(text)
+        with self._lock:
+            self._queries[key] = vector
+            if len(self._queries) > QUERY_CACHE_SIZE:
+                self._queries.popitem(last=False)
+        return vector
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "query_hits": self.query_hits,
+                "query_misses": self.query_misses,
+            }
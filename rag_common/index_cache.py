@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+def content_key(*parts):
+    """Stable SHA-256 key over bytes/str parts (e.g. PDF bytes + settings)."""
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        h.update(hashlib.sha256(part).digest())
+    return h.hexdigest()
+
+
+def _dir_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            total += os.path.getsize(os.path.join(dirpath, name))
+    return total
+
+
+class KeyLocks:
+    """
+    One lock per key, for building a key once while other keys are served.
+    An entry only exists while a thread holds or waits for its lock, so the
+    table does not grow with every key ever seen.
+    """
+
+    def __init__(self):
+        self._locks = {}  # key -> [lock, holders and waiters]
+        self._guard = threading.Lock()
+
+    @contextmanager
+    def __call__(self, key):
+        with self._guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[key]
+
+    def __len__(self):
+        with self._guard:
+            return len(self._locks)
+
+
+class IndexCache:
+    """
+    Content-addressed cache of built vector indexes.
+
+    Built indexes are kept in memory (shared by every session of the process)
+    and saved under `root` so they survive restarts. Entries are evicted
+    least-recently-used first, from memory once more than `max_in_memory`
+    are loaded and from disk once the saved entries exceed `max_bytes`; the
+    entry just built is never the one evicted, even when it alone is larger.
+
+    Builds and loads run under a per-key lock only, so one session building
+    an index does not hold up other sessions' hits. Last-used times are kept
+    in memory and written to the manifest at most every
+    `MANIFEST_FLUSH_INTERVAL` seconds, or with the next save / eviction.
+    """
+
+    MANIFEST = "manifest.json"
+    MANIFEST_FLUSH_INTERVAL = 60
+
+    def __init__(self, root, max_bytes=512 * 1024 * 1024, max_in_memory=8):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_in_memory = max_in_memory
+        self._memory = OrderedDict()
+        self._lock = threading.RLock()
+        self._key_lock = KeyLocks()
+        os.makedirs(root, exist_ok=True)
+        self._manifest = self._read_manifest()
+        self._manifest_written = time.monotonic()
+
+    # --- Manifest (key -> size / last used) ---
+    def _manifest_path(self):
+        return os.path.join(self.root, self.MANIFEST)
+
+    def _read_manifest(self):
+        try:
+            with open(self._manifest_path(), encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        # Drop entries whose directory has gone missing
+        return {k: v for k, v in manifest.items() if os.path.isdir(self._entry_path(k))}
+
+    def _write_manifest(self):
+        tmp_path = self._manifest_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f)
+        os.replace(tmp_path, self._manifest_path())
+        self._manifest_written = time.monotonic()
+
+    def _entry_path(self, key):
+        return os.path.join(self.root, key)
+
+    # --- Eviction ---
+    def _touch(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_in_memory:
+            self._memory.popitem(last=False)
+        if key in self._manifest:
+            self._manifest[key]["last_used"] = time.time()
+            if time.monotonic() - self._manifest_written > self.MANIFEST_FLUSH_INTERVAL:
+                self._write_manifest()
+
+    def _evict_disk(self, keep=None):
+        total = sum(entry["size"] for entry in self._manifest.values())
+        for key in sorted(self._manifest, key=lambda k: self._manifest[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self._manifest.pop(key)["size"]
+            shutil.rmtree(self._entry_path(key), ignore_errors=True)
+            self._memory.pop(key, None)
+        self._write_manifest()
+
+    # --- Public API ---
+    def get_or_build(self, key, build, save, load):
+        """
+        Return the index for `key`, trying memory, then disk, then `build()`.
+
+        `save(index, path)` persists a freshly built index into a directory and
+        `load(path)` reads it back. Concurrent requests for the same key build
+        it once; other keys are served meanwhile.
+        """
+        with self._key_lock(key):
+            with self._lock:
+                if key in self._memory:
+                    index = self._memory[key]
+                    self._touch(key, index)
+                    return index
+                on_disk = key in self._manifest
+
+            path = self._entry_path(key)
+            if on_disk:
+                try:
+                    index = load(path)
+                except Exception:
+                    # Corrupt or incompatible entry: rebuild it below
+                    with self._lock:
+                        self._manifest.pop(key, None)
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    with self._lock:
+                        self._touch(key, index)
+                    return index
+
+            index = build()
+            shutil.rmtree(path, ignore_errors=True)
+            save(index, path)
+            with self._lock:
+                self._manifest[key] = {"size": _dir_size(path), "last_used": time.time()}
+                self._touch(key, index)
+                self._evict_disk(keep=key)
+            return index
+
+    def invalidate(self, key):
+        with self._key_lock(key), self._lock:
+            self._memory.pop(key, None)
+            if self._manifest.pop(key, None) is not None:
+                self._write_manifest()
+            shutil.rmtree(self._entry_path(key), ignore_errors=True)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._manifest):
+                shutil.rmtree(self._entry_path(key), ignore_errors=True)
+            self._manifest = {}
+            self._memory.clear()
+            self._write_manifest()
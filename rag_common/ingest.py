@@ -0,0 +1,121 @@
+import os
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # older installs only ship PyPDF2
+    from PyPDF2 import PdfReader
+
+PAGES_PER_TASK = 8
+
+
+def _parse_pages(path, source, start, stop, chunk_size, chunk_overlap):
+    """Worker: extract and split pages [start, stop) of one PDF."""
+    reader = PdfReader(path)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    chunks = []
+    for page_number in range(start, stop):
+        text = reader.pages[page_number].extract_text() or ""
+        metadata = {"source": source, "page": page_number}
+        # PyPDFLoader yields one document per page and split_documents splits
+        # each one independently, so splitting per page here is equivalent.
+        for piece in splitter.split_text(text):
+            chunks.append((piece, metadata))
+    return chunks
+
+
+def _spool_to_disk(uploaded_file, tmp_dir):
+    """Copy an upload (file-like with .name) or a path into `tmp_dir`."""
+    if isinstance(uploaded_file, (str, os.PathLike)):
+        return str(uploaded_file), os.path.basename(uploaded_file)
+    name = getattr(uploaded_file, "name", "upload.pdf")
+    path = os.path.join(tmp_dir, f"{len(os.listdir(tmp_dir))}.pdf")
+    uploaded_file.seek(0)
+    with open(path, "wb") as out:
+        shutil.copyfileobj(uploaded_file, out)
+    return path, name
+
+
+def iter_pdf_chunks(uploaded_files, chunk_size=500, chunk_overlap=50,
+                    max_workers=None, on_progress=None):
+    """
+    Parse and split PDFs in a process pool, yielding chunk Documents as they
+    are produced (in file/page order).
+
+    Work is submitted in page ranges with at most 2 * max_workers ranges in
+    flight, so memory stays bounded however many PDFs are uploaded.
+    `on_progress(index, name, pages_done, pages_total)` is called after each
+    range completes.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as tmp_dir, ProcessPoolExecutor(max_workers=max_workers) as pool:
+        tasks = []
+        totals = []
+        for index, uploaded_file in enumerate(uploaded_files):
+            path, name = _spool_to_disk(uploaded_file, tmp_dir)
+            page_count = len(PdfReader(path).pages)
+            totals.append(page_count)
+            for start in range(0, page_count, PAGES_PER_TASK):
+                tasks.append((index, name, path, start, min(start + PAGES_PER_TASK, page_count)))
+
+        done = [0] * len(totals)
+        pending = deque()
+        task_iter = iter(tasks)
+
+        def submit_next():
+            task = next(task_iter, None)
+            if task is not None:
+                index, name, path, start, stop = task
+                future = pool.submit(_parse_pages, path, name, start, stop, chunk_size, chunk_overlap)
+                pending.append((task, future))
+
+        for _ in range(2 * max_workers):
+            submit_next()
+
+        while pending:
+            (index, name, _, start, stop), future = pending.popleft()
+            chunks = future.result()
+            submit_next()
+            done[index] += stop - start
+            if on_progress:
+                on_progress(index, name, done[index], totals[index])
+            for text, metadata in chunks:
+                yield Document(page_content=text, metadata=dict(metadata))
+
+
+def batched(iterable, batch_size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def build_faiss_streaming(chunks, embedding, batch_size=256):
+    """
+    Build a FAISS index from a chunk iterator, embedding one batch at a time
+    while the parser pool keeps producing the next chunks.
+    """
+    vectorstore = None
+    for batch in batched(chunks, batch_size):
+        texts = [doc.page_content for doc in batch]
+        vectors = embedding.embed_documents(texts)
+        pairs = list(zip(texts, vectors))
+        metadatas = [doc.metadata for doc in batch]
+        if vectorstore is None:
+            vectorstore = FAISS.from_embeddings(pairs, embedding, metadatas=metadatas)
+        else:
+            vectorstore.add_embeddings(pairs, metadatas=metadatas)
+    if vectorstore is None:
+        raise ValueError("No text could be extracted from the uploaded PDFs.")
+    return vectorstore
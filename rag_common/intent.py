@@ -0,0 +1,193 @@
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+INTENTS = ("FACTUAL", "PROCEDURAL", "REASONING")
+DEFAULT_INTENT = "FACTUAL"
+
+# Weighted cue phrases; matched on word boundaries against the normalized query
+KEYWORDS = {
+    "FACTUAL": {
+        "what is": 2, "what are": 2, "what was": 2, "when": 2, "who": 2, "where": 2, "which": 1.5,
+        "how many": 3, "how much": 3, "how long": 2, "define": 3, "definition": 3, "list": 1.5,
+        "name": 1, "date": 1.5, "price": 1.5, "cost": 1, "period": 1, "number": 1,
+    },
+    "PROCEDURAL": {
+        "how do i": 3, "how to": 3, "how can i": 3, "how should i": 2, "steps": 3, "step by step": 3,
+        "procedure": 3, "process for": 2, "install": 2, "configure": 2, "set up": 2, "setup": 2,
+        "reset": 2, "connect": 1.5, "enable": 1.5, "disable": 1.5, "update": 1, "instructions": 3,
+        "guide": 1.5, "walk me through": 3,
+    },
+    "REASONING": {
+        "why": 3, "compare": 3, "comparison": 3, "difference": 3, "differ": 2, "better": 2.5,
+        "worse": 2.5, "versus": 3, "vs": 3, "pros and cons": 3, "advantages": 2, "disadvantages": 2,
+        "explain": 2, "impact": 2, "affect": 1.5, "should": 1.5, "trade-off": 3, "tradeoff": 3,
+        "implications": 2, "reason": 2, "cause": 1.5, "evaluate": 2,
+    },
+}
+
+# Seed queries for the nearest-centroid model (kept apart from the labeled
+# sets in benchmarks/; the rules above were tuned on intent_queries.jsonl,
+# intent_queries_heldout.jsonl is only ever used to score them)
+SEED_QUERIES = {
+    "FACTUAL": [
+        "What is the warranty period?",
+        "When was the company founded?",
+        "Who is the author of the report?",
+        "What is the maximum operating temperature?",
+        "How many employees are listed?",
+        "What does the acronym SLA stand for?",
+    ],
+    "PROCEDURAL": [
+        "How to reset the device?",
+        "How do I connect this to Wi-Fi?",
+        "What are the steps to file an expense claim?",
+        "How can I update the firmware?",
+        "Walk me through setting up a new account.",
+        "How should I clean the filter?",
+    ],
+    "REASONING": [
+        "Why is Model A better than Model B?",
+        "Compare the two pricing plans.",
+        "What is the impact of the new policy on small teams?",
+        "Explain why the test failed in the second quarter.",
+        "What are the pros and cons of remote work according to the handbook?",
+        "Should we choose option one or option two, and why?",
+    ],
+}
+
+
+def normalize_query(query):
+    return " ".join(re.sub(r"[^\w\s'-]", " ", query.lower()).split())
+
+
+class RuleIntentClassifier:
+    """
+    Zero-cost keyword model. Confidence is the winning intent's weight over
+    the total matched weight, but never over less than `min_evidence`: one
+    weak cue ("which", "should") is not certainty, so it falls through to
+    the next classifier instead of answering alone. The default is about two
+    cues' worth of weight.
+    """
+
+    name = "rules"
+
+    def __init__(self, keywords=KEYWORDS, min_evidence=4.0):
+        self.min_evidence = min_evidence
+        self.patterns = {
+            intent: [(re.compile(rf"\b{re.escape(cue)}\b"), weight) for cue, weight in cues.items()]
+            for intent, cues in keywords.items()
+        }
+
+    def classify(self, query):
+        text = normalize_query(query)
+        scores = {
+            intent: sum(weight for pattern, weight in patterns if pattern.search(text))
+            for intent, patterns in self.patterns.items()
+        }
+        total = sum(scores.values())
+        if not total:
+            return DEFAULT_INTENT, 0.0
+        intent = max(scores, key=scores.get)
+        return intent, scores[intent] / max(total, self.min_evidence)
+
+
+class CentroidIntentClassifier:
+    """
+    Nearest-centroid over query embeddings. With a caching embedding model the
+    query vector is shared with retrieval, so classification adds no API call.
+    Confidence is the cosine margin between the best and second-best centroid,
+    scaled by `margin_scale` into [0, 1].
+    """
+
+    name = "centroid"
+
+    def __init__(self, embedding, seed_queries=SEED_QUERIES, margin_scale=10.0):
+        self.embedding = embedding
+        self.margin_scale = margin_scale
+        self.intents = list(seed_queries)
+        centroids = []
+        for intent in self.intents:
+            vectors = np.asarray(embedding.embed_documents(seed_queries[intent]), dtype=np.float32)
+            centroid = vectors.mean(axis=0)
+            centroids.append(centroid / np.linalg.norm(centroid))
+        self.centroids = np.stack(centroids)
+
+    def classify(self, query, query_vector=None):
+        if query_vector is None:
+            query_vector = self.embedding.embed_query(query)
+        vector = np.asarray(query_vector, dtype=np.float32)
+        sims = self.centroids @ (vector / np.linalg.norm(vector))
+        order = np.argsort(sims)[::-1]
+        margin = float(sims[order[0]] - sims[order[1]])
+        return self.intents[order[0]], min(1.0, margin * self.margin_scale)
+
+
+class LLMIntentClassifier:
+    """The original prompt-based classifier, wrapping an LLMChain."""
+
+    name = "llm"
+
+    def __init__(self, intent_chain):
+        self.intent_chain = intent_chain
+
+    def classify(self, query):
+        answer = self.intent_chain.run(query=query).strip().upper()
+        for intent in INTENTS:
+            if intent in answer:
+                return intent, 1.0
+        return answer, 0.0
+
+
+class IntentClassifier:
+    """
+    Tries local classifiers in order and returns the first answer whose
+    confidence reaches `threshold`; otherwise falls back to `fallback` (the
+    LLM) if given, else the most confident local answer. Results are cached
+    per normalized query. `classify` returns (intent, source), where source
+    names the classifier that answered ("rules", "centroid", "llm", "cache").
+    """
+
+    def __init__(self, local=(), fallback=None, threshold=0.6, cache_size=1024):
+        self.local = list(local)
+        self.fallback = fallback
+        self.threshold = threshold
+        self.cache_size = cache_size
+        self.counts = {"cache": 0}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key, intent, source):
+        with self._lock:
+            self._cache[key] = intent
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            self.counts[source] = self.counts.get(source, 0) + 1
+        return intent, source
+
+    def classify(self, query, query_vector=None):
+        key = normalize_query(query)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.counts["cache"] += 1
+                return self._cache[key], "cache"
+
+        best = (DEFAULT_INTENT, -1.0, None)
+        for classifier in self.local:
+            if isinstance(classifier, CentroidIntentClassifier):
+                intent, confidence = classifier.classify(query, query_vector=query_vector)
+            else:
+                intent, confidence = classifier.classify(query)
+            if confidence >= self.threshold:
+                return self._remember(key, intent, classifier.name)
+            if confidence > best[1]:
+                best = (intent, confidence, classifier.name)
+
+        if self.fallback is not None:
+            intent, _ = self.fallback.classify(query)
+            return self._remember(key, intent, self.fallback.name)
+        return self._remember(key, best[0], best[2] or "default")
@@ -0,0 +1,46 @@
+"""Common result type for the headless RAG pipelines."""
+from dataclasses import dataclass, field
+
+
+@dataclass
+class PipelineResult:
+    question: str
+    answer: str = ""
+    sources: list = field(default_factory=list)
+    timings: dict = field(default_factory=dict)
+    usage: dict = field(default_factory=dict)
+    details: dict = field(default_factory=dict)
+    spans: list = field(default_factory=list)  # rag_common.tracing.Span, root first
+    error: str = None
+
+    @classmethod
+    def from_trace(cls, question, tracer, answer="", sources=None, details=None):
+        return cls(
+            question=question,
+            answer=answer,
+            sources=sources or [],
+            timings=tracer.timings,
+            usage=tracer.usage,
+            details=details or {},
+            spans=tracer.spans,
+        )
+
+    def to_record(self, snippet_chars=300):
+        """Flat, JSON-serializable dict for batch output."""
+        return {
+            "question": self.question,
+            "answer": self.answer,
+            "sources": [
+                {
+                    "source": doc.metadata.get("source", doc.metadata.get("topic")),
+                    "page": doc.metadata.get("page"),
+                    "snippet": doc.page_content[:snippet_chars],
+                }
+                for doc in self.sources
+            ],
+            "timings": self.timings,
+            "usage": self.usage,
+            "details": self.details,
+            "spans": [span.to_dict() for span in self.spans],
+            "error": self.error,
+        }
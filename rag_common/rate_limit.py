@@ -0,0 +1,395 @@
+"""
+Process-wide client-side rate limiting for OpenAI calls.
+
+Every ChatOpenAI / OpenAIEmbeddings client built by the apps sends its HTTP
+requests through one shared limiter (via `http_client=limited_http_client()`
+or `client=limited_openai_client(key)...`),
+so all Streamlit sessions of a process share one budget instead of each
+finding the account limit on its own:
+
+- token buckets for requests/min and tokens/min (RAG_OPENAI_RPM,
+  RAG_OPENAI_TPM; 0 = no budget). A request's tokens are estimated from its
+  body before sending (~4 chars per token + max_tokens) and corrected from
+  the response's `usage` when it has one;
+- adaptive concurrency (AIMD): at most RAG_OPENAI_MAX_CONCURRENCY requests
+  in flight; a 429 halves the limit and pauses every caller for its
+  Retry-After, each success grows it back by ~1 per round of requests;
+- 429s and connection errors are retried here (RAG_OPENAI_RETRIES), after
+  queueing again, instead of every client backing off blindly: a 429
+  waits out the shared pause, a connection error backs off exponentially
+  with jitter (RAG_OPENAI_RETRY_BACKOFF). The OpenAI SDK's own retries are
+  switched off on these clients so the two do not multiply;
+- fair queueing: waiting requests are granted round-robin across sessions
+  (the current thread, or the key set with `session_scope()`), so one
+  session firing many calls cannot starve the others.
+
+`shared_limiter().metrics()` reports queue depth, in-flight requests, the
+current concurrency limit, wait times and 429 counts.
+"""
+import contextvars
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+OPENAI_RPM = int(os.getenv("RAG_OPENAI_RPM", "0"))
+OPENAI_TPM = int(os.getenv("RAG_OPENAI_TPM", "0"))
+OPENAI_MAX_CONCURRENCY = int(os.getenv("RAG_OPENAI_MAX_CONCURRENCY", "16"))
+OPENAI_RETRIES = int(os.getenv("RAG_OPENAI_RETRIES", "4"))
+OPENAI_RETRY_BACKOFF = float(os.getenv("RAG_OPENAI_RETRY_BACKOFF", "0.5"))  # seconds, doubled per attempt
+
+DEFAULT_COMPLETION_TOKENS = 256  # assumed answer length when a request sets no max_tokens
+DEFAULT_RETRY_AFTER = 1.0
+MAX_RETRY_AFTER = 60.0
+WAIT_SAMPLES = 1000
+
+logger = logging.getLogger(__name__)
+_session = contextvars.ContextVar("rate_limit_session", default=None)
+
+
+@contextmanager
+def session_scope(key):
+    """Attribute the OpenAI calls made inside this block to session `key` for fair queueing."""
+    token = _session.set(key)
+    try:
+        yield
+    finally:
+        _session.reset(token)
+
+
+def current_session():
+    key = _session.get()
+    return key if key is not None else threading.get_ident()
+
+
+class TokenBucket:
+    """`per_period` units, refilled continuously; capacity is one period's worth. 0 = unlimited."""
+
+    def __init__(self, per_period, period=60.0):
+        self.capacity = float(per_period)
+        self.rate = per_period / period
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` is available (requests above capacity wait for a full bucket)."""
+        if not self.capacity:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount, now):
+        if self.capacity:
+            self._refill(now)
+            self.level -= amount  # may go negative when usage exceeded the estimate
+
+    def give_back(self, amount):
+        if self.capacity:
+            self.level = min(self.capacity, self.level + amount)
+
+
+class _Ticket:
+    __slots__ = ("session", "tokens", "enqueued")
+
+    def __init__(self, session, tokens):
+        self.session = session
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+
+
+class RateLimiter:
+    """
+    Shared admission control for OpenAI requests; see the module docstring.
+    `period` is the budget window in seconds (60: rpm / tpm), shortened by
+    the benchmarks to run in seconds.
+    """
+
+    def __init__(self, rpm=OPENAI_RPM, tpm=OPENAI_TPM, max_concurrency=OPENAI_MAX_CONCURRENCY, min_concurrency=1,
+                 period=60.0):
+        self.requests = TokenBucket(rpm, period)
+        self.tokens = TokenBucket(tpm, period)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._queues = {}  # session -> deque of waiting tickets
+        self._order = deque()  # sessions with waiting tickets, next to be served first
+        self._cond = threading.Condition()
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self._counts = {"granted": 0, "rate_limited": 0, "retried": 0, "tokens_estimated": 0, "tokens_used": 0}
+
+    # --- Scheduling ---
+    def _grant_wait(self, ticket, now):
+        """0 when `ticket` may go now, else seconds to wait (None: until something is released)."""
+        head_session = self._order[0]
+        if self._queues[head_session][0] is not ticket:
+            return None
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.in_flight >= int(self.limit):
+            return None
+        return max(self.requests.wait_time(1, now), self.tokens.wait_time(ticket.tokens, now))
+
+    def acquire(self, tokens, session=None):
+        """Block until a request of ~`tokens` tokens may be sent; returns a ticket for release()."""
+        ticket = _Ticket(current_session() if session is None else session, tokens)
+        with self._cond:
+            queue = self._queues.setdefault(ticket.session, deque())
+            if not queue:
+                self._order.append(ticket.session)
+            queue.append(ticket)
+            while True:
+                now = time.monotonic()
+                wait = self._grant_wait(ticket, now)
+                if wait == 0:
+                    break
+                # Bounded wait: budgets refill with time, not only on notify
+                self._cond.wait(timeout=min(wait, 1.0) if wait is not None else 1.0)
+
+            queue.popleft()
+            self._order.popleft()
+            if queue:
+                self._order.append(ticket.session)  # round-robin: this session goes to the back
+            else:
+                del self._queues[ticket.session]
+            self.requests.take(1, now)
+            self.tokens.take(tokens, now)
+            self.in_flight += 1
+            self._counts["granted"] += 1
+            self._counts["tokens_estimated"] += tokens
+            self._waits.append(now - ticket.enqueued)
+            self._cond.notify_all()
+        return ticket
+
+    def release(self, ticket, used_tokens=None, rate_limited=False, retry_after=None):
+        """Return the slot; correct the token estimate and adapt concurrency to the outcome."""
+        with self._cond:
+            self.in_flight -= 1
+            if used_tokens is not None:
+                self.tokens.give_back(ticket.tokens - used_tokens)
+                self._counts["tokens_used"] += used_tokens
+            if rate_limited:
+                self._counts["rate_limited"] += 1
+                self.limit = max(self.min_concurrency, self.limit / 2)
+                pause = min(MAX_RETRY_AFTER, retry_after if retry_after is not None else DEFAULT_RETRY_AFTER)
+                self.paused_until = max(self.paused_until, time.monotonic() + pause)
+                logger.info("OpenAI 429: concurrency limit %.1f, pausing %.1fs", self.limit, pause)
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1 / max(self.limit, 1))
+            self._cond.notify_all()
+
+    def note_retry(self):
+        with self._cond:
+            self._counts["retried"] += 1
+
+    def metrics(self):
+        with self._cond:
+            waits = sorted(self._waits)
+            return {
+                "queue_depth": sum(len(queue) for queue in self._queues.values()),
+                "waiting_sessions": len(self._order),
+                "in_flight": self.in_flight,
+                "concurrency_limit": int(self.limit),
+                "paused_s": max(0.0, self.paused_until - time.monotonic()),
+                "wait_ms_mean": 1000 * sum(waits) / len(waits) if waits else 0.0,
+                "wait_ms_p95": 1000 * waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+                "wait_ms_max": 1000 * waits[-1] if waits else 0.0,
+                **self._counts,
+            }
+
+
+# --- HTTP integration ---
+def estimate_tokens(request):
+    """Prompt + expected completion tokens of an OpenAI API request, from its JSON body."""
+    try:
+        body = json.loads(request.content or b"{}")
+    except ValueError:
+        return DEFAULT_COMPLETION_TOKENS
+    if "input" in body:  # embeddings
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        # Pre-tokenized input arrives as lists of token ids
+        return sum(len(text) if isinstance(text, list) else len(str(text)) // 4 + 1 for text in texts)
+    prompt_chars = sum(len(json.dumps(message.get("content", ""))) for message in body.get("messages", []))
+    prompt_chars += len(str(body.get("prompt", "")))
+    completion = body.get("max_tokens") or body.get("max_completion_tokens") or DEFAULT_COMPLETION_TOKENS
+    return prompt_chars // 4 + completion * (body.get("n") or 1)
+
+
+def retry_after_seconds(response):
+    """Retry-After (seconds or HTTP date), falling back to OpenAI's x-ratelimit-reset-* headers."""
+    value = response.headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = response.headers.get("retry-after")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    for header in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        value = response.headers.get(header)
+        if value:
+            return _parse_duration(value)
+    return None
+
+
+def _parse_duration(value):
+    """OpenAI reset durations look like "1s", "6m0s", "250ms"."""
+    total, number = 0.0, ""
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    i = 0
+    while i < len(value):
+        char = value[i]
+        if char.isdigit() or char == ".":
+            number += char
+            i += 1
+            continue
+        unit = "ms" if value[i:i + 2] == "ms" else char
+        i += len(unit)
+        try:
+            total += float(number) * units.get(unit, 1)
+        except ValueError:
+            return None
+        number = ""
+    return total
+
+
+def _usage_tokens(response):
+    try:
+        return json.loads(response.content)["usage"]["total_tokens"]
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """Keeps a streamed response's slot until the body has been consumed or closed."""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            if self._release:
+                self._release()
+                self._release = None
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """httpx transport that queues every request through a RateLimiter and retries 429s."""
+
+    def __init__(self, limiter, transport=None, retries=OPENAI_RETRIES, backoff=OPENAI_RETRY_BACKOFF):
+        self.limiter = limiter
+        self.transport = transport or httpx.HTTPTransport()
+        self.retries = retries
+        self.backoff = backoff
+
+    def _retry_delay(self, attempt):
+        # Full jitter, so clients that lost their connections together do not reconnect together
+        return min(MAX_RETRY_AFTER, self.backoff * 2 ** attempt) * random.random()
+
+    def handle_request(self, request):
+        request.read()
+        tokens = estimate_tokens(request)
+        streaming = b'"stream":true' in request.content.replace(b" ", b"")
+        for attempt in range(self.retries + 1):
+            ticket = self.limiter.acquire(tokens)
+            try:
+                response = self.transport.handle_request(request)
+            except httpx.TransportError as e:
+                self.limiter.release(ticket, used_tokens=0)
+                if attempt == self.retries:
+                    raise
+                self.limiter.note_retry()
+                delay = self._retry_delay(attempt)
+                logger.info("OpenAI %s, retrying in %.1fs", type(e).__name__, delay)
+                time.sleep(delay)
+                continue
+            if response.status_code == 429 and attempt < self.retries:
+                response.read()
+                response.close()
+                self.limiter.release(ticket, used_tokens=0, rate_limited=True, retry_after=retry_after_seconds(response))
+                self.limiter.note_retry()
+                continue
+            if streaming and response.status_code == 200:
+                response.stream = _ReleasingStream(response.stream, lambda: self.limiter.release(ticket))
+                return response
+            response.read()
+            self.limiter.release(
+                ticket,
+                used_tokens=_usage_tokens(response) if response.status_code == 200 else 0,
+                rate_limited=response.status_code == 429,
+                retry_after=retry_after_seconds(response) if response.status_code == 429 else None,
+            )
+            return response
+
+    def close(self):
+        self.transport.close()
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_limiter():
+    """The process-wide limiter, configured from RAG_OPENAI_* on first use."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = RateLimiter()
+        return _shared
+
+
+def limited_http_client(limiter=None, **kwargs):
+    """
+    httpx.Client for `http_client=` of ChatOpenAI / OpenAIEmbeddings, sharing
+    the process limiter. Give those classes `max_retries=0` as well: this
+    client already retries.
+    """
+    return httpx.Client(transport=RateLimitedTransport(limiter or shared_limiter()), timeout=kwargs.pop("timeout", 600), **kwargs)
+
+
+def limited_openai_client(api_key=None, limiter=None):
+    """
+    openai.OpenAI over the shared limiter, for the langchain.chat_models /
+    langchain.embeddings classes: their `http_client=` is also handed to an
+    AsyncOpenAI and must then be async, so pass `client=` instead, e.g.
+    ChatOpenAI(client=limited_openai_client(key).chat.completions).
+    """
+    import openai
+
+    # Retries happen in RateLimitedTransport, after queueing again
+    return openai.OpenAI(api_key=api_key, http_client=limited_http_client(limiter), max_retries=0)
+
+
+def render_limiter_metrics(container, limiter=None):
+    """One caption line of limiter state for a Streamlit container (e.g. st.sidebar)."""
+    m = (limiter or shared_limiter()).metrics()
+    container.caption(
+        f"🚦 OpenAI queue: {m['queue_depth']} waiting · {m['in_flight']} in flight (limit {m['concurrency_limit']}) · "
+        f"wait p95 {m['wait_ms_p95']:.0f} ms · {m['rate_limited']} rate-limited"
+    )
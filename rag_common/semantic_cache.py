@@ -0,0 +1,116 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Answer cache keyed by query meaning rather than exact text.
+
+    Entries are stored per `scope` (e.g. the PDF set hash or KB topic) so an
+    answer is only reused against the same index. A lookup returns the
+    closest previous answer in that scope if its cosine similarity is at
+    least `threshold`. Entries expire after `ttl` seconds and the least
+    recently used ones are evicted beyond `max_entries`.
+    """
+
+    def __init__(self, threshold=0.95, ttl=3600, max_entries=1000):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # id -> entry dict, in LRU order
+        self._scopes = {}  # scope -> {id: normalized vector}
+        self._matrices = {}  # scope -> (ids, stacked vectors), rebuilt lazily
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _remove(self, entry_id):
+        entry = self._entries.pop(entry_id)
+        scope = entry["scope"]
+        vectors = self._scopes[scope]
+        vectors.pop(entry_id, None)
+        if not vectors:
+            # Scopes come and go with PDF sets / topics; do not keep empty ones
+            del self._scopes[scope]
+        self._matrices.pop(scope, None)
+
+    def _expire(self, now):
+        expired = [i for i, e in self._entries.items() if now - e["created"] > self.ttl]
+        for entry_id in expired:
+            self._remove(entry_id)
+            self.evictions += 1
+
+    def lookup(self, scope, query_vector, bypass=False):
+        """Return the cached entry dict (answer, sources, query, similarity) or None."""
+        with self._lock:
+            if bypass or not self.enabled:
+                self.bypassed += 1
+                return None
+            self._expire(time.time())
+            vectors = self._scopes.get(scope)
+            if not vectors:
+                self.misses += 1
+                return None
+            if scope not in self._matrices:
+                ids = list(vectors)
+                self._matrices[scope] = (ids, np.stack([vectors[i] for i in ids]))
+            ids, matrix = self._matrices[scope]
+            sims = matrix @ self._normalize(query_vector)
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry_id = ids[best]
+            self._entries.move_to_end(entry_id)
+            return dict(self._entries[entry_id], similarity=float(sims[best]))
+
+    def store(self, scope, query, query_vector, answer, sources=None, **extra):
+        """Remember an answer; `extra` fields are returned with it on a hit."""
+        if not self.enabled:
+            return
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = {
+                "scope": scope,
+                "query": query,
+                "answer": answer,
+                "sources": sources or [],
+                "created": time.time(),
+                **extra,
+            }
+            self._scopes.setdefault(scope, {})[entry_id] = self._normalize(query_vector)
+            self._matrices.pop(scope, None)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, scope):
+        with self._lock:
+            for entry_id in list(self._scopes.get(scope, {})):
+                self._remove(entry_id)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "evictions": self.evictions,
+            }
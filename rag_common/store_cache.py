@@ -0,0 +1,259 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from rag_common.index_cache import KeyLocks, _dir_size, content_key
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ("value", "size", "last_used", "pins", "save", "drop", "invalidated")
+
+    def __init__(self, value, size, save, drop):
+        self.value = value
+        self.size = size
+        self.last_used = time.monotonic()
+        self.pins = 0
+        self.save = save
+        self.drop = drop
+        self.invalidated = False  # forgotten while leased: dropped when the last lease ends
+
+
+class VectorStoreCache:
+    """
+    Memory-budgeted cache of vector stores, one per key (e.g. per URL).
+
+    Stores stay in memory, shared by every session of the process, while
+    their estimated sizes fit in `max_bytes` and they were used within `ttl`
+    seconds. Past that, the least recently used are evicted: written
+    ("spilled") under `root` with their own `save`, then released with
+    `drop`. A later request reloads them from disk with `load` instead of
+    re-embedding. Spilled copies are evicted LRU once they exceed
+    `max_disk_bytes`, as in IndexCache. A store held through lease() is
+    never evicted or dropped under its caller; the budget is then exceeded
+    until the lease ends.
+
+    The cache lock only guards bookkeeping. Building, loading, measuring
+    and spilling a store happen under that key's own lock, so one slow
+    store never holds up requests for the others.
+    """
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, root, max_bytes=256 * 1024 * 1024, ttl=3600, max_disk_bytes=1024 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()  # key -> _Entry, least recently used first
+        self._spilling = {}  # key -> _Entry evicted from memory but not yet written out
+        self._lock = threading.RLock()
+        self._key_lock = KeyLocks()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expired": 0, "spills": 0,
+                      "invalidations": 0}
+        os.makedirs(root, exist_ok=True)
+        self._manifest = self._read_manifest()
+
+    # --- Manifest of spilled stores (key -> size / last used), as in IndexCache ---
+    def _manifest_path(self):
+        return os.path.join(self.root, self.MANIFEST)
+
+    def _read_manifest(self):
+        try:
+            with open(self._manifest_path(), encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        return {k: v for k, v in manifest.items() if os.path.isdir(self._entry_path(k))}
+
+    def _write_manifest(self):
+        tmp_path = self._manifest_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f)
+        os.replace(tmp_path, self._manifest_path())
+
+    def _entry_path(self, key):
+        # Keys are URLs; directory names are their hashes
+        return os.path.join(self.root, content_key(key)[:32])
+
+    # --- Eviction ---
+    def resident_bytes(self):
+        with self._lock:
+            return sum(entry.size for entry in self._memory.values())
+
+    def _select_victims(self, keep=None):
+        """
+        Under self._lock: unlink expired entries, then least recently used ones
+        until the rest fit in max_bytes. Returns them for _spill() to write out.
+        """
+        now = time.monotonic()
+        total = sum(entry.size for entry in self._memory.values())
+        victims = []
+        for key in list(self._memory):
+            entry = self._memory[key]
+            expired = self.ttl and now - entry.last_used > self.ttl
+            # `keep` is the store being handed out right now, even when it alone exceeds the budget
+            if entry.pins or key == keep or not (expired or total > self.max_bytes):
+                continue
+            del self._memory[key]
+            total -= entry.size
+            self.stats["expired" if expired else "evictions"] += 1
+            self._spilling[key] = entry
+            victims.append((key, entry))
+        return victims
+
+    def _spill(self, victims):
+        """Save (unless already on disk) and drop evicted stores. Called holding no lock."""
+        for key, entry in victims:
+            # One key lock at a time: a request for this key waits for the spill, then reloads it
+            with self._key_lock(key):
+                with self._lock:
+                    if self._spilling.get(key) is not entry:
+                        continue  # taken back into memory or invalidated meanwhile
+                    on_disk = key in self._manifest
+                path = self._entry_path(key)
+                size = None
+                if not on_disk:
+                    try:
+                        shutil.rmtree(path, ignore_errors=True)
+                        entry.save(entry.value, path)
+                        size = _dir_size(path)
+                    except Exception:
+                        # The store is only lost from disk; the next request rebuilds it
+                        logger.exception("spilling %s failed", key)
+                        shutil.rmtree(path, ignore_errors=True)
+                with self._lock:
+                    del self._spilling[key]
+                    if size is not None:
+                        self._manifest[key] = {"size": size, "last_used": time.time()}
+                        self.stats["spills"] += 1
+                        self._evict_disk()
+                entry.drop(entry.value)
+
+    def _evict_disk(self):
+        total = sum(entry["size"] for entry in self._manifest.values())
+        for key in sorted(self._manifest, key=lambda k: self._manifest[k]["last_used"]):
+            if total <= self.max_disk_bytes:
+                break
+            total -= self._manifest.pop(key)["size"]
+            shutil.rmtree(self._entry_path(key), ignore_errors=True)
+        self._write_manifest()
+
+    def _get_entry(self, key, build, save, load, drop, size_of, pin):
+        """(entry, source, victims to spill once the key lock is released)."""
+        with self._key_lock(key):
+            with self._lock:
+                entry = self._memory.get(key)
+                if entry is None and key in self._spilling:
+                    # Evicted, but its spill has not started yet: take it back
+                    entry = self._memory[key] = self._spilling.pop(key)
+                if entry is not None:
+                    entry.last_used = time.monotonic()
+                    entry.pins += pin
+                    self._memory.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return entry, "memory", self._select_victims(keep=key)
+                on_disk = key in self._manifest
+
+            # Build / load / measure outside the cache lock so other keys are served meanwhile
+            store, source = None, "built"
+            if on_disk:
+                try:
+                    store, source = load(self._entry_path(key)), "disk"
+                except Exception:
+                    # Corrupt or incompatible spill: rebuild it below
+                    with self._lock:
+                        self._manifest.pop(key, None)
+                        self._write_manifest()
+                    shutil.rmtree(self._entry_path(key), ignore_errors=True)
+            if store is None:
+                store = build()
+            entry = _Entry(store, size_of(store), save, drop)
+            entry.pins += pin
+
+            with self._lock:
+                self.stats["disk_hits" if source == "disk" else "misses"] += 1
+                if source == "disk" and key in self._manifest:
+                    self._manifest[key]["last_used"] = time.time()
+                    self._write_manifest()
+                self._memory[key] = entry
+                return entry, source, self._select_victims(keep=key)
+
+    def _forget(self, key):
+        """Unlink `key` from memory and disk; drop its store now, or when its last lease ends."""
+        with self._key_lock(key):
+            with self._lock:
+                entry = self._memory.pop(key, None) or self._spilling.pop(key, None)
+                if entry is not None and entry.pins:
+                    entry.invalidated = True
+                    entry = None
+                if self._manifest.pop(key, None) is not None:
+                    self._write_manifest()
+            shutil.rmtree(self._entry_path(key), ignore_errors=True)
+            if entry is not None:
+                entry.drop(entry.value)
+
+    # --- Public API ---
+    def get_or_build(self, key, build, save, load, drop, size_of, pin=False):
+        """
+        Return (store, source) for `key`, source being "memory", "disk" or
+        "built". `save(store, path)` / `load(path)` spill and reload a store,
+        `drop(store)` frees its memory and `size_of(store)` estimates it in
+        bytes. Concurrent requests for the same key build it only once.
+        With `pin`, the store is also pinned; prefer lease().
+        """
+        entry, source, victims = self._get_entry(key, build, save, load, drop, size_of, pin)
+        self._spill(victims)
+        return entry.value, source
+
+    @contextmanager
+    def lease(self, key, build, save, load, drop, size_of):
+        """
+        get_or_build() whose store cannot be evicted until the block exits,
+        e.g. while a question is answered from it.
+        """
+        entry, source, victims = self._get_entry(key, build, save, load, drop, size_of, pin=True)
+        self._spill(victims)
+        try:
+            yield entry.value, source
+        finally:
+            with self._lock:
+                entry.pins -= 1
+                entry.last_used = time.monotonic()
+                release = entry.invalidated and not entry.pins
+                victims = self._select_victims()
+            if release:
+                entry.drop(entry.value)
+            self._spill(victims)
+
+    def invalidate(self, key):
+        """
+        Forget `key` in memory and on disk, so the next request rebuilds it.
+        A store still leased keeps serving its lease and is dropped after it.
+        """
+        self._forget(key)
+        with self._lock:
+            self.stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            keys = set(self._memory) | set(self._spilling) | set(self._manifest)
+        for key in keys:
+            self._forget(key)
+
+    def metrics(self):
+        with self._lock:
+            return {
+                **self.stats,
+                "resident": len(self._memory),
+                "resident_bytes": sum(entry.size for entry in self._memory.values()),
+                "max_bytes": self.max_bytes,
+                "spilled": len(self._manifest),
+                "spilled_bytes": sum(entry["size"] for entry in self._manifest.values()),
+            }
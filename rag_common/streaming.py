@@ -0,0 +1,50 @@
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+class StreamlitTokenHandler(BaseCallbackHandler):
+    """
+    Renders streamed tokens into a Streamlit placeholder (e.g. `st.empty()`)
+    and measures time-to-first-token and total latency from creation.
+
+    Only pass it to the final answer call of a `streaming=True` chat model;
+    a retry (new LLM start) clears the text and streams the new answer.
+    """
+
+    def __init__(self, container, cursor="▌"):
+        self.container = container
+        self.cursor = cursor
+        self.text = ""
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.finished_at = None
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.text = ""
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.text = ""
+
+    def on_llm_new_token(self, token, **kwargs):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.text += token
+        self.container.markdown(self.text + self.cursor)
+
+    def on_llm_end(self, response, **kwargs):
+        self.finished_at = time.perf_counter()
+        self.container.markdown(self.text)
+
+    @property
+    def time_to_first_token(self):
+        return None if self.first_token_at is None else self.first_token_at - self.started
+
+    @property
+    def total_latency(self):
+        return (self.finished_at or time.perf_counter()) - self.started
+
+    def latency_caption(self):
+        ttft = self.time_to_first_token
+        first = f"first token {ttft:.2f}s" if ttft is not None else "no tokens streamed"
+        return f"⏱️ {first} · total {self.total_latency:.2f}s"
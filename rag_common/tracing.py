@@ -0,0 +1,365 @@
+"""
+Lightweight per-stage spans for the RAG pipelines.
+
+A Tracer holds one root span per question plus a child span per stage
+(rewrite, intent, retrieve, expand, generate, evaluate, ...) with its
+duration, the tokens / estimated cost of the OpenAI calls made inside it and
+any attributes the pipeline sets (e.g. which fallback fired).
+
+Finished traces can be exported without extra dependencies:
+
+    RAG_TRACE_FILE=traces.jsonl                 one JSON object per span
+    RAG_TRACE_FILE=traces.jsonl RAG_TRACE_FORMAT=otlp
+                                                one OTLP/JSON request per trace (collector file receiver format)
+    RAG_TRACE_OTEL=1                            also emit through the OpenTelemetry SDK, if installed
+
+Token counts come from the OpenAI callback. Streamed calls only report
+usage when the model asks for it (langchain_openai's `stream_usage=True`);
+for the others (e.g. langchain_community's ChatOpenAI, which drops OpenAI's
+final usage chunk) prompt and completion tokens are estimated with
+tiktoken, and the root span's `estimated_llm_calls` says how many calls
+were counted that way.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+
+from langchain_community.callbacks import get_openai_callback
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import get_buffer_string
+from langchain_core.tracers.context import register_configure_hook
+
+TRACE_FILE = os.getenv("RAG_TRACE_FILE", "")
+TRACE_FORMAT = os.getenv("RAG_TRACE_FORMAT", "jsonl")  # "jsonl" or "otlp"
+TRACE_OTEL = os.getenv("RAG_TRACE_OTEL", "") not in ("", "0", "false")
+
+USAGE_FIELDS = ("prompt_tokens", "completion_tokens", "total_tokens", "llm_calls", "cost_usd")
+
+_export_lock = threading.Lock()
+logger = logging.getLogger(__name__)
+
+# Installed for every LangChain call made inside Tracer.track(), like get_openai_callback()
+_usage_estimator_var = ContextVar("rag_usage_estimator", default=None)
+register_configure_hook(_usage_estimator_var, inheritable=True)
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str = None
+    start_ns: int = 0
+    end_ns: int = 0
+    attributes: dict = field(default_factory=dict)
+    status: str = "ok"
+
+    @property
+    def duration(self):
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def to_dict(self):
+        record = asdict(self)
+        record["duration_ms"] = self.duration * 1000
+        return record
+
+
+def _new_id(length):
+    return uuid.uuid4().hex[:length]
+
+
+def estimate_tokens(text, model=None):
+    """tiktoken count for `model`, or about 4 characters per token without it."""
+    try:
+        import tiktoken
+
+        try:
+            encoding = tiktoken.encoding_for_model(model or "gpt-3.5-turbo")
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+        return len(encoding.encode(text))
+    except Exception:
+        # Not installed, or its encoding files cannot be downloaded
+        return len(text) // 4 + 1 if text else 0
+
+
+def _token_cost(model, prompt_tokens, completion_tokens):
+    from langchain_community.callbacks import openai_info
+
+    try:
+        model = openai_info.standardize_model_name(model)
+        if hasattr(openai_info, "TokenType"):
+            return (openai_info.get_openai_token_cost_for_model(model, prompt_tokens, token_type=openai_info.TokenType.PROMPT)
+                    + openai_info.get_openai_token_cost_for_model(model, completion_tokens,
+                                                                  token_type=openai_info.TokenType.COMPLETION))
+        return (openai_info.get_openai_token_cost_for_model(model, prompt_tokens)
+                + openai_info.get_openai_token_cost_for_model(model, completion_tokens, is_completion=True))
+    except ValueError:
+        # Model without a known price
+        return 0.0
+
+
+def _reported_usage(response):
+    if (response.llm_output or {}).get("token_usage"):
+        return True
+    for generations in response.generations:
+        for generation in generations:
+            if getattr(getattr(generation, "message", None), "usage_metadata", None):
+                return True
+    return False
+
+
+class StreamedUsageEstimator(BaseCallbackHandler):
+    """
+    Adds estimated usage to an OpenAI usage callback for calls whose
+    response reports none (streamed answers), so their spans are not 0 tokens.
+    """
+
+    def __init__(self, usage):
+        self.usage = usage
+        self.estimated_calls = 0
+        self._prompts = {}
+
+    @staticmethod
+    def _model(kwargs):
+        params = kwargs.get("invocation_params") or {}
+        return params.get("model") or params.get("model_name")
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._prompts[run_id] = ("\n".join(get_buffer_string(batch) for batch in messages), self._model(kwargs))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._prompts[run_id] = ("\n".join(prompts), self._model(kwargs))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._prompts.pop(run_id, None)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        prompt, model = self._prompts.pop(run_id, ("", None))
+        if _reported_usage(response):
+            return
+        completion = "".join(generation.text for generations in response.generations for generation in generations)
+        prompt_tokens, completion_tokens = estimate_tokens(prompt, model), estimate_tokens(completion, model)
+        cost = _token_cost(model, prompt_tokens, completion_tokens) if model else 0.0
+        with self.usage._lock:
+            self.usage.prompt_tokens += prompt_tokens
+            self.usage.completion_tokens += completion_tokens
+            self.usage.total_tokens += prompt_tokens + completion_tokens
+            self.usage.total_cost += cost
+            # The OpenAI callback only skips counting the request when there is no llm_output at all
+            if response.llm_output is None:
+                self.usage.successful_requests += 1
+            self.estimated_calls += 1
+
+
+class Tracer:
+    """
+    Collects the spans of one pipeline run.
+
+    Stages are timed with `span(name)`; token usage is attributed to a span
+    only while `track()` is active (it installs the OpenAI usage callback for
+    the whole run and closes the root span on exit).
+    """
+
+    def __init__(self, name, **attributes):
+        self.trace_id = uuid.uuid4().hex
+        self.root = Span(name, self.trace_id, _new_id(16), start_ns=time.time_ns(), attributes=dict(attributes))
+        self.spans = [self.root]
+        self._callback = None
+
+    def _usage_snapshot(self):
+        cb = self._callback
+        if cb is None:
+            return None
+        return (cb.prompt_tokens, cb.completion_tokens, cb.total_tokens, cb.successful_requests, cb.total_cost)
+
+    @staticmethod
+    def _usage_delta(before, after):
+        if before is None or after is None:
+            return {}
+        return {key: b - a for key, a, b in zip(USAGE_FIELDS, before, after)}
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Time a stage; yields the Span so the caller can add attributes."""
+        span = Span(name, self.trace_id, _new_id(16), self.root.span_id, time.time_ns(), attributes=dict(attributes))
+        before = self._usage_snapshot()
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.attributes["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            span.attributes.update(self._usage_delta(before, self._usage_snapshot()))
+            self.spans.append(span)
+
+    def record(self, name, start_ns, end_ns, **attributes):
+        """Add a span measured elsewhere (e.g. stages that ran concurrently in threads)."""
+        span = Span(name, self.trace_id, _new_id(16), self.root.span_id, start_ns, end_ns, dict(attributes))
+        self.spans.append(span)
+        return span
+
+    def snapshot(self):
+        """Opaque token-usage reading, for attributing usage with usage_since()."""
+        return self._usage_snapshot()
+
+    def usage_since(self, snapshot):
+        return self._usage_delta(snapshot, self._usage_snapshot())
+
+    @contextmanager
+    def track(self):
+        """Run the pipeline inside this block; exports the trace on exit."""
+        with get_openai_callback() as cb:
+            self._callback = cb
+            estimator = StreamedUsageEstimator(cb)
+            token = _usage_estimator_var.set(estimator)
+            try:
+                yield self
+            except BaseException as e:
+                self.root.status = "error"
+                self.root.attributes["error"] = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                _usage_estimator_var.reset(token)
+                self._callback = None
+                self.root.end_ns = time.time_ns()
+                self.root.attributes.update(
+                    prompt_tokens=cb.prompt_tokens,
+                    completion_tokens=cb.completion_tokens,
+                    total_tokens=cb.total_tokens,
+                    llm_calls=cb.successful_requests,
+                    cost_usd=cb.total_cost,
+                    estimated_llm_calls=estimator.estimated_calls,
+                )
+                try:
+                    export(self.spans)
+                except Exception:
+                    # A broken exporter must not cost the user their answer
+                    logger.exception("trace export failed")
+
+    @property
+    def usage(self):
+        return {key: self.root.attributes.get(key, 0) for key in USAGE_FIELDS}
+
+    @property
+    def timings(self):
+        """Seconds per stage name (summed when a stage ran more than once)."""
+        timings = {}
+        for span in self.spans[1:]:
+            timings[span.name] = timings.get(span.name, 0.0) + span.duration
+        return timings
+
+
+# --- Export ---
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple, dict)):
+        return {"stringValue": json.dumps(value, default=str)}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans, service_name="genai-rag"):
+    """OTLP/JSON ExportTraceServiceRequest for one trace."""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+            "scopeSpans": [{
+                "scope": {"name": "rag_common.tracing"},
+                "spans": [
+                    {
+                        "traceId": span.trace_id,
+                        "spanId": span.span_id,
+                        **({"parentSpanId": span.parent_id} if span.parent_id else {}),
+                        "name": span.name,
+                        "kind": 1,  # SPAN_KIND_INTERNAL
+                        "startTimeUnixNano": str(span.start_ns),
+                        "endTimeUnixNano": str(span.end_ns),
+                        "attributes": [
+                            {"key": key, "value": _otlp_value(value)}
+                            for key, value in span.attributes.items() if value is not None
+                        ],
+                        "status": {"code": 2 if span.status == "error" else 1},
+                    }
+                    for span in spans
+                ],
+            }],
+        }]
+    }
+
+
+def write_jsonl(spans, path, fmt="jsonl"):
+    lines = [json.dumps(to_otlp(spans))] if fmt == "otlp" else [json.dumps(span.to_dict(), default=str) for span in spans]
+    with _export_lock, open(path, "a", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def emit_otel(spans):
+    """Replay finished spans through the OpenTelemetry SDK's global tracer provider."""
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        raise ImportError("RAG_TRACE_OTEL needs OpenTelemetry: pip install opentelemetry-sdk")
+    otel_tracer = trace.get_tracer("rag_common.tracing")
+    root, children = spans[0], spans[1:]
+    root_span = otel_tracer.start_span(root.name, start_time=root.start_ns, attributes=_otel_attributes(root))
+    context = trace.set_span_in_context(root_span)
+    for span in children:
+        child = otel_tracer.start_span(span.name, context=context, start_time=span.start_ns,
+                                       attributes=_otel_attributes(span))
+        child.end(end_time=span.end_ns)
+    root_span.end(end_time=root.end_ns)
+
+
+def _otel_attributes(span):
+    return {key: value if isinstance(value, (str, bool, int, float)) else json.dumps(value, default=str)
+            for key, value in span.attributes.items() if value is not None}
+
+
+def export(spans):
+    if TRACE_FILE:
+        write_jsonl(spans, TRACE_FILE, TRACE_FORMAT)
+    if TRACE_OTEL:
+        emit_otel(spans)
+
+
+# --- Display ---
+def span_rows(spans):
+    """One row per stage (root last, as "total") for a dataframe / latency panel."""
+    rows = []
+    for span in spans[1:] + spans[:1]:
+        rows.append({
+            "stage": "total" if span is spans[0] else span.name,
+            "ms": round(span.duration * 1000, 1),
+            "tokens": span.attributes.get("total_tokens", 0),
+            "cost_usd": round(span.attributes.get("cost_usd", 0.0), 6),
+            "fallback": span.attributes.get("fallback", False),
+            "status": span.status,
+        })
+    return rows
+
+
+def render_latency_panel(container, spans):
+    """Latency panel in a Streamlit container (st, st.sidebar, an expander, ...)."""
+    rows = span_rows(spans)
+    stages = [row for row in rows if row["stage"] != "total"]
+    total = rows[-1]
+    container.caption(
+        f"⏱️ {total['ms']:.0f} ms total · {total['tokens']} tokens · ${total['cost_usd']:.4f}"
+        + (f" · fallbacks: {', '.join(r['stage'] for r in stages if r['fallback'])}" if any(r["fallback"] for r in stages) else "")
+    )
+    if stages:
+        container.bar_chart(stages, x="stage", y="ms")
+        container.dataframe(rows, hide_index=True)
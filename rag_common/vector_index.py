@@ -0,0 +1,120 @@
+"""
+Compressed FAISS indexes for large corpora.
+
+LangChain's FAISS store keeps every vector as float32 in an exact flat
+index. Below RAG_INDEX_MIN_VECTORS that is kept as is; above it the flat
+index is replaced in place (same vectors, same order, same docstore) by a
+trained inverted-file index:
+
+    RAG_INDEX_TYPE=auto     sq8 above the size threshold, flat below (default)
+    RAG_INDEX_TYPE=flat     always exact
+    RAG_INDEX_TYPE=ivf      IVF over full vectors: faster search, same memory
+    RAG_INDEX_TYPE=sq8      IVF over int8 scalar-quantized vectors: ~4x smaller
+    RAG_INDEX_TYPE=ivfpq    IVF + product quantization: ~24-96x smaller, lossier
+
+RAG_INDEX_NPROBE is the recall/speed knob: how many of the inverted lists
+are scanned per query. It only affects search, so it can be changed without
+rebuilding a saved index. benchmarks/bench_index.py measures memory, build
+time, latency and recall@k of each type against the flat index.
+"""
+import math
+import os
+
+import faiss
+import numpy as np
+
+INDEX_TYPE = os.getenv("RAG_INDEX_TYPE", "auto")
+INDEX_MIN_VECTORS = int(os.getenv("RAG_INDEX_MIN_VECTORS", "20000"))
+INDEX_NPROBE = int(os.getenv("RAG_INDEX_NPROBE", "16"))
+
+INDEX_TYPES = ("flat", "ivf", "sq8", "ivfpq")
+AUTO_INDEX_TYPE = "sq8"
+MIN_POINTS_PER_LIST = 39  # fewer training points per list and k-means warns / degrades
+
+
+def choose_index_type(count, index_type=INDEX_TYPE, min_vectors=INDEX_MIN_VECTORS):
+    if index_type == "auto":
+        return AUTO_INDEX_TYPE if count >= min_vectors else "flat"
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}; expected auto or one of {', '.join(INDEX_TYPES)}")
+    return index_type
+
+
+def settings_key(index_type=INDEX_TYPE, min_vectors=INDEX_MIN_VECTORS):
+    """Part of an index cache key: everything that changes what gets built (nprobe does not)."""
+    return f"index={index_type}/{min_vectors}"
+
+
+def nlist_for(count):
+    """~4 * sqrt(n) inverted lists, capped so each one gets enough training points."""
+    return max(1, min(int(4 * math.sqrt(count)), count // MIN_POINTS_PER_LIST))
+
+
+def pq_subquantizers(dim):
+    """Largest divisor of `dim` up to 64 (one byte per sub-vector, 64 bytes per 1536-d vector)."""
+    return max(m for m in range(1, min(dim, 64) + 1) if dim % m == 0)
+
+
+def build_index(vectors, index_type, metric=faiss.METRIC_L2, nprobe=INDEX_NPROBE, seed=0):
+    """Train and fill a FAISS index of `index_type` over float32 `vectors` (row i gets id i)."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count, dim = vectors.shape
+    if index_type == "flat":
+        index = faiss.IndexFlatIP(dim) if metric == faiss.METRIC_INNER_PRODUCT else faiss.IndexFlatL2(dim)
+        index.add(vectors)
+        return index
+
+    nlist = nlist_for(count)
+    quantizer = faiss.IndexFlatIP(dim) if metric == faiss.METRIC_INNER_PRODUCT else faiss.IndexFlatL2(dim)
+    if index_type == "ivf":
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist, metric)
+    elif index_type == "sq8":
+        index = faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, faiss.ScalarQuantizer.QT_8bit, metric)
+    elif index_type == "ivfpq":
+        # 8-bit codebooks need 256 training points per sub-quantizer centroid set
+        nbits = 8 if count >= 256 * MIN_POINTS_PER_LIST else 4
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_subquantizers(dim), nbits, metric)
+    else:
+        raise ValueError(f"Unknown index type {index_type!r}")
+
+    # Train on a sample; k-means cost grows with the training set, not the corpus
+    sample_size = min(count, nlist * 256)
+    if sample_size < count:
+        sample = vectors[np.random.default_rng(seed).choice(count, sample_size, replace=False)]
+    else:
+        sample = vectors
+    index.train(sample)
+    index.add(vectors)
+    # LangChain reconstructs vectors by id (e.g. for MMR), which IVF only supports with a direct map
+    index.make_direct_map()
+    index.nprobe = min(nprobe, nlist)
+    return index
+
+
+def compress_vectorstore(vectorstore, index_type=INDEX_TYPE, min_vectors=INDEX_MIN_VECTORS, nprobe=INDEX_NPROBE):
+    """
+    Swap a LangChain FAISS store's flat index for the type chosen for its size.
+    Ids are positional, so the docstore mapping stays valid. Returns the store.
+    """
+    count = vectorstore.index.ntotal
+    chosen = choose_index_type(count, index_type, min_vectors)
+    if chosen == "flat" or not count:
+        return vectorstore
+    vectors = vectorstore.index.reconstruct_n(0, count)
+    vectorstore.index = build_index(vectors, chosen, vectorstore.index.metric_type, nprobe)
+    return vectorstore
+
+
+def set_nprobe(vectorstore, nprobe=INDEX_NPROBE):
+    """Apply the current recall/speed setting to a (re)loaded store; no-op for flat indexes."""
+    try:
+        ivf = faiss.extract_index_ivf(vectorstore.index)
+    except RuntimeError:
+        return vectorstore
+    ivf.nprobe = min(nprobe, ivf.nlist)
+    return vectorstore
+
+
+def index_bytes(index):
+    """Serialized size, a close proxy for the index's resident memory."""
+    return int(faiss.serialize_index(index).nbytes)
@@ -0,0 +1,99 @@
+import hashlib
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
+
+from rag_common.dedup import ChunkDeduplicator
+
+
+def _sha(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def collection_name_for(seed_url):
+    # Chroma names: 3-63 chars of [a-zA-Z0-9._-]
+    return f"site-{_sha(seed_url)[:32]}"
+
+
+class PersistentWebIndex:
+    """
+    Persistent Chroma collection for a crawled site, updated incrementally.
+
+    Chunk ids are `<url hash>-<chunk text hash>`, so when a page changes only
+    chunks whose text is new get embedded; chunks that disappeared from the
+    page are deleted and unchanged ones are left alone.
+
+    Duplicate chunks are dropped within each page only: deduplicating across
+    pages would tie a page's index entries to whichever other page held the
+    first copy, and that copy can change or disappear on the next crawl.
+    """
+
+    def __init__(self, persist_directory, embeddings, collection_name, chunk_size=1000, chunk_overlap=200,
+                 dedup_threshold=0.85):
+        self.vectorstore = Chroma(
+            collection_name=collection_name,
+            embedding_function=embeddings,
+            persist_directory=persist_directory,
+        )
+        self.splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=len,
+        )
+        self.dedup_threshold = dedup_threshold
+
+    def _existing_ids(self, url):
+        return set(self.vectorstore.get(where={"source": url}, include=[])["ids"])
+
+    def upsert_page(self, url, text, title=""):
+        """Returns (added, removed, kept, deduplicated) chunk counts for one page."""
+        url_hash = _sha(url)[:16]
+        docs = self.splitter.split_documents([Document(page_content=text, metadata={"source": url, "title": title})])
+        split_count = len(docs)
+        if self.dedup_threshold > 0:
+            docs = list(ChunkDeduplicator(threshold=self.dedup_threshold).filter(docs))
+        chunks = {}
+        for doc in docs:
+            chunks[f"{url_hash}-{_sha(doc.page_content)}"] = doc
+
+        existing = self._existing_ids(url)
+        stale = existing - chunks.keys()
+        new_ids = [chunk_id for chunk_id in chunks if chunk_id not in existing]
+        if stale:
+            self.vectorstore.delete(ids=list(stale))
+        if new_ids:
+            self.vectorstore.add_documents([chunks[i] for i in new_ids], ids=new_ids)
+        return len(new_ids), len(stale), len(existing & chunks.keys()), split_count - len(chunks)
+
+    def remove_page(self, url):
+        existing = self._existing_ids(url)
+        if existing:
+            self.vectorstore.delete(ids=list(existing))
+        return len(existing)
+
+    def sync(self, results, state=None):
+        """
+        Apply a crawl's PageResults; returns counts of pages and chunks touched.
+        With a CrawlState, each page's validators are recorded only after its
+        chunks were written, and the state is saved even if a later page fails.
+        """
+        stats = {"new": 0, "changed": 0, "unchanged": 0, "gone": 0, "error": 0,
+                 "chunks_added": 0, "chunks_removed": 0, "chunks_kept": 0, "chunks_deduplicated": 0}
+        try:
+            for result in results:
+                stats[result.status] += 1
+                if result.status in ("new", "changed"):
+                    added, removed, kept, deduplicated = self.upsert_page(result.url, result.text, result.title)
+                    stats["chunks_added"] += added
+                    stats["chunks_removed"] += removed
+                    stats["chunks_kept"] += kept
+                    stats["chunks_deduplicated"] += deduplicated
+                elif result.status == "gone":
+                    stats["chunks_removed"] += self.remove_page(result.url)
+                if state is not None:
+                    state.record(result)
+        finally:
+            if state is not None:
+                state.save()
+        return stats
@@ -0,0 +1,196 @@
+"""
+Website Q&A pipeline, importable without Streamlit.
+
+Used by demo_streamlit_webload.py and by the headless batch runner
+(batch_eval.py).
+"""
+from langchain_community.document_loaders import WebBaseLoader
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+from langchain_community.vectorstores import Chroma
+from langchain.chains import RetrievalQA
+from langchain_core.prompts import PromptTemplate
+import json
+import os
+import uuid
+
+import numpy as np
+
+from rag_common.context_packing import ContextPacker
+from rag_common.dedup import ChunkDeduplicator
+from rag_common.embedding_cache import CachedEmbeddings
+from rag_common.index_cache import content_key
+from rag_common.pipeline import PipelineResult
+from rag_common.rate_limit import limited_http_client
+from rag_common.store_cache import VectorStoreCache
+from rag_common.tracing import Tracer
+
+EMBEDDING_MODEL = "text-embedding-ada-002"
+EMBED_BATCH_SIZE = int(os.getenv("RAG_EMBED_BATCH_SIZE", "256"))
+WEB_INDEX_DIR = os.getenv("WEB_INDEX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".web_index"))
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+DEDUP_THRESHOLD = float(os.getenv("RAG_DEDUP_THRESHOLD", "0.85"))  # 0 disables duplicate removal
+CONTEXT_PACKING = os.getenv("RAG_CONTEXT_PACKING", "1") not in ("", "0", "false")
+CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "3000"))  # 0: merge/dedup only, no budget
+STORE_CACHE_DIR = os.getenv(
+    "WEB_STORE_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "web_stores"),
+)
+STORE_CACHE_MAX_MB = int(os.getenv("RAG_WEB_CACHE_MAX_MB", "256"))  # in-memory budget across all URLs
+STORE_CACHE_TTL = int(os.getenv("RAG_WEB_CACHE_TTL", "3600"))  # seconds unused before a store is spilled
+STORE_CACHE_DISK_MB = int(os.getenv("RAG_WEB_CACHE_DISK_MB", "1024"))
+CHROMA_ADD_BATCH = 1000
+
+qa_template = """Use the following pieces of context to answer the user's question.
+    If you don't know the answer, just say that you don't know, don't try to make up an answer.
+    ----------------
+    {context}
+    ----------------
+    Question: {question}
+    Answer:"""
+QA_CHAIN_PROMPT = PromptTemplate.from_template(qa_template)
+
+
+def build_embeddings(api_key):
+    """
+    Embeddings backed by the shared on-disk cache, so chunks already embedded
+    for another URL or session are not sent to OpenAI again.
+    """
+    return CachedEmbeddings(
+        OpenAIEmbeddings(model=EMBEDDING_MODEL, api_key=api_key, http_client=limited_http_client(), max_retries=0),
+        model_name=EMBEDDING_MODEL,
+        batch_size=EMBED_BATCH_SIZE,
+    )
+
+
+def load_url_chunks(url):
+    """
+    Load one page with WebBaseLoader and split it into chunks, dropping
+    repeated boilerplate; returns (docs, chunks, dedup_report), with
+    dedup_report None when RAG_DEDUP_THRESHOLD=0.
+    """
+    docs = WebBaseLoader(url).load()
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        length_function=len,
+    )
+    chunks = text_splitter.split_documents(docs)
+    if DEDUP_THRESHOLD <= 0:
+        return docs, chunks, None
+    dedup = ChunkDeduplicator(threshold=DEDUP_THRESHOLD)
+    return docs, list(dedup.filter(chunks)), dedup.report
+
+
+def new_store_cache():
+    return VectorStoreCache(
+        STORE_CACHE_DIR,
+        max_bytes=STORE_CACHE_MAX_MB * 1024 * 1024,
+        ttl=STORE_CACHE_TTL,
+        max_disk_bytes=STORE_CACHE_DISK_MB * 1024 * 1024,
+    )
+
+
+def page_store_key(url):
+    """Cache key of a single page's store; changes with any setting that changes its chunks or vectors."""
+    return f"{url}|{EMBEDDING_MODEL}|{CHUNK_SIZE}|{CHUNK_OVERLAP}|dedup={DEDUP_THRESHOLD}"
+
+
+def new_collection_name(url):
+    # In-memory Chroma stores share one client, so each needs its own collection;
+    # the random suffix keeps a rebuild from appending to a copy that is still being dropped
+    return f"page-{content_key(url)[:24]}-{uuid.uuid4().hex[:8]}"
+
+
+def build_page_store(chunks, embeddings, url):
+    return Chroma.from_documents(chunks, embeddings, collection_name=new_collection_name(url))
+
+
+def save_chroma(store, path):
+    """Write an in-memory Chroma store's ids, vectors, texts and metadata to a directory."""
+    data = store.get(include=["embeddings", "documents", "metadatas"])
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "vectors.npy"), np.asarray(data["embeddings"], dtype=np.float32))
+    with open(os.path.join(path, "records.json"), "w", encoding="utf-8") as f:
+        json.dump({"ids": data["ids"], "documents": data["documents"], "metadatas": data["metadatas"]}, f)
+
+
+def load_chroma(path, embeddings, url):
+    """Rebuild a store written by save_chroma without calling the embedding model."""
+    vectors = np.load(os.path.join(path, "vectors.npy"))
+    with open(os.path.join(path, "records.json"), encoding="utf-8") as f:
+        records = json.load(f)
+    store = Chroma(collection_name=new_collection_name(url), embedding_function=embeddings)
+    for start in range(0, len(records["ids"]), CHROMA_ADD_BATCH):
+        end = start + CHROMA_ADD_BATCH
+        store._collection.add(
+            ids=records["ids"][start:end],
+            embeddings=vectors[start:end].tolist(),
+            documents=records["documents"][start:end],
+            metadatas=records["metadatas"][start:end],
+        )
+    return store
+
+
+def chroma_nbytes(store):
+    """
+    Estimated resident size: vectors twice (stored rows + HNSW index) plus
+    texts and metadata.
+    """
+    data = store.get(include=["embeddings", "documents", "metadatas"])
+    vectors = np.asarray(data["embeddings"], dtype=np.float32)
+    text = sum(len(doc.encode("utf-8")) for doc in data["documents"])
+    metadata = len(json.dumps(data["metadatas"]))
+    return 2 * vectors.nbytes + text + metadata
+
+
+def drop_chroma(store):
+    store.delete_collection()
+
+
+def build_qa_chain(retriever, api_key=None, streaming=True, llm=None):
+    if llm is None:
+        # Without api_key the client falls back to OPENAI_API_KEY from the environment
+        credentials = {"api_key": api_key} if api_key else {}
+        llm = ChatOpenAI(
+            model_name="gpt-3.5-turbo", temperature=0.5, streaming=streaming, stream_usage=True,
+            http_client=limited_http_client(), max_retries=0, **credentials,
+        )
+    return RetrievalQA.from_chain_type(
+        llm=llm,
+        chain_type="stuff",
+        retriever=retriever,
+        return_source_documents=True,
+        chain_type_kwargs={"prompt": QA_CHAIN_PROMPT}
+    )
+
+
+class WebQA:
+    """
+    RetrievalQA over a website's vector store, with retrieval and generation
+    timed separately and the retrieved chunks packed (overlaps stitched,
+    duplicates dropped, RAG_CONTEXT_TOKEN_BUDGET applied) in between.
+    """
+
+    def __init__(self, vectorstore, api_key=None, streaming=True, llm=None):
+        self.qa_chain = build_qa_chain(vectorstore.as_retriever(), api_key=api_key, streaming=streaming, llm=llm)
+        self.packer = ContextPacker(CONTEXT_TOKEN_BUDGET) if CONTEXT_PACKING else None
+
+    def run(self, question, callbacks=None):
+        tracer = Tracer("web_qa", question=question)
+        with tracer.track():
+            # Same two steps RetrievalQA.invoke performs, split so each can be traced
+            with tracer.span("retrieve") as span:
+                docs = self.qa_chain.retriever.invoke(question)
+                span.attributes["documents"] = len(docs)
+            context, details = docs, {}
+            if self.packer:
+                with tracer.span("pack", documents=len(docs)) as span:
+                    context, report = self.packer.pack(docs)
+                    span.attributes.update(report.to_dict())
+                details = {"packing": report.to_dict(), "context_tokens_saved": report.tokens_saved}
+            with tracer.span("generate", documents=len(context)):
+                answer = self.qa_chain.combine_documents_chain.run(
+                    input_documents=context, question=question, callbacks=callbacks
+                )
+        return PipelineResult.from_trace(question, tracer, answer, docs, details)
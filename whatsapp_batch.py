@@ -0,0 +1,206 @@
+"""
+Batch WhatsApp Web messaging over one persisted browser session.
+
+    python whatsapp_batch.py --login                         # once: scan the QR code
+    python whatsapp_batch.py messages.csv --report sent.csv  # contact,message rows
+    python whatsapp_batch.py messages.csv --url http://127.0.0.1:8000/ --headless   # local mock chat page
+
+The batch mode of demo_whatsapp_auto,py. The browser profile (cookies,
+local storage) lives in WHATSAPP_PROFILE_DIR, so the QR code is scanned
+once and later runs start logged in. One page works through the whole
+queue. Every step waits on the element it needs (chat list, search
+result, chat header, composer, delivery tick) instead of fixed sleeps or
+screen coordinates. Each message's latency and any failure is reported,
+and a failed contact does not stop the batch.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import statistics
+import time
+from dataclasses import asdict, dataclass, fields
+
+from playwright.async_api import Error as PlaywrightError
+from playwright.async_api import async_playwright
+
+WHATSAPP_URL = os.getenv("WHATSAPP_URL", "https://web.whatsapp.com/")
+PROFILE_DIR = os.getenv("WHATSAPP_PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".whatsapp_profile"))
+BROWSER_PATH = os.getenv("WHATSAPP_BROWSER_PATH", "")
+
+# data-tab / data-icon / title / role attributes rather than generated class names
+CHAT_LIST = "#pane-side"
+SEARCH_BOX = "div[contenteditable='true'][data-tab='3']"
+SEARCH_RESULT = "#pane-side span[title={name}]"
+CHAT_HEADER = "#main header span[title={name}]"
+COMPOSER = "#main footer div[contenteditable='true']"
+OUTGOING = "#main .message-out"
+DELIVERED = "[data-icon='msg-check'], [data-icon='msg-dblcheck']"
+
+logger = logging.getLogger("whatsapp")
+
+
+@dataclass
+class MessageResult:
+    contact: str
+    message: str
+    status: str = "sent"  # "sent" or "failed"
+    seconds: float = 0.0
+    error: str = None
+    sent_at: float = 0.0
+
+
+def _quoted(name):
+    return json.dumps(name)  # a valid CSS attribute string, quotes escaped
+
+
+def read_queue(path):
+    """contact/message pairs from a CSV (contact,message columns) or JSONL."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+    missing = [i for i, row in enumerate(rows, 1) if not row.get("contact") or not row.get("message")]
+    if missing:
+        raise ValueError(f"{path}: rows {missing[:5]} need both contact and message")
+    return [(row["contact"], row["message"]) for row in rows]
+
+
+async def wait_until_ready(page, url, timeout_ms):
+    """Open WhatsApp Web and wait for the chat list (i.e. a logged-in session)."""
+    await page.goto(url, wait_until="domcontentloaded")
+    await page.locator(CHAT_LIST).wait_for(timeout=timeout_ms)
+
+
+async def send_one(page, contact, message, timeout_ms):
+    """Open `contact`'s chat, send `message` and wait for the delivery tick; raises on failure."""
+    search = page.locator(SEARCH_BOX)
+    await search.click(timeout=timeout_ms)
+    await search.fill(contact)
+    # Exact title match, so "Ann" never opens "Anna"
+    await page.locator(SEARCH_RESULT.format(name=_quoted(contact))).first.click(timeout=timeout_ms)
+    await page.locator(CHAT_HEADER.format(name=_quoted(contact))).wait_for(timeout=timeout_ms)
+
+    composer = page.locator(COMPOSER)
+    await composer.click(timeout=timeout_ms)
+    # insert_text keeps emoji and newlines intact where keyboard.type would send Enter mid-message
+    await page.keyboard.insert_text(message)
+    before = await page.locator(OUTGOING).count()
+    await page.keyboard.press("Enter")
+
+    last = page.locator(OUTGOING).nth(before)
+    await last.wait_for(timeout=timeout_ms)
+    await last.locator(DELIVERED).first.wait_for(timeout=timeout_ms)
+
+
+async def send_batch(queue, url=WHATSAPP_URL, profile_dir=PROFILE_DIR, headless=False, timeout_ms=20000,
+                     min_interval=1.0, ready_timeout_ms=60000, on_result=None):
+    """Send every (contact, message) in order over one session; returns MessageResults."""
+    results = []
+    async with async_playwright() as p:
+        context = await p.chromium.launch_persistent_context(
+            profile_dir, headless=headless, executable_path=BROWSER_PATH or None,
+        )
+        try:
+            page = context.pages[0] if context.pages else await context.new_page()
+            await wait_until_ready(page, url, ready_timeout_ms)
+            last_sent = 0.0
+            for contact, message in queue:
+                # WhatsApp flags accounts that send too fast
+                pause = min_interval - (time.monotonic() - last_sent)
+                if pause > 0:
+                    await asyncio.sleep(pause)
+                result = MessageResult(contact, message)
+                start = time.perf_counter()
+                try:
+                    await send_one(page, contact, message, timeout_ms)
+                    result.sent_at = time.time()
+                except PlaywrightError as e:
+                    result.status, result.error = "failed", f"{type(e).__name__}: {str(e).splitlines()[0]}"
+                    # Leave search / half-typed state behind before the next contact
+                    await page.keyboard.press("Escape")
+                result.seconds = time.perf_counter() - start
+                last_sent = time.monotonic()
+                results.append(result)
+                if on_result:
+                    on_result(result)
+        finally:
+            await context.close()
+    return results
+
+
+async def login(url=WHATSAPP_URL, profile_dir=PROFILE_DIR, timeout_ms=180000):
+    """Headed session to scan the QR code; the profile keeps the login for later runs."""
+    async with async_playwright() as p:
+        context = await p.chromium.launch_persistent_context(
+            profile_dir, headless=False, executable_path=BROWSER_PATH or None,
+        )
+        try:
+            page = context.pages[0] if context.pages else await context.new_page()
+            print("Scan the QR code in the browser window...")
+            await wait_until_ready(page, url, timeout_ms)
+            print(f"✅ Logged in; session saved in {profile_dir}")
+        finally:
+            await context.close()
+
+
+def write_report(results, path):
+    rows = [asdict(result) for result in results]
+    if path.endswith(".json"):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2, ensure_ascii=False)
+        return
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=[field.name for field in fields(MessageResult)])
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def print_result(result):
+    if result.status == "sent":
+        print(f"✅ {result.contact}: sent in {result.seconds:.2f}s")
+    else:
+        print(f"❌ {result.contact}: {result.error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("queue", nargs="?", help="CSV with contact,message columns, or JSONL")
+    parser.add_argument("--login", action="store_true", help="open a window to scan the QR code, then exit")
+    parser.add_argument("--url", default=WHATSAPP_URL, help="chat site (e.g. a local mock page)")
+    parser.add_argument("--profile-dir", default=PROFILE_DIR)
+    parser.add_argument("--headless", action="store_true", help="only once the profile is logged in")
+    parser.add_argument("--timeout", type=float, default=20, help="seconds to wait for each page step")
+    parser.add_argument("--min-interval", type=float, default=1.0, help="seconds between messages")
+    parser.add_argument("--report", help="write per-message results to .csv or .json")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.login:
+        asyncio.run(login(args.url, args.profile_dir))
+        return
+    if not args.queue:
+        parser.error("a queue file is required (or --login)")
+
+    queue = read_queue(args.queue)
+    start = time.perf_counter()
+    results = asyncio.run(send_batch(
+        queue, url=args.url, profile_dir=args.profile_dir, headless=args.headless,
+        timeout_ms=int(args.timeout * 1000), min_interval=args.min_interval, on_result=print_result,
+    ))
+    sent = [result.seconds for result in results if result.status == "sent"]
+    failed = len(results) - len(sent)
+    summary = f"{len(sent)} sent, {failed} failed in {time.perf_counter() - start:.1f}s"
+    if sent:
+        summary += f" · per message p50 {statistics.median(sent):.2f}s, max {max(sent):.2f}s"
+    print(summary)
+    if args.report:
+        write_report(results, args.report)
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()